@@ -0,0 +1,30 @@
+"""add meta to minutes_versions
+
+Revision ID: 3f9b6d2e8a41
+Revises: e7a3c91f05b2
+Create Date: 2026-10-16 16:40:12.583019
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9b6d2e8a41"
+down_revision: Union[str, None] = "e7a3c91f05b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """How a minutes version was produced (draft strategy, windows, model)."""
+    op.add_column(
+        "minutes_versions",
+        sa.Column("meta", postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        schema="minutes",
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("minutes_versions", "meta", schema="minutes")
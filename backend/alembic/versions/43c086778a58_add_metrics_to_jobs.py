@@ -0,0 +1,31 @@
+"""add metrics to jobs
+
+Revision ID: 43c086778a58
+Revises: aa642dc3f33d
+Create Date: 2026-10-16 09:12:03.418220
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "43c086778a58"
+down_revision: Union[str, None] = "aa642dc3f33d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add jobs.metrics (pipeline measurements such as scratch bytes)."""
+    op.add_column(
+        "jobs",
+        sa.Column("metrics", postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        schema="minutes",
+    )
+
+
+def downgrade() -> None:
+    """Drop jobs.metrics."""
+    op.drop_column("jobs", "metrics", schema="minutes")
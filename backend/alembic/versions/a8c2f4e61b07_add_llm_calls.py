@@ -0,0 +1,50 @@
+"""add llm_calls
+
+Revision ID: a8c2f4e61b07
+Revises: 3f9b6d2e8a41
+Create Date: 2026-10-16 18:05:47.209315
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "a8c2f4e61b07"
+down_revision: Union[str, None] = "3f9b6d2e8a41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """One row per OpenAI call made through shared.llm_gateway."""
+    op.create_table(
+        "llm_calls",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("endpoint", sa.String(length=32), nullable=False),
+        sa.Column("operation", sa.String(length=64), nullable=True),
+        sa.Column("model", sa.String(length=64), nullable=False),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=True),
+        sa.Column("completion_tokens", sa.Integer(), nullable=True),
+        sa.Column("latency_ms", sa.Integer(), nullable=False),
+        sa.Column("limiter_wait_ms", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("ok", sa.Boolean(), nullable=False),
+        sa.Column("cache_hit", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("error", sa.String(length=64), nullable=True),
+        sa.Column("transcript_id", sa.BigInteger(), nullable=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=True),
+        schema="minutes",
+    )
+    op.create_index("ix_llm_calls_created_at", "llm_calls", ["created_at"], schema="minutes")
+    op.create_index(
+        "ix_llm_calls_user_created", "llm_calls", ["user_id", "created_at"], schema="minutes"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_llm_calls_user_created", table_name="llm_calls", schema="minutes")
+    op.drop_index("ix_llm_calls_created_at", table_name="llm_calls", schema="minutes")
+    op.drop_table("llm_calls", schema="minutes")
@@ -0,0 +1,37 @@
+"""add content_sha256 to files
+
+Revision ID: b5e2d0c7a914
+Revises: 43c086778a58
+Create Date: 2026-10-16 10:03:27.551904
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b5e2d0c7a914"
+down_revision: Union[str, None] = "43c086778a58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add files.content_sha256 (+ index) for the transcription cache."""
+    op.add_column(
+        "files",
+        sa.Column("content_sha256", sa.String(length=64), nullable=True),
+        schema="minutes",
+    )
+    op.create_index(
+        "ix_minutes_files_content_sha256",
+        "files",
+        ["content_sha256"],
+        schema="minutes",
+    )
+
+
+def downgrade() -> None:
+    """Drop files.content_sha256."""
+    op.drop_index("ix_minutes_files_content_sha256", table_name="files", schema="minutes")
+    op.drop_column("files", "content_sha256", schema="minutes")
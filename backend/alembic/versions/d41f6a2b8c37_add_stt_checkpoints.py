@@ -0,0 +1,86 @@
+"""add stt_checkpoints + jobs.file_id/user_id
+
+Revision ID: d41f6a2b8c37
+Revises: b5e2d0c7a914
+Create Date: 2026-10-16 11:20:44.907315
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "d41f6a2b8c37"
+down_revision: Union[str, None] = "b5e2d0c7a914"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Per-segment STT checkpoints and the job columns needed to resume."""
+    # 1) jobs.file_id / jobs.user_id
+    op.add_column(
+        "jobs",
+        sa.Column("file_id", sa.String(), nullable=True),
+        schema="minutes",
+    )
+    op.create_foreign_key(
+        "fk_jobs_file_id",
+        "jobs",
+        "files",
+        ["file_id"],
+        ["file_id"],
+        source_schema="minutes",
+        referent_schema="minutes",
+        ondelete="SET NULL",
+    )
+    op.add_column(
+        "jobs",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=True),
+        schema="minutes",
+    )
+    op.create_index(
+        "ix_minutes_jobs_user_id",
+        "jobs",
+        ["user_id"],
+        schema="minutes",
+    )
+    op.create_foreign_key(
+        "fk_jobs_user_id",
+        "jobs",
+        "users",
+        ["user_id"],
+        ["id"],
+        source_schema="minutes",
+        referent_schema="public",
+        ondelete="SET NULL",
+    )
+
+    # 2) stt_checkpoints
+    op.create_table(
+        "stt_checkpoints",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column(
+            "job_id",
+            sa.String(),
+            sa.ForeignKey("minutes.jobs.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("segment_index", sa.Integer(), nullable=False),
+        sa.Column("segment_count", sa.Integer(), nullable=False),
+        sa.Column("offset_sec", sa.Float(), nullable=False),
+        sa.Column("result", postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("job_id", "segment_index", name="uix_stt_checkpoints_seg"),
+        schema="minutes",
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stt_checkpoints", schema="minutes")
+    op.drop_constraint("fk_jobs_user_id", "jobs", schema="minutes", type_="foreignkey")
+    op.drop_index("ix_minutes_jobs_user_id", table_name="jobs", schema="minutes")
+    op.drop_column("jobs", "user_id", schema="minutes")
+    op.drop_constraint("fk_jobs_file_id", "jobs", schema="minutes", type_="foreignkey")
+    op.drop_column("jobs", "file_id", schema="minutes")
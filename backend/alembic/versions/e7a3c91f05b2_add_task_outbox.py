@@ -0,0 +1,46 @@
+"""add task_outbox
+
+Revision ID: e7a3c91f05b2
+Revises: d41f6a2b8c37
+Create Date: 2026-10-16 15:02:31.418206
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a3c91f05b2"
+down_revision: Union[str, None] = "d41f6a2b8c37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Transactional outbox for Celery task dispatch."""
+    op.create_table(
+        "task_outbox",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("task_name", sa.String(), nullable=False),
+        sa.Column("args", postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column("kwargs", postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column("options", postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("dispatched_at", sa.DateTime(timezone=True), nullable=True),
+        schema="minutes",
+    )
+    op.create_index(
+        "ix_task_outbox_pending",
+        "task_outbox",
+        ["id"],
+        schema="minutes",
+        postgresql_where=sa.text("dispatched_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_outbox_pending", table_name="task_outbox", schema="minutes")
+    op.drop_table("task_outbox", schema="minutes")
@@ -0,0 +1,69 @@
+"""
+Fake OpenAI の挙動設定 (環境変数)。
+
+レイテンシは ``"<ms>"`` (固定)、``"uniform:<min_ms>:<max_ms>"``、
+``"lognormal:<median_ms>:<sigma>"`` のいずれかで指定する。
+"""
+from __future__ import annotations
+
+import math
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Tuple
+
+
+@dataclass(frozen=True)
+class Latency:
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        parts = spec.strip().split(":")
+        if len(parts) == 1:
+            return cls("fixed", float(parts[0]))
+        kind, a, b = parts
+        if kind not in ("uniform", "lognormal"):
+            raise ValueError(f"unknown latency distribution: {spec}")
+        return cls(kind, float(a), float(b))
+
+    def sample(self, rng: random.Random) -> float:
+        """1 回分の待ち時間 (秒)"""
+        if self.kind == "uniform":
+            ms = rng.uniform(self.a, self.b)
+        elif self.kind == "lognormal":
+            ms = rng.lognormvariate(math.log(max(self.a, 1e-3)), self.b)
+        else:
+            ms = self.a
+        return max(0.0, ms) / 1000
+
+
+def _codes(raw: str) -> Tuple[int, ...]:
+    return tuple(int(c) for c in raw.split(",") if c.strip())
+
+
+def _env(name: str, default: str, parse: Callable[[str], Any]) -> Any:
+    """FakeConfig() の生成時に環境変数を読む field (import 後の setenv も効く)"""
+    return field(default_factory=lambda: parse(os.getenv(name, default)))
+
+
+@dataclass
+class FakeConfig:
+    chat_latency: Latency = _env("FAKE_OPENAI_CHAT_LATENCY", "lognormal:400:0.5", Latency.parse)
+    embed_latency: Latency = _env("FAKE_OPENAI_EMBED_LATENCY", "lognormal:80:0.3", Latency.parse)
+    audio_latency: Latency = _env("FAKE_OPENAI_AUDIO_LATENCY", "lognormal:500:0.3", Latency.parse)
+    # 音声 1 秒あたりの追加処理時間 (秒)
+    audio_rtf: float = _env("FAKE_OPENAI_AUDIO_RTF", "0.02", float)
+    # ストリーミング時のチャンク間隔
+    stream_chunk_ms: float = _env("FAKE_OPENAI_STREAM_CHUNK_MS", "15", float)
+    stream_chunk_chars: int = _env("FAKE_OPENAI_STREAM_CHUNK_CHARS", "4", int)
+    # 生成する completion の長さ (文字数)
+    completion_chars: int = _env("FAKE_OPENAI_COMPLETION_CHARS", "800", int)
+    # アップロードサイズから音声長を見積もる (32 kbps = 4000 B/s)
+    audio_bytes_per_sec: int = _env("FAKE_OPENAI_AUDIO_BYTES_PER_SEC", "4000", int)
+    # リクエストのうち error_codes のどれかで失敗させる割合
+    error_rate: float = _env("FAKE_OPENAI_ERROR_RATE", "0", float)
+    error_codes: Tuple[int, ...] = _env("FAKE_OPENAI_ERROR_CODES", "429,500,503", _codes)
+    seed: int = _env("FAKE_OPENAI_SEED", "0", int)
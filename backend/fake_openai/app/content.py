@@ -0,0 +1,145 @@
+"""
+リクエスト内容だけから決まる (決定的な) 応答本文の生成。
+
+同じ入力には常に同じ出力を返すので、回帰テストやキャッシュの検証に使える。
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+from typing import Any, Dict, List, Sequence
+
+_PHRASES = (
+    "来期の予算案について確認しました",
+    "担当者は次回までに見積もりを更新します",
+    "リリース日は来月第二週で合意しました",
+    "顧客からの要望を整理して共有します",
+    "テスト環境の構築状況を報告しました",
+    "課題管理表の優先度を見直します",
+    "議事録の配布は会議当日中に行います",
+    "次回の定例は同じ時間で開催します",
+)
+_EMBED_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+# system prompt に書かれた JSON キー ('chatResponse' / "markdown" 等)
+_JSON_KEY = re.compile(r"""["'](\w+)["']""")
+# 返答と本文を区切るマーカー (<<<MINUTES>>> 等) を指定されたらそれに従う
+_MARKER = re.compile(r"<<<\w+>>>")
+
+
+def seed_of(*parts: Any) -> int:
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return int.from_bytes(hashlib.sha256(raw.encode()).digest()[:8], "big")
+
+
+def _sentences(rng: random.Random, chars: int) -> List[str]:
+    out: List[str] = []
+    used = 0
+    while used < chars:
+        s = f"{rng.choice(_PHRASES)} ({rng.randrange(16**4):04x})"
+        out.append(s)
+        used += len(s) + 3
+    return out
+
+
+def minutes_text(seed: int, chars: int) -> str:
+    """概要 / 決定事項 / ToDo の形をした Markdown (約 chars 文字)"""
+    rng = random.Random(seed)
+    lines = _sentences(rng, chars)
+    third = max(1, len(lines) // 3)
+    return "\n".join(
+        ["## 概要"]
+        + [f"- {s}" for s in lines[:third]]
+        + ["", "## 決定事項"]
+        + [f"- {s}" for s in lines[third : 2 * third]]
+        + ["", "## ToDo"]
+        + [f"- [ ] {s}" for s in lines[2 * third :]]
+    )
+
+
+def wants_json(messages: Sequence[Dict[str, Any]], response_format: Any) -> bool:
+    if isinstance(response_format, dict) and response_format.get("type") in ("json_object", "json_schema"):
+        return True
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    return "JSON" in system.upper()
+
+
+def chat_content(model: str, messages: Sequence[Dict[str, Any]], response_format: Any, chars: int) -> str:
+    seed = seed_of(model, messages)
+    text = minutes_text(seed, chars)
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    if not wants_json(messages, response_format):
+        marker = _MARKER.search(system)
+        if marker:
+            return f"{random.Random(seed).choice(_PHRASES)}\n{marker.group(0)}\n{text}"
+        return text
+    keys = list(dict.fromkeys(_JSON_KEY.findall(system))) or ["result"]
+    reply = random.Random(seed).choice(_PHRASES)
+    if "edits" in keys:
+        # 差分モード (minutes_patch): 変更なしの編集リスト
+        return json.dumps({"reply": reply, "edits": [], "rewrite": False}, ensure_ascii=False)
+    # 先頭のキーは短い返答、残りは Markdown (assistant_message / markdown 等)
+    return json.dumps(
+        {k: (reply if i == 0 and len(keys) > 1 else text) for i, k in enumerate(keys)},
+        ensure_ascii=False,
+    )
+
+
+def embedding(model: str, text: str, dimensions: int | None = None) -> List[float]:
+    """text に対して決定的な単位ベクトル"""
+    dims = dimensions or _EMBED_DIMS.get(model, 1536)
+    rng = random.Random(seed_of(model, text))
+    vec = [rng.gauss(0.0, 1.0) for _ in range(dims)]
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def encode_base64(vec: Sequence[float]) -> str:
+    """encoding_format=base64 (little-endian float32)"""
+    return base64.b64encode(struct.pack(f"<{len(vec)}f", *vec)).decode()
+
+
+def transcription(audio: bytes, duration: float, language: str | None) -> Dict[str, Any]:
+    """verbose_json 形式 (segments / words 付き)"""
+    rng = random.Random(seed_of(hashlib.sha256(audio).hexdigest()))
+    segments: List[Dict[str, Any]] = []
+    words: List[Dict[str, Any]] = []
+    t = 0.0
+    while t < duration:
+        end = min(duration, t + rng.uniform(3.0, 8.0))
+        phrase = rng.choice(_PHRASES)
+        parts = [p for p in re.split(r"(?<=[はをにでがも])", phrase) if p]
+        step = (end - t) / len(parts)
+        for i, p in enumerate(parts):
+            words.append({"word": p, "start": round(t + i * step, 2), "end": round(t + (i + 1) * step, 2)})
+        segments.append(
+            {
+                "id": len(segments),
+                "seek": int(t * 100),
+                "start": round(t, 2),
+                "end": round(end, 2),
+                "text": phrase,
+                "tokens": [],
+                "temperature": 0.0,
+                "avg_logprob": -0.2,
+                "compression_ratio": 1.2,
+                "no_speech_prob": 0.01,
+            }
+        )
+        t = end
+    return {
+        "task": "transcribe",
+        "language": language or "japanese",
+        "duration": round(duration, 2),
+        "text": "".join(s["text"] for s in segments),
+        "segments": segments,
+        "words": words,
+    }
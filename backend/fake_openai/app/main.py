@@ -0,0 +1,228 @@
+"""
+Offline stand-in for the OpenAI API (load / regression testing).
+
+Implements the endpoints this repo calls:
+
+* ``POST /v1/chat/completions``      – incl. ``stream=true`` and JSON mode
+* ``POST /v1/embeddings``            – float or base64 encoding
+* ``POST /v1/audio/transcriptions``  – json / text / verbose_json (segments + words)
+* ``GET  /v1/models``
+
+Outputs depend only on the request body, so runs are reproducible.  Latency
+distributions, streaming pace and an error-injection rate are configured via
+``FAKE_OPENAI_*`` env vars (see :mod:`.config`).  Point the services at it with
+``OPENAI_BASE_URL=http://fake-openai:8000/v1`` and any ``OPENAI_API_KEY``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from shared import prompt_budget as PB
+
+from . import content
+from .config import FakeConfig, Latency
+
+_ERROR_TYPES = {
+    429: ("rate_limit_exceeded", "Rate limit reached (injected by fake-openai)"),
+    500: ("server_error", "The server had an error (injected by fake-openai)"),
+    503: ("server_error", "The engine is currently overloaded (injected by fake-openai)"),
+}
+
+
+def create_app(config: Optional[FakeConfig] = None) -> FastAPI:
+    cfg = config or FakeConfig()
+    rng = random.Random(cfg.seed)
+    router = APIRouter(prefix="/v1")
+
+    async def _delay(latency: Latency, extra_sec: float = 0.0) -> None:
+        wait = latency.sample(rng) + extra_sec
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _injected_error() -> Optional[JSONResponse]:
+        if not cfg.error_codes or rng.random() >= cfg.error_rate:
+            return None
+        code = rng.choice(cfg.error_codes)
+        err_type, message = _ERROR_TYPES.get(code, ("server_error", f"HTTP {code} (injected)"))
+        headers = {"retry-after": "1"} if code == 429 else None
+        return JSONResponse(
+            {"error": {"message": message, "type": err_type, "param": None, "code": err_type}},
+            status_code=code,
+            headers=headers,
+        )
+
+    # ------------------------------------------------------------------ #
+    # chat
+    # ------------------------------------------------------------------ #
+    @router.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body: Dict[str, Any] = await request.json()
+        if (err := _injected_error()) is not None:
+            return err
+        model = body.get("model", "gpt-4o-mini")
+        messages = body.get("messages", [])
+        text = content.chat_content(model, messages, body.get("response_format"), cfg.completion_chars)
+        prompt_tokens = PB.count_messages(
+            [{"content": str(m.get("content") or "")} for m in messages], model
+        )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": PB.count_tokens(text, model),
+            "total_tokens": prompt_tokens + PB.count_tokens(text, model),
+        }
+        cid = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        await _delay(cfg.chat_latency)  # time to first token
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(
+                _stream(cid, created, model, text, usage if include_usage else None),
+                media_type="text/event-stream",
+            )
+        return {
+            "id": cid,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }
+            ],
+            "usage": usage,
+        }
+
+    async def _stream(
+        cid: str, created: int, model: str, text: str, usage: Optional[dict]
+    ) -> AsyncIterator[str]:
+        def _chunk(delta: dict, finish: Optional[str] = None, **extra: Any) -> str:
+            payload = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        yield _chunk({"role": "assistant", "content": ""})
+        step = max(1, cfg.stream_chunk_chars)
+        for i in range(0, len(text), step):
+            if cfg.stream_chunk_ms:
+                await asyncio.sleep(cfg.stream_chunk_ms / 1000)
+            yield _chunk({"content": text[i : i + step]})
+        yield _chunk({}, "stop")
+        if usage is not None:
+            payload = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    # ------------------------------------------------------------------ #
+    # embeddings
+    # ------------------------------------------------------------------ #
+    @router.post("/embeddings")
+    async def embeddings(request: Request):
+        body: Dict[str, Any] = await request.json()
+        if (err := _injected_error()) is not None:
+            return err
+        model = body.get("model", "text-embedding-3-small")
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        as_base64 = body.get("encoding_format") == "base64"
+
+        data = []
+        for i, text in enumerate(inputs):
+            vec = content.embedding(model, str(text), body.get("dimensions"))
+            data.append(
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": content.encode_base64(vec) if as_base64 else vec,
+                }
+            )
+        tokens = sum(PB.count_tokens(str(t), model) for t in inputs)
+        await _delay(cfg.embed_latency)
+        return {
+            "object": "list",
+            "model": model,
+            "data": data,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    # ------------------------------------------------------------------ #
+    # audio
+    # ------------------------------------------------------------------ #
+    @router.post("/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        if (err := _injected_error()) is not None:
+            return err
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            return JSONResponse(
+                {"error": {"message": "file is required", "type": "invalid_request_error", "param": "file", "code": None}},
+                status_code=400,
+            )
+        audio = await upload.read()
+        duration = len(audio) / max(1, cfg.audio_bytes_per_sec)
+        result = content.transcription(audio, duration, form.get("language"))
+
+        await _delay(cfg.audio_latency, duration * cfg.audio_rtf)
+        fmt = form.get("response_format") or "json"
+        if fmt == "text":
+            return PlainTextResponse(result["text"])
+        if fmt == "verbose_json":
+            granularities = form.getlist("timestamp_granularities[]") or ["segment"]
+            if "word" not in granularities:
+                result.pop("words")
+            return result
+        if fmt == "json":
+            return {"text": result["text"]}
+        return JSONResponse(
+            {"error": {"message": f"unsupported response_format: {fmt}", "type": "invalid_request_error", "param": "response_format", "code": None}},
+            status_code=400,
+        )
+
+    # ------------------------------------------------------------------ #
+    # misc
+    # ------------------------------------------------------------------ #
+    @router.get("/models")
+    def models():
+        ids = ("gpt-4o-mini", "gpt-4o", "text-embedding-3-small", "whisper-1")
+        return {
+            "object": "list",
+            "data": [{"id": m, "object": "model", "created": 0, "owned_by": "fake-openai"} for m in ids],
+        }
+
+    app = FastAPI(title="NE Navi – Fake OpenAI")
+    app.include_router(router)
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "error_rate": cfg.error_rate}
+
+    return app
+
+
+app = create_app()
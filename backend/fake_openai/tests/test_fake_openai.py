@@ -0,0 +1,175 @@
+"""
+Fake OpenAI を本物の SDK (AsyncOpenAI) から叩いて、このリポジトリの呼び出し方で
+応答がパースできることを確かめる。ベンチマークは
+
+    pytest -m benchmark -s fake_openai/tests/test_fake_openai.py
+
+ネットワーク無しでも通ること (tiktoken の BPE が取れなければ文字数で数える) は
+network namespace を切って確かめる::
+
+    unshare -rn python -m pytest -q fake_openai/tests
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, RateLimitError
+
+from fake_openai.app import content
+from fake_openai.app.config import FakeConfig, Latency
+from fake_openai.app.main import create_app
+
+_NO_WAIT = Latency.parse("0")
+
+
+def _config(**kw) -> FakeConfig:
+    base = dict(
+        chat_latency=_NO_WAIT,
+        embed_latency=_NO_WAIT,
+        audio_latency=_NO_WAIT,
+        audio_rtf=0.0,
+        stream_chunk_ms=0.0,
+        error_rate=0.0,
+    )
+    base.update(kw)
+    return FakeConfig(**base)
+
+
+def _client(cfg: FakeConfig) -> AsyncOpenAI:
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(cfg)))
+    return AsyncOpenAI(api_key="test", base_url="http://fake/v1", http_client=http, max_retries=0)
+
+
+def test_latency_spec_parse():
+    assert Latency.parse("250").sample(None) == 0.25
+    lat = Latency.parse("uniform:100:200")
+    assert (lat.kind, lat.a, lat.b) == ("uniform", 100.0, 200.0)
+    with pytest.raises(ValueError):
+        Latency.parse("poisson:1:2")
+
+
+def test_every_setting_is_read_when_the_config_is_created(monkeypatch):
+    monkeypatch.setenv("FAKE_OPENAI_ERROR_RATE", "0.25")
+    monkeypatch.setenv("FAKE_OPENAI_ERROR_CODES", "429")
+    monkeypatch.setenv("FAKE_OPENAI_SEED", "7")
+    monkeypatch.setenv("FAKE_OPENAI_AUDIO_RTF", "0.5")
+    monkeypatch.setenv("FAKE_OPENAI_CHAT_LATENCY", "10")
+
+    cfg = FakeConfig()
+    assert (cfg.error_rate, cfg.error_codes, cfg.seed, cfg.audio_rtf) == (0.25, (429,), 7, 0.5)
+    assert cfg.chat_latency == Latency("fixed", 10.0)
+
+
+def test_json_mode_follows_keys_in_system_prompt():
+    messages = [
+        {"role": "system", "content": 'JSON で {"assistant_message": ..., "markdown": ...} を返す'},
+        {"role": "user", "content": "直して"},
+    ]
+    out = json.loads(content.chat_content("gpt-4o-mini", messages, {"type": "json_object"}, 200))
+
+    assert set(out) == {"assistant_message", "markdown"}
+    assert out["markdown"].startswith("## 概要")
+    # 同じ入力なら同じ出力
+    assert content.chat_content("gpt-4o-mini", messages, {"type": "json_object"}, 200) == json.dumps(
+        out, ensure_ascii=False
+    )
+
+
+def test_chat_and_stream_round_trip():
+    async def _run():
+        client = _client(_config())
+        messages = [
+            {"role": "system", "content": "返答の後に <<<MINUTES>>> の行を置き、その後に議事録を書く"},
+            {"role": "user", "content": "ToDo を追加して"},
+        ]
+        rsp = await client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+        stream = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        deltas, usage = [], None
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                deltas.append(chunk.choices[0].delta.content)
+            usage = chunk.usage or usage
+        return rsp, "".join(deltas), usage
+
+    rsp, streamed, usage = asyncio.run(_run())
+    text = rsp.choices[0].message.content
+
+    assert "<<<MINUTES>>>" in text
+    assert streamed == text
+    assert usage.completion_tokens == rsp.usage.completion_tokens > 0
+
+
+def test_embeddings_float_and_base64_match():
+    async def _run():
+        client = _client(_config())
+        # SDK の既定は encoding_format=base64
+        b64 = await client.embeddings.create(model="text-embedding-3-small", input=["a", "b"])
+        flt = await client.embeddings.create(
+            model="text-embedding-3-small", input=["a", "b"], encoding_format="float", dimensions=8
+        )
+        return b64, flt
+
+    b64, flt = asyncio.run(_run())
+
+    assert [len(d.embedding) for d in b64.data] == [1536, 1536]
+    assert [len(d.embedding) for d in flt.data] == [8, 8]
+    assert b64.data[0].embedding != b64.data[1].embedding
+
+
+def test_verbose_json_transcription():
+    async def _run():
+        client = _client(_config(audio_bytes_per_sec=1000))
+        return await client.audio.transcriptions.create(
+            model="whisper-1",
+            file=("a.mp3", b"\x00" * 30_000, "audio/mpeg"),
+            response_format="verbose_json",
+            timestamp_granularities=["segment", "word"],
+            language="ja",
+        )
+
+    tr = asyncio.run(_run())
+
+    assert tr.duration == 30.0
+    assert tr.segments[-1].end == 30.0
+    assert tr.text == "".join(s.text for s in tr.segments)
+    assert tr.words
+
+
+def test_injected_errors_use_openai_shape():
+    async def _run():
+        client = _client(_config(error_rate=1.0, error_codes=(429,)))
+        await client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "x"}])
+
+    with pytest.raises(RateLimitError) as exc:
+        asyncio.run(_run())
+    assert exc.value.response.headers["retry-after"] == "1"
+
+
+@pytest.mark.benchmark
+def test_chat_throughput_benchmark():
+    """固定 50 ms のレイテンシで 200 並列 → 待ちが重なっていること (直列なら 10 秒)"""
+    n = 200
+
+    async def _run():
+        client = _client(_config(chat_latency=Latency.parse("50")))
+        t0 = time.perf_counter()
+        await asyncio.gather(
+            *(
+                client.chat.completions.create(
+                    model="gpt-4o-mini", messages=[{"role": "user", "content": str(i)}]
+                )
+                for i in range(n)
+            )
+        )
+        return time.perf_counter() - t0
+
+    elapsed = asyncio.run(_run())
+    print(f"\nfake-openai chat: {n} calls in {elapsed:.2f}s ({n / elapsed:.0f} req/s)")
+    assert elapsed < n * 0.05 / 4
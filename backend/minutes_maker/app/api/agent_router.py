@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from openai import OpenAI
 import json as _json
 from common.security import current_active_user
 from common.models.user import User
+from shared import llm_gateway
+from shared import prompt_budget as PB
 
 from ..db import SessionLocal, models as M
+from ..services import llm_stream, minutes_patch
+from ..services.llm import llm_cache_enabled
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["agent"])
-oai = OpenAI()
+
+MODEL = "gpt-4o-mini"
 
 def get_db() -> Session:
     db = SessionLocal()
@@ -28,74 +36,200 @@ class EditResponse(BaseModel):
     editedMinutes: str
     versionNo: int
 
-@router.post("/agent", response_model=EditResponse)
-def call_agent(q: Ask, db: Session = Depends(get_db), user: User = Depends(current_active_user),):
+_SYSTEM_JSON = (
+    "You are a meeting minutes editor. "
+    "The user prompt includes the full minutes. "
+    "Respond in strict JSON with keys 'chatResponse' and 'editedMinutes'."
+)
+# 差分モード: 最新版の議事録に対する変更箇所だけを返させる
+_SYSTEM_PATCH = (
+    "You are a meeting minutes editor. "
+    "The user prompt includes the full minutes. " + minutes_patch.PATCH_FORMAT
+)
+_SYSTEM_STREAM = (
+    "You are a meeting minutes editor. "
+    "The user prompt includes the full minutes. "
+    "First write a short reply to the user, then a line containing only "
+    f"{llm_stream.MINUTES_MARKER}, then the full edited minutes in Markdown."
+)
+
+
+def _prepare(q: Ask, db: Session, user: User, system_msg: str) -> list[dict]:
+    """所有者確認とコンテキスト長の確認をしてから、ユーザー発話を保存する"""
     tr = db.get(M.Transcript, q.transcript_id)
     if tr is None or tr.user_id != user.id:
         raise HTTPException(status_code=404, detail="Transcript not found")
-    # 1) ユーザー発話を保存
+
+    messages = [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": q.body},
+    ]
+    # 本文に議事録全体が入るので、送る前にコンテキスト長を確認する
+    try:
+        PB.estimate(messages, MODEL, completion_tokens=PB.count_tokens(q.body, MODEL))
+    except PB.PromptTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+
     db.add(M.Message(transcript_id=q.transcript_id, role="user", body=q.body))
     db.commit()
+    return messages
 
-    # 2) AI 呼び出し
-    system_msg = (
-        "You are a meeting minutes editor. "
-        "The user prompt includes the full minutes. "
-        "Respond in strict JSON with keys 'chatResponse' and 'editedMinutes'."
-    )
-    rsp = oai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": q.body},
-        ],
-        temperature=0.4,
+
+def _latest_markdown(db: Session, transcript_id: int) -> str | None:
+    """差分を当てる基準 (最新の MinutesVersion)"""
+    return (
+        db.query(M.MinutesVersion.markdown)
+          .filter(M.MinutesVersion.transcript_id == transcript_id)
+          .order_by(M.MinutesVersion.version_no.desc())
+          .limit(1)
+          .scalar()
     )
-    answer = rsp.choices[0].message.content
 
-    # 3) JSON パース
+
+def _try_patch(
+    messages: list[dict], base: str | None, use_cache: bool
+) -> tuple[tuple[str, str] | None, dict]:
+    """
+    差分モードを試す。((chatResponse, editedMinutes) | None, meta)
+    モデルが find を写すのは本文 (messages) 内の議事録なので、最新版がそのまま
+    含まれているときだけ当てる (未保存の編集を持つクライアントでは全文生成)
+    """
+    if not base or not minutes_patch.use_patch(base, MODEL):
+        return None, minutes_patch.fallback_meta()
+    if base.strip() not in messages[-1]["content"]:
+        return None, minutes_patch.fallback_meta(
+            minutes_patch.PatchFailed("request minutes differ from the latest version")
+        )
+    patch_messages = [{"role": "system", "content": _SYSTEM_PATCH}, *messages[1:]]
     try:
-        data = _json.loads(answer)
-        chat_resp = data["chatResponse"]
-        edited_raw = data["editedMinutes"]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"JSON parse error: {e}")
-
-    # 4) dict/list は文字列化して保存
-    if isinstance(edited_raw, (dict, list)):
-        edited_body = _json.dumps(edited_raw, ensure_ascii=False)
-    else:
-        edited_body = str(edited_raw)
+        result = minutes_patch.request_edits(
+            MODEL, patch_messages, base, temperature=0.4, cache=use_cache
+        )
+    except minutes_patch.PatchFailed as exc:
+        logger.info("agent patch failed, regenerating: %s", exc)
+        return None, minutes_patch.fallback_meta(exc)
+    return (result.reply, result.markdown), minutes_patch.patch_meta(result)
 
-    # 5) Assistant コメントを保存
-    db.add(M.Message(transcript_id=q.transcript_id, role="assistant", body=chat_resp))
+
+def _store_reply(
+    db: Session,
+    transcript_id: int,
+    chat_resp: str,
+    edited_body: str,
+    meta: dict | None = None,
+) -> M.MinutesVersion:
+    # Assistant コメントを保存
+    db.add(M.Message(transcript_id=transcript_id, role="assistant", body=chat_resp))
     db.commit()
 
-    # 6) 編集後議事録を Message テーブルにも保存（履歴）
-    db.add(M.Message(transcript_id=q.transcript_id, role="assistant", body=edited_body))
+    # 編集後議事録を Message テーブルにも保存（履歴）
+    db.add(M.Message(transcript_id=transcript_id, role="assistant", body=edited_body))
     db.commit()
 
-    # 7) 最新 version_no を計算して MinutesVersion に保存
+    # 最新 version_no を計算して MinutesVersion に保存
     last_mv = (
         db.query(M.MinutesVersion)
-          .filter(M.MinutesVersion.transcript_id == q.transcript_id)
+          .filter(M.MinutesVersion.transcript_id == transcript_id)
           .order_by(M.MinutesVersion.version_no.desc())
           .first()
     )
     next_ver = (last_mv.version_no if last_mv else 0) + 1
     mv = M.MinutesVersion(
-        transcript_id=q.transcript_id,
+        transcript_id=transcript_id,
         version_no=next_ver,
         markdown=edited_body,
+        meta=meta,
     )
     db.add(mv)
     db.commit()
     db.refresh(mv)
+    return mv
+
+
+@router.post("/agent", response_model=EditResponse)
+def call_agent(
+    q: Ask,
+    db: Session = Depends(get_db),
+    user: User = Depends(current_active_user),
+    use_cache: bool = Depends(llm_cache_enabled),
+):
+    # 1) 確認 + ユーザー発話を保存
+    messages = _prepare(q, db, user, _SYSTEM_JSON)
+
+    # 2) AI 呼び出し (同じ本文ならキャッシュ済みの返答)
+    #    長い議事録は最新版への差分だけを返させ、当たらなければ全文生成
+    with llm_gateway.tagged(operation="agent", transcript_id=q.transcript_id, user_id=user.id):
+        patched, meta = _try_patch(messages, _latest_markdown(db, q.transcript_id), use_cache)
+        if patched is None:
+            rsp = llm_gateway.chat(MODEL, messages, temperature=0.4, cache=use_cache)
+
+    if patched is not None:
+        chat_resp, edited_body = patched
+    else:
+        # 3) JSON パース
+        answer = rsp.choices[0].message.content
+        try:
+            data = _json.loads(answer)
+            chat_resp = data["chatResponse"]
+            edited_raw = data["editedMinutes"]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"JSON parse error: {e}")
 
-    # 8) レスポンスを返却
+        # 4) dict/list は文字列化して保存
+        if isinstance(edited_raw, (dict, list)):
+            edited_body = _json.dumps(edited_raw, ensure_ascii=False)
+        else:
+            edited_body = str(edited_raw)
+
+    # 5) Assistant コメント / 編集後議事録 / MinutesVersion を保存
+    mv = _store_reply(db, q.transcript_id, chat_resp, edited_body, meta)
+
+    # 6) レスポンスを返却
     return {
         "chatResponse": chat_resp,
         "editedMinutes": edited_body,
         "versionNo": mv.version_no,
     }
 
+
+@router.post("/agent/stream")
+def stream_agent(
+    q: Ask,
+    request: Request,
+    db: Session = Depends(get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    call_agent のストリーミング版 (text/event-stream)。
+    ``message`` / ``minutes`` イベントの後、``done`` で EditResponse と同じ内容を返す。
+    切断時やモデルが marker を出さなかったときは返答だけを残し、議事録の版は作らない。
+    """
+    messages = _prepare(q, db, user, _SYSTEM_STREAM)
+    transcript_id = q.transcript_id
+    tags = {"operation": "agent_stream", "transcript_id": transcript_id, "user_id": user.id}
+    deltas = llm_stream.chat_deltas(MODEL, messages, tags, temperature=0.4)
+
+    def _finish(outcome: str, texts: dict[str, str]) -> dict | None:
+        edited_body = texts.get(llm_stream.MINUTES)
+        chat_resp = texts.get(llm_stream.MESSAGE, "")
+        # リクエストの Session はレスポンス送信前に閉じられるので別に開く
+        sess = SessionLocal()
+        try:
+            # 返答はユーザーに表示済みなので必ず残す。議事録の版は完了かつ marker 以降があるときだけ
+            if outcome != llm_stream.COMPLETED or not edited_body:
+                if chat_resp:
+                    sess.add(M.Message(transcript_id=transcript_id, role="assistant", body=chat_resp))
+                    sess.commit()
+                return None
+            mv = _store_reply(sess, transcript_id, chat_resp, edited_body, {"stream": outcome})
+            return {
+                "chatResponse": chat_resp,
+                "editedMinutes": edited_body,
+                "versionNo": mv.version_no,
+            }
+        finally:
+            sess.close()
+
+    return llm_stream.stream_response(
+        request, llm_stream.split_deltas(deltas, llm_stream.MarkerSplitter()), _finish
+    )
@@ -3,10 +3,11 @@ from common.security import current_active_user
 from common.models.user import User
 from sqlalchemy.orm import Session
 from ..db import SessionLocal, models as M
+from ..services.llm import llm_cache_enabled
 
 from pydantic import BaseModel
 
-from shared.draft_minutes import generate_minutes_draft
+from shared.draft_minutes import enqueue_draft
 
 router = APIRouter(prefix="/api", tags=["minutes-draft"])
 
@@ -21,13 +22,16 @@ async def create_draft(
         body: DraftIn,
         user: User = Depends(current_active_user),
         db: Session = Depends(lambda: SessionLocal()),
+        use_cache: bool = Depends(llm_cache_enabled),
 ):
     tr = db.get(M.Transcript, transcript_id)
     if tr is None or tr.user_id != user.id:
         raise HTTPException(404, "Transcript not found")
     """Trigger GPT-based minutes draft generation."""
     try:
-        task = generate_minutes_draft.delay(transcript_id, body.model, str(user.id))
+        task = enqueue_draft(
+            transcript_id, tr.content, body.model, user_id=str(user.id), use_cache=use_cache
+        )
         return {"task_id": task.id, "queued": True}
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
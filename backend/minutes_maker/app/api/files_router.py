@@ -1,39 +1,38 @@
 """音声ファイルのアップロード API。
 
-1. /data/uploads へ保存
+1. AUDIO_STORAGE (/data/uploads or MinIO) へチャンク単位で保存
+   (同時にサイズと SHA-256 を計算。コピーはスレッドプールで行い event loop を塞がない)
 2. files テーブルにレコード作成
 3. jobs テーブルにレコード作成（Celery task_id をそのまま主キーに）
 4. Celery へ STT + 議事録ドラフト生成タスクを投入
    - task 引数: (audio_file_id, job_id)
 5. {file_id, job_id} を返す
+
+回線が不安定な環境での長時間録音は uploads_router (再開可能アップロード) を使う。
 """
 from __future__ import annotations
 
-from pathlib import Path
 from uuid import uuid4
 
-from fastapi import APIRouter, File, HTTPException, UploadFile, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile, Depends
+from fastapi.concurrency import run_in_threadpool
 from common.security import current_active_user
 from common.models.user import User
 
-from minutes_maker.app import SessionLocal
-from minutes_maker.app.db import models as M
-from shared.stt_transcribe import transcribe_and_generate_minutes
+from minutes_maker.app.services.uploads import register_upload
+from shared.storage import UPLOAD_MAX_BYTES, UploadTooLarge, save_upload
 
 router = APIRouter(prefix="/api", tags=["files"])
 
-UPLOAD_DIR = Path("/data/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
 
 # --------------------------------------------------------------------------- #
 #  helpers
 # --------------------------------------------------------------------------- #
-def _save_file_to_disk(f: UploadFile, dst: Path):
-    """UploadFile から bytes を読み込んで dst へ保存"""
-    dst.parent.mkdir(parents=True, exist_ok=True)  # mkdir -p 相当
-    dst.write_bytes(f.file.read())
+def _reject_oversized(request: Request) -> None:
+    """Content-Length が分かる場合は本文を読む前に 413 を返す"""
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > UPLOAD_MAX_BYTES:
+        raise HTTPException(413, f"upload exceeds {UPLOAD_MAX_BYTES} bytes")
 
 
 # --------------------------------------------------------------------------- #
@@ -41,54 +40,25 @@ def _save_file_to_disk(f: UploadFile, dst: Path):
 # --------------------------------------------------------------------------- #
 @router.post("/files")
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...),
+    force_transcribe: bool = Form(
+        False, description="同一内容の文字起こし結果があっても Whisper をやり直す"
+    ),
     user: User = Depends(current_active_user),
 ):
     # ---------- 1. ファイル保存 ------------------------------------------------
+    _reject_oversized(request)
     file_id = str(uuid4())
-    dst = UPLOAD_DIR / f"{file_id}_{file.filename}"
     try:
-        _save_file_to_disk(file, dst)
+        stored = await run_in_threadpool(save_upload, file.file, file_id, file.filename)
+    except UploadTooLarge as exc:
+        raise HTTPException(413, str(exc)) from exc
     except Exception as exc:
         raise HTTPException(500, f"disk save failed: {exc}") from exc
 
-    # ---------- 2. DB insert: files ------------------------------------------
-    sess: Session = SessionLocal()
-    try:
-        sess.add(
-            M.File(
-                file_id=file_id,
-                filename=file.filename,
-                mime_type=file.content_type,
-                uploaded_by=user.id,
-                user_id=user.id,
-            )
-        )
-        sess.commit()
-    finally:
-        sess.close()
-
-    # ---------- 3. Celery task & jobs ----------------------------------------
-    job_id = str(uuid4())
-
-    task = transcribe_and_generate_minutes.apply_async(
-        args = (file_id, job_id, str(user.id)),
-        task_id = job_id,  # ← task.id == job_id になる
+    # ---------- 2. files / jobs 登録 + Celery task 投入 -------------------------
+    return await run_in_threadpool(
+        register_upload,
+        file_id, file.filename, file.content_type, stored, user, force_transcribe,
     )
-
-    sess = SessionLocal()
-    try:
-        sess.add(
-            M.Job(
-                id=job_id,          # ← primary key を task.id に固定
-                task_id=task.id,
-                status=M.JobStatus.PENDING,
-                user_id=user.id,
-            )
-        )
-        sess.commit()
-    finally:
-        sess.close()
-
-    # ---------- 4. task 引数を確定させる --------------------------------------
-    return {"file_id": file_id, "task_id": job_id}
@@ -1,17 +1,29 @@
 from __future__ import annotations
 
+from contextlib import aclosing
 from datetime import datetime
 from enum import Enum
-from typing import List
+from typing import AsyncIterator, List
 
 from celery.result import AsyncResult
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from common.security import current_active_user
+from common.models.user import User
+
 from ..db import SessionLocal  # sync Session maker
 from ..db import models as M
+from ..services.progress import progress_events
+from ..services.sse import KEEPALIVE, SSE_HEADERS, sse_event
+from shared import job_progress as P
+from shared import outbox
 from shared.celery_app import celery_app
+from shared.stt_transcribe import stt_queue_for, transcribe_and_generate_minutes
 
 # ---------------------------------------------------------------------------
 # Dependency
@@ -41,6 +53,7 @@ class JobOut(BaseModel):
     status: JobStatus
     created_at: datetime
     updated_at: datetime | None = None
+    metrics: dict | None = None
 
     class Config:
         orm_mode = True          # ← SQLAlchemy Row → Pydantic dict
@@ -51,6 +64,8 @@ class JobOut(BaseModel):
 
 router = APIRouter(prefix="/api", tags=["jobs"])
 
+KEEPALIVE_SEC = 15
+
 # --- DB-backed endpoints ----------------------------------------------------
 
 @router.get("/jobs", response_model=List[JobOut])
@@ -67,6 +82,103 @@ def get_job(job_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
+
+def _load_owned_job(job_id: str, user: User) -> M.Job:
+    """所有者の Job を返す (他人のジョブは存在しないものとして 404)"""
+    sess = SessionLocal()
+    try:
+        job = sess.get(M.Job, job_id)
+        if not job or (job.user_id is not None and job.user_id != user.id):
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    finally:
+        sess.close()
+
+
+def _terminal_event(job_id: str) -> dict | None:
+    """Redis の snapshot が無いとき用: DB 上で終わっているジョブの終端イベント"""
+    sess = SessionLocal()
+    try:
+        job = sess.get(M.Job, job_id)
+        if job is None or job.status == M.JobStatus.FAILED:
+            return {"job_id": job_id, "stage": P.FAILED}
+        if job.status == M.JobStatus.DRAFT_READY:
+            return {"job_id": job_id, "stage": P.DRAFT_READY, "transcript_id": job.transcript_id}
+        return None
+    finally:
+        sess.close()
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    request: Request,
+    user: User = Depends(current_active_user),
+):
+    """
+    ジョブ進捗を Server-Sent Events で配信する (Redis pub/sub 経由)。
+
+    接続直後に最新イベントを 1 件送り、以降は届いた順に転送する。
+    draft_ready / failed で終了。snapshot が切れた完了済みジョブは DB の状態で終端を送る。
+    """
+    await run_in_threadpool(_load_owned_job, job_id, user)
+
+    async def _on_missing() -> dict | None:
+        return await run_in_threadpool(_terminal_event, job_id)
+
+    async def _events() -> AsyncIterator[str]:
+        async with aclosing(progress_events(job_id, KEEPALIVE_SEC, _on_missing)) as events:
+            async for event in events:
+                if await request.is_disconnected():
+                    return
+                yield KEEPALIVE if event is None else sse_event(event, event="progress")
+
+    return StreamingResponse(
+        _events(), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+@router.post("/jobs/{job_id}/resume", response_model=JobOut)
+def resume_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    user: User = Depends(current_active_user),
+):
+    """
+    FAILED になった STT ジョブを再投入する。
+    完了済みセグメントは stt_checkpoints から再利用され、残りだけ Whisper に送られる。
+    """
+    job = db.get(M.Job, job_id)
+    if not job or (job.user_id is not None and job.user_id != user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != M.JobStatus.FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job.status.value}, only FAILED jobs can be resumed",
+        )
+    if not job.file_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Job has no source file"
+        )
+
+    job.status = M.JobStatus.PENDING
+    row = outbox.enqueue(
+        db,
+        transcribe_and_generate_minutes.name,
+        args=(job.file_id, job.id, str(user.id)),
+        kwargs={"language": (job.metrics or {}).get("language")},
+        task_id=job.task_id,
+        # 初回の worker が測った files.duration_sec で振り分ける (API では ffprobe しない)
+        queue=stt_queue_for(db.scalar(
+            select(M.File.duration_sec).where(M.File.file_id == job.file_id)
+        )),
+    )
+    db.flush()
+    outbox_ids = [row.id]
+    db.commit()
+    outbox.dispatch_after_commit(outbox_ids)
+    return job
+
 # --- legacy Celery polling (kept for compatibility) ------------------------
 
 @router.get("/tasks/{task_id}")
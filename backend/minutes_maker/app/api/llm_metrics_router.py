@@ -0,0 +1,124 @@
+"""LLM call telemetry (``minutes.llm_calls``) aggregated for the dashboard.
+
+* **GET /api/llm_metrics/usage?days=7** – per day × model × endpoint × operation:
+  call / error / cache-hit / retry counts, p50 / p95 latency and token spend
+* **GET /api/llm_metrics/live** – this process's in-memory gateway counters and
+  completion cache hit stats (no DB)
+
+Superusers see every row; other users only the calls made on their behalf.
+Latency percentiles and token spend exclude cache hits (no OpenAI round trip,
+nothing billed).
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlalchemy import Integer, case, func, select
+from sqlalchemy.orm import Session
+
+from common.security import current_active_user
+from common.models.user import User
+from shared import llm_gateway
+
+from ..db import SessionLocal, models as M
+
+router = APIRouter(prefix="/api/llm_metrics", tags=["llm-metrics"])
+
+
+def get_db() -> Session:  # pragma: no cover
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class UsageRow(BaseModel):
+    day: date
+    model: str
+    endpoint: str
+    operation: Optional[str] = None
+    calls: int
+    errors: int
+    cache_hits: int
+    retries: int
+    p50_latency_ms: Optional[float] = None
+    p95_latency_ms: Optional[float] = None
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: Optional[float] = None  # 料金表 (LLM_PRICES) に無いモデルは null
+
+
+@router.get("/usage", response_model=List[UsageRow])
+def llm_usage(
+    days: int = Query(7, ge=1, le=90, description="今日を含む集計日数 (UTC)"),
+    model: Optional[str] = Query(None),
+    endpoint: Optional[str] = Query(None, description="chat / chat_stream / embeddings / transcriptions"),
+    operation: Optional[str] = Query(None, description="minutes_draft / ai_edit / agent ..."),
+    db: Session = Depends(get_db),
+    user: User = Depends(current_active_user),
+):
+    c = M.LlmCall
+    since = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    since -= timedelta(days=days - 1)
+
+    billed = ~c.cache_hit
+    latency = case((billed, c.latency_ms))  # cache hit は NULL → percentile の対象外
+    day = func.date(func.timezone("UTC", c.created_at)).label("day")
+    stmt = (
+        select(
+            day,
+            c.model,
+            c.endpoint,
+            c.operation,
+            func.count().label("calls"),
+            func.count().filter(~c.ok).label("errors"),
+            func.count().filter(c.cache_hit).label("cache_hits"),
+            func.coalesce(func.sum(func.greatest(c.attempts - 1, 0)), 0).label("retries"),
+            func.percentile_cont(0.5).within_group(latency).label("p50"),
+            func.percentile_cont(0.95).within_group(latency).label("p95"),
+            func.coalesce(func.sum(c.prompt_tokens).filter(billed), 0).cast(Integer).label("prompt_tokens"),
+            func.coalesce(func.sum(c.completion_tokens).filter(billed), 0).cast(Integer).label("completion_tokens"),
+        )
+        .where(c.created_at >= since)
+        .group_by(day, c.model, c.endpoint, c.operation)
+        .order_by(day.desc(), c.model, c.endpoint, c.operation)
+    )
+    if not user.is_superuser:
+        stmt = stmt.where(c.user_id == user.id)
+    if model:
+        stmt = stmt.where(c.model == model)
+    if endpoint:
+        stmt = stmt.where(c.endpoint == endpoint)
+    if operation:
+        stmt = stmt.where(c.operation == operation)
+
+    return [
+        UsageRow(
+            day=r.day,
+            model=r.model,
+            endpoint=r.endpoint,
+            operation=r.operation,
+            calls=r.calls,
+            errors=r.errors,
+            cache_hits=r.cache_hits,
+            retries=r.retries,
+            p50_latency_ms=r.p50,
+            p95_latency_ms=r.p95,
+            prompt_tokens=r.prompt_tokens,
+            completion_tokens=r.completion_tokens,
+            cost_usd=llm_gateway.cost_usd(r.model, r.prompt_tokens, r.completion_tokens),
+        )
+        for r in db.execute(stmt)
+    ]
+
+
+@router.get("/live")
+def llm_live(user: User = Depends(current_active_user)):
+    return {
+        "calls": llm_gateway.metrics_snapshot(),
+        "cache": llm_gateway.cache_stats(),
+    }
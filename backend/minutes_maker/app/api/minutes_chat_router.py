@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
+from shared import llm_gateway
+from shared.prompt_budget import PromptTooLarge
 from ..db import SessionLocal
 from ..db.models import MinutesVersion  # 正しい ORM を import&#8203;:contentReference[oaicite:4]{index=4}
 from ..schemas.chat import ChatRequest, ChatResponse
-from ..services.llm import complete_with_minutes
+from ..services import llm_stream
+from ..services.llm import complete_with_minutes, llm_cache_enabled, stream_with_minutes
 
 router = APIRouter(prefix="/api", tags=["minutes_chat"])
 
@@ -19,12 +22,7 @@ def get_db() -> Session:  # pragma: no cover
         db.close()
 
 
-@router.post("/minutes_chat/{transcript_id}", response_model=ChatResponse)  # ← 先頭スラッシュ必須&#8203;:contentReference[oaicite:5]{index=5}
-def chat_edit_minutes(
-    transcript_id: int,
-    payload: ChatRequest,
-    db: Session = Depends(get_db),
-):
+def _latest_version(db: Session, transcript_id: int) -> MinutesVersion:
     latest: MinutesVersion | None = (
         db.query(MinutesVersion)
         .filter(MinutesVersion.transcript_id == transcript_id)
@@ -33,27 +31,110 @@ def chat_edit_minutes(
     )
     if latest is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Minutes not found")
+    return latest
 
-    assistant_msg, updated_md = complete_with_minutes(
-        user_messages=payload.messages,
-        user_input=payload.user_input,
-        current_minutes=latest.markdown,
+
+def _store_if_changed(
+    db: Session,
+    latest: MinutesVersion,
+    updated_md: str,
+    created_by: str | None,
+    meta: dict | None = None,
+) -> MinutesVersion:
+    """更新後 Markdown が latest と異なれば新しい版として保存し、その版を返す"""
+    if updated_md.strip() == latest.markdown.strip():
+        return latest
+    target = MinutesVersion(
+        transcript_id=latest.transcript_id,
+        version_no=latest.version_no + 1,
+        markdown=updated_md,
+        created_by=created_by or "ui_user",
+        meta=meta,
     )
+    db.add(target)
+    db.commit()
+    db.refresh(target)
+    return target
 
-    target = latest
-    if updated_md.strip() != latest.markdown.strip():
-        target = MinutesVersion(
-            transcript_id=transcript_id,
-            version_no=latest.version_no + 1,
-            markdown=updated_md,
-            created_by=payload.user_id or "ui_user",
-        )
-        db.add(target)
-        db.commit()
-        db.refresh(target)
+
+@router.post("/minutes_chat/{transcript_id}", response_model=ChatResponse)  # ← 先頭スラッシュ必須&#8203;:contentReference[oaicite:5]{index=5}
+def chat_edit_minutes(
+    transcript_id: int,
+    payload: ChatRequest,
+    db: Session = Depends(get_db),
+    use_cache: bool = Depends(llm_cache_enabled),
+):
+    latest = _latest_version(db, transcript_id)
+
+    try:
+        with llm_gateway.tagged(
+            operation="minutes_chat", transcript_id=transcript_id, user_id=latest.user_id
+        ):
+            assistant_msg, updated_md, meta = complete_with_minutes(
+                user_messages=payload.messages,
+                user_input=payload.user_input,
+                current_minutes=latest.markdown,
+                use_cache=use_cache,
+            )
+    except PromptTooLarge as exc:
+        raise HTTPException(413, str(exc)) from exc
+
+    target = _store_if_changed(db, latest, updated_md, payload.user_id, meta=meta)
 
     return ChatResponse(
         assistant_message=assistant_msg,
         version_id=target.id,
         markdown=target.markdown,
     )
+
+
+@router.post("/minutes_chat/{transcript_id}/stream")
+def stream_chat_edit_minutes(
+    transcript_id: int,
+    payload: ChatRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """
+    chat_edit_minutes のストリーミング版 (text/event-stream)。
+
+    ``message`` / ``minutes`` イベントで返答と議事録をトークン単位で送り、
+    最後の ``done`` で ChatResponse と同じ内容を返す。切断された場合は
+    途中までの議事録を版として保存しない。
+    """
+    latest = _latest_version(db, transcript_id)
+    latest_id = latest.id
+    try:
+        deltas = stream_with_minutes(
+            user_messages=payload.messages,
+            user_input=payload.user_input,
+            current_minutes=latest.markdown,
+            tags={
+                "operation": "minutes_chat_stream",
+                "transcript_id": transcript_id,
+                "user_id": latest.user_id,
+            },
+        )
+    except PromptTooLarge as exc:
+        raise HTTPException(413, str(exc)) from exc
+
+    def _finish(outcome: str, texts: dict[str, str]) -> dict | None:
+        if outcome != llm_stream.COMPLETED:
+            return None
+        # リクエストの Session はレスポンス送信前に閉じられるので別に開く
+        sess = SessionLocal()
+        try:
+            base = sess.get(MinutesVersion, latest_id)
+            updated_md = texts.get(llm_stream.MINUTES) or base.markdown
+            target = _store_if_changed(
+                sess, base, updated_md, payload.user_id, meta={"stream": outcome}
+            )
+            return ChatResponse(
+                assistant_message=texts.get(llm_stream.MESSAGE, ""),
+                version_id=target.id,
+                markdown=target.markdown,
+            ).model_dump()
+        finally:
+            sess.close()
+
+    return llm_stream.stream_response(request, deltas, _finish)
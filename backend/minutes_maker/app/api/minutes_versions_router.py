@@ -10,30 +10,37 @@ This router now supports:
 * **GET   /api/minutes_versions/{from_id}/diff/{to_id}?html=1** – diff two versions (HTML or unified)
 * **POST  /api/minutes_versions/{vid}/rollback** – copy an old version as the newest one
 * **POST  /api/minutes_versions/{vid}/ai_edit** – generate a new edited version via OpenAI­‑Chat
+  (long minutes: the model returns edit operations that are applied server-side,
+  falling back to full regeneration when they do not apply cleanly)
+* **POST  /api/minutes_versions/{vid}/ai_edit/stream** – same, streamed token by token as SSE
 
 The endpoints unblock **version switching** and **AI based editing** in the React
 front‑end.  They return compact JSON that the existing SWR hooks can consume.
 """
 from __future__ import annotations
 
+import logging
 from datetime import datetime
 from difflib import HtmlDiff, unified_diff
 
-from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
 from pydantic import BaseModel, Field
 from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 from common.security import current_active_user
 from common.models.user import User
 
-from openai import OpenAI
+from shared import llm_gateway
+from shared import prompt_budget as PB
 
 from ..db import models as M
 from .. import SessionLocal
+from ..services import llm_stream, minutes_patch
+from ..services.llm import llm_cache_enabled
 
-router = APIRouter(prefix="/api", tags=["minutes-versions"])
+logger = logging.getLogger(__name__)
 
-oai = OpenAI()  # requires OPENAI_API_KEY in env
+router = APIRouter(prefix="/api", tags=["minutes-versions"])
 
 # ---------------------------------------------------------------------------
 # Dependencies
@@ -62,6 +69,7 @@ class MinutesVersionOut(BaseModel):
     markdown: str
     created_by: str
     created_at: datetime
+    meta: dict | None = None
 
     class Config:
         from_attributes = True
@@ -222,57 +230,140 @@ def rollback_version(
 # Routes – AI edit
 # ---------------------------------------------------------------------------
 
-@router.post(
-    "/minutes_versions/{vid}/ai_edit",
-    response_model=MinutesVersionOut,
-    status_code=status.HTTP_201_CREATED,
-)
-def ai_edit_version(
-    vid: int,
-    body: AIEditIn,
-    db: Session = Depends(get_db),
-):
-    """Let GPT polish or transform the minutes and store as a new version."""
-    mv = db.get(M.MinutesVersion, vid)
-    if mv is None:
-        raise HTTPException(status_code=404, detail="Version not found")
+_AI_EDIT_SYSTEM = "あなたは優秀な議事録編集者です。"
 
-    # Call OpenAI with a concise system prompt so we stay in the free tier token limit
-    prompt = (
-        "以下は議事録の Markdown です。指示に従い編集し、Markdown でのみ回答してください。\n\n"
+
+def _ai_edit_user_prompt(mv: M.MinutesVersion, body: AIEditIn, answer: str) -> str:
+    return (
+        f"以下は議事録の Markdown です。指示に従い編集し、{answer}\n\n"
         "---\n" + mv.markdown + "\n---\n\n指示: " + body.instruction
     )
 
-    rsp = oai.chat.completions.create(
-        model=body.model,
-        messages=[
-            {"role": "system", "content": "あなたは優秀な議事録編集者です。"},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.3,
-    )
-    new_markdown: str = rsp.choices[0].message.content.strip()
 
+def _ai_edit_prompt(mv: M.MinutesVersion, body: AIEditIn) -> tuple[list[dict], PB.PromptEstimate]:
+    """ai_edit の messages と見積もり (収まらなければ 413)"""
+    # Call OpenAI with a concise system prompt so we stay in the free tier token limit
+    messages = [
+        {"role": "system", "content": _AI_EDIT_SYSTEM},
+        {"role": "user", "content": _ai_edit_user_prompt(mv, body, "Markdown でのみ回答してください。")},
+    ]
+    # 編集後の文書は元と同程度の長さになる前提で completion 分を確保する
+    try:
+        est = PB.estimate(
+            messages, body.model, completion_tokens=PB.count_tokens(mv.markdown, body.model)
+        )
+    except PB.PromptTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    return messages, est
+
+
+def _store_ai_edit(
+    db: Session, transcript_id: int, markdown: str, body: AIEditIn, meta: dict
+) -> M.MinutesVersion:
     next_no: int = (
         db.execute(
             select(func.coalesce(func.max(M.MinutesVersion.version_no), 0) + 1).where(
-                M.MinutesVersion.transcript_id == mv.transcript_id
+                M.MinutesVersion.transcript_id == transcript_id
             )
         ).scalar_one()
     )
 
     new_mv = M.MinutesVersion(
-        transcript_id=mv.transcript_id,
+        transcript_id=transcript_id,
         version_no=next_no,
-        markdown=new_markdown,
+        markdown=markdown,
         created_by=body.created_by,
         created_at=datetime.utcnow(),
+        meta={"model": body.model, "strategy": "ai_edit", **meta},
     )
     db.add(new_mv)
     db.commit()
     db.refresh(new_mv)
     return new_mv
 
+
+@router.post(
+    "/minutes_versions/{vid}/ai_edit",
+    response_model=MinutesVersionOut,
+    status_code=status.HTTP_201_CREATED,
+)
+def ai_edit_version(
+    vid: int,
+    body: AIEditIn,
+    db: Session = Depends(get_db),
+    use_cache: bool = Depends(llm_cache_enabled),
+):
+    """Let GPT polish or transform the minutes and store as a new version."""
+    mv = db.get(M.MinutesVersion, vid)
+    if mv is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    messages, est = _ai_edit_prompt(mv, body)
+    meta = est.as_meta()
+    new_markdown: str | None = None
+    with llm_gateway.tagged(operation="ai_edit", transcript_id=mv.transcript_id, user_id=mv.user_id):
+        # 長い議事録は変更箇所だけを返させて当てる (当たらなければ全文生成)
+        if minutes_patch.use_patch(mv.markdown, body.model):
+            patch_messages = [
+                {"role": "system", "content": _AI_EDIT_SYSTEM + minutes_patch.PATCH_FORMAT},
+                {"role": "user", "content": _ai_edit_user_prompt(mv, body, "変更箇所だけを返してください。")},
+            ]
+            try:
+                result = minutes_patch.request_edits(
+                    body.model, patch_messages, mv.markdown, cache=use_cache
+                )
+                new_markdown = result.markdown
+                meta.update(minutes_patch.patch_meta(result))
+            except minutes_patch.PatchFailed as exc:
+                logger.info("ai_edit patch failed for version %s, regenerating: %s", vid, exc)
+                meta.update(minutes_patch.fallback_meta(exc))
+        if new_markdown is None:
+            rsp = llm_gateway.chat(body.model, messages, temperature=0.3, cache=use_cache)
+            new_markdown = rsp.choices[0].message.content.strip()
+            meta.setdefault("edit_mode", "full")
+    return _store_ai_edit(db, mv.transcript_id, new_markdown, body, meta)
+
+
+@router.post("/minutes_versions/{vid}/ai_edit/stream")
+def stream_ai_edit_version(
+    vid: int,
+    body: AIEditIn,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """Streaming variant of *ai_edit* (text/event-stream).
+
+    Markdown tokens arrive as ``minutes`` events; the stored version is sent as
+    the final ``done`` event.  If the client disconnects nothing is stored: a
+    cut-off document must not become the latest version.
+    """
+    mv = db.get(M.MinutesVersion, vid)
+    if mv is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    messages, est = _ai_edit_prompt(mv, body)
+    transcript_id = mv.transcript_id
+    tags = {"operation": "ai_edit_stream", "transcript_id": transcript_id, "user_id": mv.user_id}
+    deltas = llm_stream.chat_deltas(body.model, messages, tags, temperature=0.3)
+
+    def _finish(outcome: str, texts: dict[str, str]) -> dict | None:
+        markdown = texts.get(llm_stream.MINUTES)
+        if outcome != llm_stream.COMPLETED or not markdown:
+            return None
+        # the request-scoped Session is closed before the body is streamed
+        sess = SessionLocal()
+        try:
+            new_mv = _store_ai_edit(
+                sess, transcript_id, markdown, body, {**est.as_meta(), "stream": outcome}
+            )
+            return MinutesVersionOut.model_validate(new_mv).model_dump(mode="json")
+        finally:
+            sess.close()
+
+    return llm_stream.stream_response(
+        request, llm_stream.single_event(deltas, llm_stream.MINUTES), _finish
+    )
+
 # ---------------------------------------------------------------------------
 # End of file
 # ---------------------------------------------------------------------------
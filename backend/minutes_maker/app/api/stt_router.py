@@ -4,18 +4,33 @@
 POST multipart/form-data
   • audio=<file>    : mp3 / wav / m4a / mp4 など
   • lang=<ISO code> : ja / en / id … （省略可。自動判定）
+  • wait=<秒>       : 大きな音声をパイプラインへ回したとき、完了を待つ最大秒数 (省略時 0)
 
-返却 JSON
+返却 JSON (201)
 {
   "file_id":        "<uuid>",
   "transcript_id":  <int>,
   "content":        "<文字起こし結果>",
   "language":       "<ISO code | null>"
 }
+
+Whisper の上限 (MAX_BYTES) を超える、または STT_DIRECT_MAX_SEC より長い音声は
+Celery の分割パイプライン (POST /api/files と同じ) へ自動で回す。
+wait 秒以内に文字起こしが終われば 201 で同じ形を返し、
+終わらなければ 202 + {file_id, job_id} を返す (進捗は /api/jobs/{job_id}/events)。
+
+Whisper 呼び出しは shared.llm_gateway の async クライアントで行い event loop を塞がない
+(リトライ / レート制限も gateway 側)。
+プロセス当たりの同時実行数は STT_MAX_INFLIGHT で制限し、
+埋まっているときは待たせずに 503 + Retry-After を返す。
 """
 
 from __future__ import annotations
 
+import asyncio
+import os
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncIterator
 from uuid import uuid4
 
 from fastapi import (
@@ -27,28 +42,32 @@ from fastapi import (
     UploadFile,
     status,
 )
-from openai import OpenAI, OpenAIError
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from openai import OpenAIError
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from tenacity import retry, stop_after_attempt, wait_exponential_jitter
 from common.security import current_active_user
 from common.models.user import User
 
 from ..db import SessionLocal, models as M
+from ..services.progress import progress_events
+from ..services.uploads import register_upload
+from shared import job_progress as P
+from shared import llm_gateway
+from shared import stt_transcribe as stt
+from shared.storage import save_upload
 
 router = APIRouter(prefix="/stt", tags=["stt"])
-oai = OpenAI()  # env var OPENAI_API_KEY
 
+# 1 プロセスで同時に走らせる Whisper 呼び出しの上限 (リトライ待ちも含む)
+STT_MAX_INFLIGHT = int(os.getenv("STT_MAX_INFLIGHT", "4"))
+STT_RETRY_AFTER_SEC = int(os.getenv("STT_RETRY_AFTER_SEC", "10"))
+STT_TIMEOUT_SEC = float(os.getenv("STT_TIMEOUT_SEC", "300"))
+# これより長い音声は直接パスではなくパイプラインへ (分割並列の方が速い)
+STT_DIRECT_MAX_SEC = float(os.getenv("STT_DIRECT_MAX_SEC", "900"))
+STT_WAIT_MAX_SEC = float(os.getenv("STT_WAIT_MAX_SEC", "300"))
 
-# --------------------------------------------------------------------------- #
-# DB dependency
-# --------------------------------------------------------------------------- #
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+_inflight = asyncio.Semaphore(STT_MAX_INFLIGHT)
 
 
 # --------------------------------------------------------------------------- #
@@ -64,28 +83,141 @@ class TranscriptOut(BaseModel):
         from_attributes = True
 
 
+class JobHandleOut(BaseModel):
+    file_id: str
+    job_id: str
+    events_url: str
+
+
 # --------------------------------------------------------------------------- #
-# Whisper helper (with retry)
+# Whisper helper (with retry / concurrency cap)
 # --------------------------------------------------------------------------- #
-@retry(wait=wait_exponential_jitter(1, 20), stop=stop_after_attempt(4))
-def _transcribe(
+@asynccontextmanager
+async def _whisper_slot() -> AsyncIterator[None]:
+    """空きがあれば枠を確保、無ければ即 503 (キューに積まない)"""
+    if _inflight.locked():
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Whisper is busy, retry later",
+            headers={"Retry-After": str(STT_RETRY_AFTER_SEC)},
+        )
+    async with _inflight:
+        yield
+
+
+async def _transcribe(
     filename: str,
     content: bytes,
     mime: str,
     language: str | None = None,
-) -> str:
+) -> dict:
+    """パイプラインと同じ Whisper 設定 (verbose_json) で 1 回だけ文字起こし"""
     try:
-        rsp = oai.audio.transcriptions.create(
-            model="whisper-1",
-            file=(filename, content, mime),
-            response_format="text",
-            language=language,
+        return await stt.atranscribe(
+            filename, content, mime, language=language, timeout=STT_TIMEOUT_SEC
         )
-        return rsp  # type: ignore[return-value]
     except OpenAIError as e:
         raise RuntimeError(str(e)) from e
 
 
+def _store_direct(
+    filename: str | None,
+    content_type: str | None,
+    result: dict,
+    lang: str | None,
+    user_id,
+) -> TranscriptOut:
+    """File / Transcript / チャンクを保存する (同期 DB 処理なのでスレッドプールで呼ぶ)"""
+    file_id = str(uuid4())
+    sess = SessionLocal()
+    try:
+        sess.add(
+            M.File(
+                file_id=file_id,
+                filename=filename,
+                mime_type=content_type,
+                user_id=user_id,
+            )
+        )
+        tr, _ = stt.add_transcript(
+            sess, file_id, result["text"], result["segments"], user_id, language=lang
+        )
+        sess.commit()
+        return TranscriptOut(
+            file_id=file_id, transcript_id=tr.id, content=result["text"], language=lang
+        )
+    finally:
+        sess.close()
+
+
+# --------------------------------------------------------------------------- #
+# Pipeline fallback
+# --------------------------------------------------------------------------- #
+async def _wait_for_transcript(job_id: str, timeout: float) -> int | None:
+    """パイプラインの進捗を購読し、transcript_id が出たら返す (timeout で None)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    async with aclosing(progress_events(job_id, poll_sec=1.0)) as events:
+        async for event in events:
+            if event is not None:
+                if event["stage"] == P.FAILED:
+                    raise HTTPException(502, f"transcription job {job_id} failed")
+                if event.get("transcript_id"):
+                    return int(event["transcript_id"])
+            if loop.time() >= deadline:
+                return None
+    return None
+
+
+def _load_transcript(transcript_id: int) -> M.Transcript | None:
+    sess = SessionLocal()
+    try:
+        return sess.get(M.Transcript, transcript_id)
+    finally:
+        sess.close()
+
+
+async def _hand_off_to_pipeline(
+    audio: UploadFile,
+    lang: str | None,
+    wait: float,
+    user: User,
+    duration: float | None = None,
+):
+    await audio.seek(0)
+    file_id = str(uuid4())
+    try:
+        stored = await run_in_threadpool(save_upload, audio.file, file_id, audio.filename)
+    except Exception as exc:
+        raise HTTPException(500, f"disk save failed: {exc}") from exc
+    handle = await run_in_threadpool(
+        register_upload,
+        file_id,
+        audio.filename,
+        audio.content_type,
+        stored,
+        user,
+        language=lang,
+        duration_sec=duration,
+    )
+    job_id = handle["task_id"]
+
+    transcript_id = await _wait_for_transcript(job_id, wait) if wait > 0 else None
+    tr = await run_in_threadpool(_load_transcript, transcript_id) if transcript_id else None
+    if tr is not None:
+        return TranscriptOut(
+            file_id=file_id, transcript_id=tr.id, content=tr.content, language=tr.language
+        )
+
+    return JSONResponse(
+        JobHandleOut(
+            file_id=file_id, job_id=job_id, events_url=f"/api/jobs/{job_id}/events"
+        ).model_dump(),
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/api/jobs/{job_id}"},
+    )
+
+
 # --------------------------------------------------------------------------- #
 # Endpoint
 # --------------------------------------------------------------------------- #
@@ -93,6 +225,7 @@ def _transcribe(
     "",  # accepts both /stt and /stt/
     response_model=TranscriptOut,
     status_code=status.HTTP_201_CREATED,
+    responses={202: {"model": JobHandleOut, "description": "パイプラインへ回した (未完了)"}},
 )
 async def create_transcript(
     audio: UploadFile = File(...),
@@ -100,7 +233,12 @@ async def create_transcript(
         None,
         description="ISO-639 言語コード。省略時は Whisper 自動判定",
     ),
-    db: Session = Depends(get_db),
+    wait: float = Form(
+        0,
+        ge=0,
+        le=STT_WAIT_MAX_SEC,
+        description="パイプラインへ回した場合に完了を待つ最大秒数",
+    ),
     user: User = Depends(current_active_user),
 ):
     # --- basic type check ----------------------------------------------------
@@ -118,38 +256,28 @@ async def create_transcript(
             f"Unsupported media type: {ctype or 'unknown'}",
         )
 
-    # --- read bytes & call Whisper ------------------------------------------
-    data = await audio.read()
-    try:
-        text: str = _transcribe(audio.filename, data, audio.content_type, language=lang)
-    except RuntimeError as e:
-        raise HTTPException(502, f"Whisper API error: {e}") from e
+    # --- large / long input → chunked pipeline ------------------------------
+    if audio.size is not None and audio.size > stt.MAX_BYTES:
+        return await _hand_off_to_pipeline(audio, lang, wait, user)
 
-    # --- persist to DB -------------------------------------------------------
-    file_id = str(uuid4())
+    data = await audio.read()
+    if len(data) > stt.MAX_BYTES:
+        return await _hand_off_to_pipeline(audio, lang, wait, user)
+    duration = await run_in_threadpool(stt.probe_bytes_duration, data)
+    if duration is not None and duration > STT_DIRECT_MAX_SEC:
+        return await _hand_off_to_pipeline(audio, lang, wait, user, duration)
 
-    file_row = M.File(
-        file_id=file_id,
-        filename=audio.filename,
-        mime_type=audio.content_type,
-        user_id=user.id,
-    )
-    db.add(file_row)
+    # --- small input → direct Whisper call ----------------------------------
+    async with _whisper_slot():
+        try:
+            with llm_gateway.tagged(operation="stt_direct", user_id=user.id):
+                result = await _transcribe(
+                    audio.filename, data, audio.content_type, language=lang
+                )
+        except RuntimeError as e:
+            raise HTTPException(502, f"Whisper API error: {e}") from e
 
-    trans_row = M.Transcript(
-        file_id=file_id,
-        language=lang,
-        content=text,
-        user_id=user.id,
-    )
-    db.add(trans_row)
-    db.commit()
-    db.refresh(trans_row)
-
-    # --- response ------------------------------------------------------------
-    return TranscriptOut(
-        file_id=file_id,
-        transcript_id=trans_row.id,
-        content=text,
-        language=lang,
+    # --- persist to DB (チャンクの一括 INSERT を含むのでスレッドプールで) -------
+    return await run_in_threadpool(
+        _store_direct, audio.filename, audio.content_type, result, lang, user.id
     )
@@ -0,0 +1,180 @@
+"""再開可能 (tus 風) な音声アップロード API。
+
+長時間の会議録音を不安定な回線で送るとき、途中で切れても続きから送り直せる。
+
+1. POST   /api/uploads                    … アップロード作成 (filename, size)
+2. HEAD   /api/uploads/{file_id}          … 受信済みバイト数 (Upload-Offset) を確認
+3. PATCH  /api/uploads/{file_id}          … Upload-Offset の位置から続きを追記
+4. POST   /api/uploads/{file_id}/finalize … 全バイト受信後に files / jobs を作成し
+                                             STT タスクを投入 (POST /api/files と同じ)
+5. DELETE /api/uploads/{file_id}          … 中断して破棄
+
+PATCH 本文はチャンクのまま part ファイルへ追記するのでメモリは一定。
+"""
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from common.security import current_active_user
+from common.models.user import User
+
+from minutes_maker.app.services.uploads import (
+    PartialUpload,
+    UploadLocked,
+    register_upload,
+    sweep_stale_partials,
+)
+from shared.storage import COPY_CHUNK_BYTES, UPLOAD_MAX_BYTES, promote_partial
+
+router = APIRouter(prefix="/api", tags=["uploads"])
+
+
+# --------------------------------------------------------------------------- #
+#  schema
+# --------------------------------------------------------------------------- #
+class UploadCreate(BaseModel):
+    filename: str = Field(..., min_length=1)
+    size: int = Field(..., gt=0, description="総バイト数")
+    content_type: str | None = None
+    force_transcribe: bool = False
+
+
+# --------------------------------------------------------------------------- #
+#  helpers
+# --------------------------------------------------------------------------- #
+def _get_upload(file_id: str, user: User) -> PartialUpload:
+    upload = PartialUpload.load(file_id)
+    if not upload or upload.user_id != str(user.id):
+        raise HTTPException(404, "Upload not found")
+    return upload
+
+
+def _offset_headers(upload: PartialUpload, offset: int | None = None) -> dict:
+    return {
+        "Upload-Offset": str(upload.offset if offset is None else offset),
+        "Upload-Length": str(upload.length),
+        "Cache-Control": "no-store",
+    }
+
+
+async def _append_body(upload: PartialUpload, request: Request) -> int:
+    """本文を COPY_CHUNK_BYTES 単位でまとめて part ファイルへ追記し、新しいオフセットを返す"""
+    written = upload.offset
+    buf = bytearray()
+    with upload.part_path.open("ab") as out:
+        try:
+            async for chunk in request.stream():
+                if written + len(buf) + len(chunk) > upload.length:
+                    raise HTTPException(413, "chunk exceeds declared Upload-Length")
+                buf += chunk
+                if len(buf) >= COPY_CHUNK_BYTES:
+                    await run_in_threadpool(out.write, bytes(buf))
+                    written += len(buf)
+                    buf.clear()
+        finally:
+            # 切断されても受信済みの分は残し、次の PATCH で続きから送れるようにする
+            if buf:
+                await run_in_threadpool(out.write, bytes(buf))
+                written += len(buf)
+    return written
+
+
+# --------------------------------------------------------------------------- #
+#  endpoints
+# --------------------------------------------------------------------------- #
+@router.post("/uploads", status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    body: UploadCreate,
+    response: Response,
+    user: User = Depends(current_active_user),
+):
+    if body.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(413, f"upload exceeds {UPLOAD_MAX_BYTES} bytes")
+    await run_in_threadpool(sweep_stale_partials)
+
+    upload = PartialUpload.create(
+        filename=body.filename,
+        content_type=body.content_type,
+        length=body.size,
+        user_id=str(user.id),
+        force_transcribe=body.force_transcribe,
+    )
+    response.headers.update(_offset_headers(upload, 0))
+    response.headers["Location"] = f"/api/uploads/{upload.file_id}"
+    return {"file_id": upload.file_id, "offset": 0, "length": upload.length}
+
+
+@router.head("/uploads/{file_id}")
+def get_upload_offset(file_id: str, user: User = Depends(current_active_user)):
+    upload = _get_upload(file_id, user)
+    return Response(status_code=200, headers=_offset_headers(upload))
+
+
+@router.patch("/uploads/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def append_upload(
+    file_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    user: User = Depends(current_active_user),
+):
+    upload = _get_upload(file_id, user)
+    try:
+        with upload.locked():
+            current = upload.offset
+            if upload_offset != current:
+                raise HTTPException(
+                    status.HTTP_409_CONFLICT,
+                    detail=f"Upload-Offset mismatch (server has {current})",
+                    headers=_offset_headers(upload, current),
+                )
+            offset = await _append_body(upload, request)
+    except UploadLocked:
+        raise HTTPException(status.HTTP_423_LOCKED, "another request is writing this upload")
+
+    return Response(
+        status_code=status.HTTP_204_NO_CONTENT, headers=_offset_headers(upload, offset)
+    )
+
+
+@router.post("/uploads/{file_id}/finalize")
+async def finalize_upload(file_id: str, user: User = Depends(current_active_user)):
+    upload = _get_upload(file_id, user)
+    try:
+        with upload.locked():
+            if upload.offset != upload.length:
+                raise HTTPException(
+                    status.HTTP_409_CONFLICT,
+                    detail=f"upload incomplete ({upload.offset}/{upload.length} bytes)",
+                    headers=_offset_headers(upload),
+                )
+            # 前回の finalize が登録で失敗していれば、移し終えた音声をそのまま使う
+            stored = upload.promoted
+            if stored is None:
+                try:
+                    stored = await run_in_threadpool(
+                        promote_partial, upload.part_path, upload.file_id, upload.filename
+                    )
+                except Exception as exc:
+                    raise HTTPException(500, f"disk save failed: {exc}") from exc
+                upload.mark_promoted(stored)
+            # メタを消すのは登録がコミットされてから (失敗時は finalize を再試行できる)
+            result = await run_in_threadpool(
+                register_upload,
+                upload.file_id,
+                upload.filename,
+                upload.content_type,
+                stored,
+                user,
+                upload.force_transcribe,
+            )
+            upload.discard()
+    except UploadLocked:
+        raise HTTPException(status.HTTP_423_LOCKED, "another request is writing this upload")
+    return result
+
+
+@router.delete("/uploads/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_upload(file_id: str, user: User = Depends(current_active_user)):
+    _get_upload(file_id, user).discard()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -10,8 +10,10 @@ from uuid import uuid4
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import (
     BigInteger,
+    Boolean,
     DateTime,
     Enum as SQLEnum,
+    Float,
     ForeignKey,
     Index,
     Integer,
@@ -20,11 +22,13 @@ from sqlalchemy import (
     Text,
     UniqueConstraint,
     Computed,
+    text,
 )
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.dialects.postgresql import TSVECTOR, UUID as PG_UUID  # ←★UUID 別名
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+# users は別の DeclarativeBase (MetaData) なので、FK と relationship は文字列でなく User を直接参照する
 from common.models.user import User
 
 # --------------------------------------------------------------------------- #
@@ -56,6 +60,8 @@ class File(Base):
     filename: Mapped[str] = mapped_column(Text, nullable=False)
     mime_type: Mapped[Optional[str]]
     duration_sec: Mapped[Optional[float]] = mapped_column(Numeric(7, 2))
+    # 内容ハッシュ (同一音声の再アップロード時に文字起こし結果を再利用)
+    content_sha256: Mapped[Optional[str]] = mapped_column(String(64), index=True)
     uploaded_by: Mapped[Optional[str]]
     uploaded_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=datetime.utcnow
@@ -64,11 +70,11 @@ class File(Base):
     # ★ユーザー関連
     user_id: Mapped[uuid.UUID | None] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("public.users.id", ondelete="SET NULL"),
+        ForeignKey(User.id, ondelete="SET NULL"),
         index=True,
         nullable=True,
     )
-    user: Mapped[User] = relationship("User", lazy="joined")  # optional
+    user: Mapped[User] = relationship(User, lazy="joined")  # optional
 
     transcripts: Mapped[List["Transcript"]] = relationship(
         back_populates="file", cascade="all, delete-orphan"
@@ -103,11 +109,11 @@ class Transcript(Base):
     # ★ユーザー関連
     user_id: Mapped[uuid.UUID | None] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("public.users.id", ondelete="SET NULL"),
+        ForeignKey(User.id, ondelete="SET NULL"),
         index=True,
         nullable=True,
     )
-    user: Mapped[User] = relationship("User", lazy="joined")
+    user: Mapped[User] = relationship(User, lazy="joined")
 
     file: Mapped["File"] = relationship(back_populates="transcripts")
     chunks: Mapped[List["TranscriptChunk"]] = relationship(
@@ -171,15 +177,17 @@ class MinutesVersion(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=datetime.utcnow
     )
+    # 生成方法の記録 (draft_bot: strategy / windows / model など)
+    meta: Mapped[Optional[dict]] = mapped_column(postgresql.JSON)
 
     # ★ユーザー関連
     user_id: Mapped[uuid.UUID | None] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("public.users.id", ondelete="SET NULL"),
+        ForeignKey(User.id, ondelete="SET NULL"),
         index=True,
         nullable=True,
     )
-    user: Mapped[User] = relationship("User", lazy="joined")
+    user: Mapped[User] = relationship(User, lazy="joined")
 
     transcript: Mapped["Transcript"] = relationship(back_populates="versions")
 
@@ -224,6 +232,16 @@ class Job(Base):
     )
     task_id: Mapped[str] = mapped_column(String, unique=True, index=True)
     transcript_id: Mapped[Optional[int]]
+    # 再開 (resume) 時にタスク引数を組み立て直すため
+    file_id: Mapped[Optional[str]] = mapped_column(
+        String, ForeignKey("minutes.files.file_id", ondelete="SET NULL")
+    )
+    user_id: Mapped[uuid.UUID | None] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey(User.id, ondelete="SET NULL"),
+        index=True,
+        nullable=True,
+    )
 
     status: Mapped[JobStatus] = mapped_column(
         SQLEnum(JobStatus, name="job_status", native_enum=False),
@@ -236,6 +254,97 @@ class Job(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), onupdate=datetime.utcnow
     )
+    # パイプラインの計測値 (scratch_bytes, segments など) を追記していく
+    metrics: Mapped[Optional[dict]] = mapped_column(postgresql.JSON)
+
+    checkpoints: Mapped[List["SttCheckpoint"]] = relationship(
+        back_populates="job", cascade="all, delete-orphan"
+    )
+
+
+# --------------------------------------------------------------------------- #
+#  stt_checkpoints  (job × segment 単位の Whisper 結果)
+# --------------------------------------------------------------------------- #
+class SttCheckpoint(Base):
+    __tablename__ = "stt_checkpoints"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    job_id: Mapped[str] = mapped_column(
+        String, ForeignKey("minutes.jobs.id", ondelete="CASCADE"), nullable=False
+    )
+    segment_index: Mapped[int] = mapped_column(Integer, nullable=False)
+    segment_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    offset_sec: Mapped[float] = mapped_column(Float, nullable=False)
+    result: Mapped[dict] = mapped_column(postgresql.JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+
+    job: Mapped["Job"] = relationship(back_populates="checkpoints")
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "segment_index", name="uix_stt_checkpoints_seg"),
+    )
+
+
+# --------------------------------------------------------------------------- #
+#  task_outbox  (Celery への投入待ち ― files / jobs と同じトランザクションで書く)
+# --------------------------------------------------------------------------- #
+class TaskOutbox(Base):
+    __tablename__ = "task_outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    task_name: Mapped[str] = mapped_column(String, nullable=False)
+    args: Mapped[list] = mapped_column(postgresql.JSON, nullable=False, default=list)
+    kwargs: Mapped[dict] = mapped_column(postgresql.JSON, nullable=False, default=dict)
+    # apply_async のオプション (task_id / queue など)
+    options: Mapped[dict] = mapped_column(postgresql.JSON, nullable=False, default=dict)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+    dispatched_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # 未送信行だけの部分インデックス (dispatcher の走査用)
+        Index(
+            "ix_task_outbox_pending",
+            "id",
+            postgresql_where=text("dispatched_at IS NULL"),
+        ),
+    )
+
+
+# --------------------------------------------------------------------------- #
+#  llm_calls  (gateway 経由の OpenAI 呼び出し 1 回 = 1 行。telemetry が一括 INSERT)
+# --------------------------------------------------------------------------- #
+class LlmCall(Base):
+    __tablename__ = "llm_calls"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # chat / chat_stream / embeddings / transcriptions
+    endpoint: Mapped[str] = mapped_column(String(32), nullable=False)
+    # 呼び出し元 (minutes_draft / ai_edit / agent / etl_embed / stt ...)
+    operation: Mapped[Optional[str]] = mapped_column(String(64))
+    model: Mapped[str] = mapped_column(String(64), nullable=False)
+    prompt_tokens: Mapped[Optional[int]] = mapped_column(Integer)
+    completion_tokens: Mapped[Optional[int]] = mapped_column(Integer)
+    latency_ms: Mapped[int] = mapped_column(Integer, nullable=False)
+    limiter_wait_ms: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    ok: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    cache_hit: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    error: Mapped[Optional[str]] = mapped_column(String(64))
+    # 集計用に残すだけ (transcript / user の削除で消さない ― FK なし)
+    transcript_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    user_id: Mapped[uuid.UUID | None] = mapped_column(PG_UUID(as_uuid=True))
+
+    __table_args__ = (
+        Index("ix_llm_calls_created_at", "created_at"),
+        Index("ix_llm_calls_user_created", "user_id", "created_at"),
+    )
 
 
 __all__ = [
@@ -247,4 +356,7 @@ __all__ = [
     "Message",
     "Job",
     "JobStatus",
+    "SttCheckpoint",
+    "TaskOutbox",
+    "LlmCall",
 ]
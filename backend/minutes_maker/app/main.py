@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 
 from .api.files_router import router as files_router
+from .api.uploads_router import router as uploads_router
 from .api.transcripts_router import router as tr_router
 from .api.draft_router import router as draft_router
 from .api.minutes_versions_router import router as mv_router
@@ -9,9 +10,11 @@ from .api.jobs_router import router as jobs_router
 from .api.agent_router import router as agent_router
 from .api.minutes_chat_router import router as mc_router   # ★ 追加
 from .api.diff_router import router as diff_router   # ★ 追加
+from .api.llm_metrics_router import router as llm_metrics_router
 from common.security import fastapi_users, auth_backend  # :contentReference[oaicite:6]{index=6}
 from common.schemas import UserRead, UserCreate, UserUpdate  # :contentReference[oaicite:7]{index=7}
 from fastapi.middleware.cors import CORSMiddleware
+from shared.storage import ensure_bucket
 
 app = FastAPI(title="NE Navi – Minutes Maker")
 
@@ -49,6 +52,12 @@ app.include_router(
     tags=["users"],
 )
 
+@app.on_event("startup")
+def _prepare_audio_bucket():
+    # AUDIO_STORAGE=s3 のときバケットとライフサイクルルールを用意 (冪等)
+    ensure_bucket()
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -56,6 +65,7 @@ def health():
 
 # ---- API routers -----------------------------------------------------------
 app.include_router(files_router)
+app.include_router(uploads_router)
 app.include_router(jobs_router)
 app.include_router(stt_router)
 app.include_router(tr_router)
@@ -63,4 +73,5 @@ app.include_router(draft_router)
 app.include_router(mv_router)
 app.include_router(agent_router)
 app.include_router(mc_router)                     # ★ 追加
-app.include_router(diff_router)
\ No newline at end of file
+app.include_router(diff_router)
+app.include_router(llm_metrics_router)
\ No newline at end of file
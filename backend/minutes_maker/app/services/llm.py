@@ -1,18 +1,39 @@
 """
 OpenAI へのラッパー – AI に議事録を修正させる。
-返値は assistant 返信と更新後 Markdown (変更なければ現状を返す)。
+返値は assistant 返信と更新後 Markdown (変更なければ現状を返す)、生成方法の meta。
+長い議事録は変更箇所だけを返させて当てる (minutes_patch。当たらなければ全文生成)。
+stream_with_minutes は同じ処理をトークン単位で返す (SSE 用)。
+llm_cache_enabled は X-LLM-Cache: bypass ヘッダを見る FastAPI 依存関数。
 """
 
 from __future__ import annotations
 
 import json
+import logging
 import re
-from typing import Any, Dict, Sequence, Union
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Union
 
-from openai import OpenAI
+from fastapi import Header
+
+from shared import llm_gateway
+from shared import prompt_budget as PB
 from ..schemas.chat import ChatMessage  # Pydantic 型
+from . import minutes_patch
+from .llm_stream import MINUTES_MARKER, Delta, MarkerSplitter, chat_deltas, split_deltas
+
+logger = logging.getLogger(__name__)
+
+MODEL = "gpt-4o-mini"
+# 書き直した議事録に加えて assistant_message / JSON の枠に使う分
+_REPLY_OVERHEAD_TOKENS = 1024
 
-client = OpenAI()
+
+def llm_cache_enabled(
+    x_llm_cache: str | None = Header(None),
+    cache_control: str | None = Header(None),
+) -> bool:
+    """このリクエストで LLM completion キャッシュを使うか"""
+    return not llm_gateway.bypass_requested(x_llm_cache, cache_control)
 
 
 def _to_openai_msg(m: Union[ChatMessage, Dict[str, Any]]) -> Dict[str, str]:
@@ -22,29 +43,76 @@ def _to_openai_msg(m: Union[ChatMessage, Dict[str, Any]]) -> Dict[str, str]:
     return {"role": m.role, "content": m.content}
 
 
-def complete_with_minutes(
+_SYSTEM_PROMPT = (
+    "あなたは優秀なビジネスアシスタントです。ユーザーと対話しながら議事録(Markdown)"
+    "を改善します。"
+)
+_JSON_FORMAT = (
+    "回答は必ず JSON で返してください：\n"
+    '{ "assistant_message": "...", "markdown": "..." }'
+)
+_STREAM_FORMAT = (
+    "まずユーザーへの返答を書き、次に "
+    + MINUTES_MARKER
+    + " だけの行を書き、その後に更新後の議事録 Markdown の全文を書いてください。"
+    "議事録を変更しない場合は " + MINUTES_MARKER + " 以降を書かないでください。"
+)
+
+
+def _build_messages(
+    system_prompt: str,
     user_messages: Sequence[Union[ChatMessage, Dict[str, Any]]],
     user_input: str,
     current_minutes: str,
-) -> tuple[str, str]:
-    system_prompt = (
-        "あなたは優秀なビジネスアシスタントです。ユーザーと対話しながら議事録(Markdown)"
-        "を改善します。回答は必ず JSON で返してください：\n"
-        '{ "assistant_message": "...", "markdown": "..." }'
+) -> list[dict[str, str]]:
+    # 議事録と今回の指示は必ず送り、履歴は収まる分だけ (古いものから省略)
+    messages, _ = PB.fit_messages(
+        head=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"現在の議事録:\n```\n{current_minutes}\n```"},
+        ],
+        history=[_to_openai_msg(m) for m in user_messages],
+        tail=[{"role": "user", "content": user_input}],
+        model=MODEL,
+        completion_tokens=PB.count_tokens(current_minutes, MODEL) + _REPLY_OVERHEAD_TOKENS,
     )
+    return messages
+
+
+def complete_with_minutes(
+    user_messages: Sequence[Union[ChatMessage, Dict[str, Any]]],
+    user_input: str,
+    current_minutes: str,
+    use_cache: bool = True,
+) -> tuple[str, str, dict]:
+    if minutes_patch.use_patch(current_minutes, MODEL):
+        patch_messages = _build_messages(
+            _SYSTEM_PROMPT + minutes_patch.PATCH_FORMAT,
+            user_messages,
+            user_input,
+            current_minutes,
+        )
+        try:
+            result = minutes_patch.request_edits(
+                MODEL, patch_messages, current_minutes, cache=use_cache
+            )
+            return result.reply, result.markdown, minutes_patch.patch_meta(result)
+        except minutes_patch.PatchFailed as exc:
+            logger.info("minutes chat patch failed, regenerating: %s", exc)
+            meta = minutes_patch.fallback_meta(exc)
+    else:
+        meta = minutes_patch.fallback_meta()
 
-    messages: list[dict[str, str]] = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"現在の議事録:\n```\n{current_minutes}\n```"},
-    ] + [_to_openai_msg(m) for m in user_messages] + [
-        {"role": "user", "content": user_input}
-    ]
+    messages = _build_messages(
+        _SYSTEM_PROMPT + _JSON_FORMAT, user_messages, user_input, current_minutes
+    )
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
+    resp = llm_gateway.chat(
+        MODEL,
+        messages,
         response_format={"type": "json_object"},  # JSON mode
         temperature=0.3,
+        cache=use_cache,
     )
 
     # 返値は JSON 文字列なのでパースする
@@ -54,4 +122,21 @@ def complete_with_minutes(
     data = json.loads(raw)
 
     markdown = data.get("markdown") or current_minutes
-    return data["assistant_message"], markdown
+    return data["assistant_message"], markdown, meta
+
+
+def stream_with_minutes(
+    user_messages: Sequence[Union[ChatMessage, Dict[str, Any]]],
+    user_input: str,
+    current_minutes: str,
+    tags: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Delta]:
+    """
+    ("message" | "minutes", 差分) を順に返す。minutes が来なければ議事録は変更なし。
+    プロンプトの組み立て (PromptTooLarge) は呼び出し時に同期的に行う。
+    """
+    messages = _build_messages(
+        _SYSTEM_PROMPT + _STREAM_FORMAT, user_messages, user_input, current_minutes
+    )
+    deltas = chat_deltas(MODEL, messages, tags, temperature=0.3)
+    return split_deltas(deltas, MarkerSplitter())
@@ -0,0 +1,156 @@
+"""
+Chat completion のトークンを Server-Sent Events で転送するヘルパ。
+
+イベント:
+* ``message`` – assistant の返答 (``{"delta": "..."}``)
+* ``minutes`` – 更新後の議事録 Markdown (``{"delta": "..."}``)
+* ``done``    – 保存結果 (MinutesVersion 等)
+* ``error``   – OpenAI 側やサーバ内のエラー (保存しない)
+
+返答と議事録を 1 本の completion で受け取る場合、モデルには
+:data:`MINUTES_MARKER` の行で両者を区切らせ、:class:`MarkerSplitter` で振り分ける。
+ストリームが完了したときに ``finish(COMPLETED, ...)`` が呼ばれ、全文で結果を保存する。
+クライアントが切断したときは ``finish(CANCELLED, ...)`` で途中までの本文が渡るが、
+途中で切れた議事録は最新版にしてはならないので、呼び出し側は返答 (チャット) だけを残す。
+"""
+
+from __future__ import annotations
+
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from openai import OpenAIError
+
+from shared import llm_gateway
+
+from .sse import SSE_HEADERS, sse_event
+
+logger = logging.getLogger(__name__)
+
+MESSAGE = "message"
+MINUTES = "minutes"
+MINUTES_MARKER = "<<<MINUTES>>>"
+
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+Delta = Tuple[str, str]  # (event, text)
+Finish = Callable[[str, Dict[str, str]], Any]
+
+
+async def chat_deltas(
+    model: str,
+    messages: List[Dict[str, str]],
+    tags: Optional[Dict[str, Any]] = None,
+    **kwargs: Any,
+) -> AsyncIterator[str]:
+    """
+    chat.completions を stream=True で呼び、本文の差分だけを返す。
+    本体はレスポンス送信時に走るので、telemetry のタグ (llm_gateway.tagged) は tags で渡す
+    """
+    with llm_gateway.tagged(**(tags or {})):
+        stream = await llm_gateway.achat_stream(model, messages, **kwargs)
+    # 途中で止めても gateway 側で usage を記録し接続を閉じるよう、明示的に閉じる
+    async with aclosing(stream) as it:
+        async for chunk in it:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class MarkerSplitter:
+    """marker より前を first、後を second のイベントとして振り分ける"""
+
+    def __init__(self, marker: str = MINUTES_MARKER, first: str = MESSAGE, second: str = MINUTES):
+        self.marker = marker
+        self.first = first
+        self.second = second
+        self._buf = ""
+        self._passed = False
+
+    def feed(self, text: str) -> List[Delta]:
+        if self._passed:
+            return [(self.second, text)]
+        self._buf += text
+        i = self._buf.find(self.marker)
+        if i >= 0:
+            before, after = self._buf[:i], self._buf[i + len(self.marker):].lstrip("\n")
+            self._buf, self._passed = "", True
+            return [(ev, t) for ev, t in ((self.first, before), (self.second, after)) if t]
+        # marker の途中で差分が切れている可能性がある分は次回まで持ち越す
+        keep = next(
+            (n for n in range(min(len(self.marker) - 1, len(self._buf)), 0, -1)
+             if self.marker.startswith(self._buf[-n:])),
+            0,
+        )
+        emit, self._buf = self._buf[: len(self._buf) - keep], self._buf[len(self._buf) - keep:]
+        return [(self.first, emit)] if emit else []
+
+    def flush(self) -> List[Delta]:
+        rest, self._buf = self._buf, ""
+        return [(self.first, rest)] if rest and not self._passed else []
+
+
+async def split_deltas(deltas: AsyncIterator[str], splitter: MarkerSplitter) -> AsyncIterator[Delta]:
+    async with aclosing(deltas) as it:
+        async for text in it:
+            for item in splitter.feed(text):
+                yield item
+    for item in splitter.flush():
+        yield item
+
+
+async def single_event(deltas: AsyncIterator[str], event: str) -> AsyncIterator[Delta]:
+    async with aclosing(deltas) as it:
+        async for text in it:
+            yield event, text
+
+
+def stream_response(request: Request, deltas: AsyncIterator[Delta], finish: Finish) -> StreamingResponse:
+    """
+    deltas を SSE で転送し、終わったら finish(outcome, {event: 全文}) を
+    スレッドプールで呼んで結果を ``done`` イベントとして送る。
+    切断時は finish(CANCELLED, ...) に途中までの本文を渡す (議事録は保存させない)。
+    例外で止まった場合は ``error`` を送り、finish は呼ばない。
+    """
+
+    async def _events() -> AsyncIterator[str]:
+        parts: Dict[str, List[str]] = {}
+        outcome = CANCELLED
+
+        def _texts() -> Dict[str, str]:
+            return {ev: "".join(chunks).strip() for ev, chunks in parts.items()}
+
+        try:
+            async with aclosing(deltas) as it:
+                async for event, text in it:
+                    if await request.is_disconnected():
+                        return
+                    parts.setdefault(event, []).append(text)
+                    yield sse_event({"delta": text}, event=event)
+            outcome = COMPLETED
+        except OpenAIError as exc:
+            outcome = FAILED
+            logger.warning("LLM stream failed: %s", exc)
+            yield sse_event({"error": str(exc)[:200]}, event="error")
+            return
+        except Exception:
+            outcome = FAILED
+            logger.exception("SSE stream failed")
+            yield sse_event({"error": "internal error"}, event="error")
+            return
+        finally:
+            if outcome == CANCELLED:
+                # 切断でタスクがキャンセルされていても保存までは走らせる
+                with anyio.CancelScope(shield=True):
+                    await run_in_threadpool(finish, outcome, _texts())
+
+        result = await run_in_threadpool(finish, outcome, _texts())
+        yield sse_event(result, event="done")
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,197 @@
+"""
+差分 (パッチ) 方式の AI 編集。
+
+1 行直すだけでも議事録全文を出力させると、出力トークン数 = 待ち時間になる。
+ここではモデルに変更箇所だけを JSON で返させ::
+
+    {"reply": "...", "edits": [{"section": "## 決定事項", "find": "...", "replace": "..."}],
+     "rewrite": false}
+
+サーバ側で現在の議事録へ当てる。find は section の範囲内で探し、一字一句一致しなければ
+空白と全角 / 半角の違いだけを無視して探す。揺れた find が議事録のどこまでに当たるかは
+diff_match_patch (diff_router と同じ) の diff で対応付ける。
+find が見つからない・曖昧・パッチが当たらない・モデルが rewrite を求めた場合は
+:class:`PatchFailed` を送出し、呼び出し側が従来の全文生成にフォールバックする。
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+from diff_match_patch import diff_match_patch
+
+from shared import llm_gateway
+from shared import prompt_budget as PB
+
+# patch = 差分方式を試す / full = 常に全文生成
+AI_EDIT_MODE = os.getenv("AI_EDIT_MODE", "patch")
+# これより短い議事録は全文生成の方が速くて確実
+AI_EDIT_PATCH_MIN_TOKENS = int(os.getenv("AI_EDIT_PATCH_MIN_TOKENS", "400"))
+
+PATCH_FORMAT = (
+    "議事録の全文は書かず、変更箇所だけを JSON で返してください：\n"
+    '{ "reply": "ユーザーへの短い返答", "edits": [ { "section": "変更箇所を含む見出し行 (任意)", '
+    '"find": "現在の議事録から一字一句そのまま写した変更前のテキスト", '
+    '"replace": "変更後のテキスト" } ], "rewrite": false }\n'
+    "find は議事録の中で 1 箇所に決まる長さにしてください。追記は直前の行を find に含め、"
+    "replace にその行と追記分を書きます。削除は replace を空文字にします。"
+    "変更が無ければ edits は空配列です。構成の全面的な変更など差分で表せない場合だけ、"
+    'edits を空にして "rewrite": true を返してください。'
+)
+
+_dmp = diff_match_patch()
+_HEADING = re.compile(r"^(#{1,6})\s", re.M)
+
+
+class PatchFailed(ValueError):
+    """差分を当てられなかった (全文生成へフォールバックする)"""
+
+
+class Edit(NamedTuple):
+    find: str
+    replace: str
+    section: str | None = None
+
+
+class PatchResult(NamedTuple):
+    reply: str
+    markdown: str
+    edits: int
+
+
+def use_patch(document: str, model: str) -> bool:
+    return AI_EDIT_MODE == "patch" and PB.count_tokens(document, model) >= AI_EDIT_PATCH_MIN_TOKENS
+
+
+def parse_edits(raw: str) -> tuple[str, List[Edit], bool]:
+    """モデルの JSON → (reply, edits, rewrite)"""
+    raw = re.sub(r"```json\n?|```", "", raw or "").strip()
+    try:
+        data = json.loads(raw)
+    except ValueError as exc:
+        raise PatchFailed(f"invalid JSON: {exc}") from exc
+    items = data.get("edits") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise PatchFailed("'edits' must be a list")
+
+    edits: List[Edit] = []
+    for n, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            raise PatchFailed(f"edit {n}: not an object")
+        find, replace = item.get("find"), item.get("replace", "")
+        if not isinstance(find, str) or not find or not isinstance(replace, str):
+            raise PatchFailed(f"edit {n}: 'find' / 'replace' must be strings")
+        section = item.get("section")
+        edits.append(Edit(find, replace, section if isinstance(section, str) and section else None))
+    return str(data.get("reply") or ""), edits, bool(data.get("rewrite"))
+
+
+def _section_span(doc: str, section: str | None) -> tuple[int, int]:
+    """section の見出し行から、次の同じか上位の見出しの手前まで。見出しが特定できなければ全体"""
+    heading = (section or "").strip()
+    hits = [m.start() for m in re.finditer(rf"^{re.escape(heading)}[ \t]*$", doc, re.M)] if heading else []
+    if len(hits) != 1:
+        return 0, len(doc)
+    level = len(heading) - len(heading.lstrip("#")) or 6
+    for m in _HEADING.finditer(doc, hits[0] + len(heading)):
+        if len(m.group(1)) <= level:
+            return hits[0], m.start()
+    return hits[0], len(doc)
+
+
+def _locate(doc: str, edit: Edit) -> int:
+    """find の位置 (section があればその範囲内だけを探す)。見つからなければ -1"""
+    lo, hi = _section_span(doc, edit.section)
+    part = doc[lo:hi]
+    n = part.count(edit.find)
+    if n == 1:
+        return lo + part.find(edit.find)
+    # 完全一致しない (空白の揺れ等) → 正規化した形で探す。採るのは正規化後に一致する
+    # 箇所だけなので、範囲の長さや位置に関係なく見つかり、曖昧さも同じ形で数えられる
+    folded, pos = _folded(part)
+    key = _folded(edit.find)[0]
+    if n > 1 or folded.count(key) > 1:
+        raise PatchFailed(f"ambiguous anchor: {edit.find[:40]!r}")
+    i = folded.find(key)
+    return lo + pos[i] if i >= 0 else -1
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", text))
+
+
+def _folded(text: str) -> tuple[str, List[int]]:
+    """1 文字ずつ _normalize した文字列と、その各文字の text 上の位置"""
+    out: List[str] = []
+    pos: List[int] = []
+    for i, ch in enumerate(text):
+        for c in _normalize(ch):
+            out.append(c)
+            pos.append(i)
+    return "".join(out), pos
+
+
+def _span(doc: str, edit: Edit) -> tuple[int, int]:
+    """find に当たる doc 上の範囲 [start, end)。完全一致しなければ diff で対応付ける"""
+    loc = _locate(doc, edit)
+    if loc < 0:
+        raise PatchFailed(f"anchor not found: {edit.find[:40]!r}")
+    if doc.startswith(edit.find, loc):
+        return loc, loc + len(edit.find)
+    window = doc[loc : loc + len(edit.find) * 3 // 2 + 8]
+    # 末尾の文字の対応位置 + 1 (len(find) そのものだと window 末尾の挿入分まで含まれる)
+    end = loc + _dmp.diff_xIndex(_dmp.diff_main(edit.find, window, False), len(edit.find) - 1) + 1
+    # 許すのは空白と全角 / 半角の違いだけ
+    if _normalize(doc[loc:end]) != _normalize(edit.find):
+        raise PatchFailed(f"anchor does not match the minutes: {edit.find[:40]!r}")
+    return loc, end
+
+
+def apply_edits(document: str, edits: Sequence[Edit]) -> str:
+    """edits を先頭から順に当てる。1 つでも当たらなければ PatchFailed"""
+    doc = document
+    for n, edit in enumerate(edits, 1):
+        try:
+            start, end = _span(doc, edit)
+        except PatchFailed as exc:
+            raise PatchFailed(f"edit {n}: {exc}") from exc
+        doc = doc[:start] + edit.replace + doc[end:]
+    if document.strip() and not doc.strip():
+        raise PatchFailed("edits removed the whole document")
+    return doc
+
+
+def request_edits(
+    model: str,
+    messages: Sequence[Dict[str, Any]],
+    document: str,
+    *,
+    temperature: float = 0.3,
+    cache: bool = True,
+) -> PatchResult:
+    """messages (PATCH_FORMAT を含む system) でモデルを呼び、document に差分を当てる"""
+    rsp = llm_gateway.chat(
+        model,
+        messages,
+        response_format={"type": "json_object"},
+        temperature=temperature,
+        cache=cache,
+    )
+    reply, edits, rewrite = parse_edits(rsp.choices[0].message.content)
+    if rewrite:
+        raise PatchFailed("model asked for a full rewrite")
+    return PatchResult(reply, apply_edits(document, edits), len(edits))
+
+
+def patch_meta(result: PatchResult) -> dict:
+    return {"edit_mode": "patch", "patch_edits": result.edits}
+
+
+def fallback_meta(exc: Exception | None = None) -> dict:
+    meta: dict = {"edit_mode": "full"}
+    if exc is not None:
+        meta["patch_error"] = str(exc)[:200]
+    return meta
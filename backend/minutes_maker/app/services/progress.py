@@ -0,0 +1,52 @@
+"""
+ジョブ進捗 (shared.job_progress) を API 側で購読するためのヘルパ。
+"""
+
+from __future__ import annotations
+
+import json
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import redis.asyncio as aioredis
+
+from shared import job_progress as P
+
+progress_redis = aioredis.Redis.from_url(P.REDIS_URL)
+
+
+async def progress_events(
+    job_id: str,
+    poll_sec: float,
+    on_missing: Optional[Callable[[], Awaitable[dict | None]]] = None,
+) -> AsyncIterator[dict | None]:
+    """
+    job_id の進捗イベントを順に返す。最初に最新イベント (あれば) を返し、
+    poll_sec 以内に何も届かなければ None を返す (keep-alive / タイムアウト判定用)。
+    終端 stage を返したら終了。
+
+    最新イベントが無い (未開始 / TTL 切れ) ときは on_missing() を 1 回だけ呼び、
+    終端イベント (DB 上で完了済みなど) が返ればそれを返して終了する。
+    """
+    pubsub = progress_redis.pubsub()
+    # 先に subscribe してから snapshot を読むことで取りこぼしを防ぐ
+    await pubsub.subscribe(P.channel(job_id))
+    try:
+        last = await progress_redis.get(P.snapshot_key(job_id))
+        event = json.loads(last) if last else (await on_missing() if on_missing else None)
+        if event is not None:
+            yield event
+            if event["stage"] in P.TERMINAL_STAGES:
+                return
+
+        while True:
+            msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=poll_sec)
+            if msg is None:
+                yield None
+                continue
+            event = json.loads(msg["data"])
+            yield event
+            if event["stage"] in P.TERMINAL_STAGES:
+                return
+    finally:
+        await pubsub.unsubscribe(P.channel(job_id))
+        await pubsub.aclose()
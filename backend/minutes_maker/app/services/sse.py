@@ -0,0 +1,24 @@
+"""
+Server-Sent Events 用の小さなヘルパ。
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+# nginx のバッファリングを無効化し、イベントを即時に流す
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+KEEPALIVE = ": keep-alive\n\n"
+
+
+def sse_event(data: Any, event: str | None = None) -> str:
+    """1 イベント分の text/event-stream 文字列 (data は JSON 化)"""
+    body = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, default=str)
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in body.splitlines() or [""]]
+    return "\n".join(lines) + "\n\n"
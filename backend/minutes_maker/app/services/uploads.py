@@ -0,0 +1,201 @@
+"""
+アップロード完了後の共通処理と、再開可能アップロードの途中状態。
+
+* register_upload : files / jobs / task_outbox を 1 コミットで作成し STT タスクを投入
+                    (単発・再開可能の両方で使用)
+* PartialUpload   : /data/uploads/.partial/{file_id}.part と .json (メタ情報)
+
+途中までのバイト列は API コンテナのローカル volume に溜め、finalize 時に
+storage.promote_partial で正式な保存先 (local / MinIO) へ移す。
+現在のオフセットは常に part ファイルのサイズそのもの (メタには書かない) なので、
+PATCH が途中で切れても受け取れた分だけ進む。
+移した後は保存先をメタに残し (stored)、files / jobs の登録が済んでからメタを消す。
+登録に失敗しても finalize をそのまま再試行できる。
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+from uuid import uuid4
+
+from common.models.user import User
+
+from ..db import SessionLocal
+from ..db import models as M
+from shared import outbox
+from shared.storage import UPLOAD_DIR, StoredUpload
+from shared.stt_transcribe import stt_queue_for, transcribe_and_generate_minutes
+
+PARTIAL_DIR = UPLOAD_DIR / ".partial"
+PARTIAL_DIR.mkdir(parents=True, exist_ok=True)
+# 最終更新からこの秒数を過ぎた途中アップロードは破棄
+PARTIAL_TTL_SEC = 24 * 60 * 60
+
+
+# --------------------------------------------------------------------------- #
+#  files / jobs 登録 + タスク投入
+# --------------------------------------------------------------------------- #
+def register_upload(
+    file_id: str,
+    filename: str,
+    mime_type: str | None,
+    stored: StoredUpload,
+    user: User,
+    force_transcribe: bool = False,
+    language: str | None = None,
+    duration_sec: float | None = None,
+) -> dict:
+    """
+    保存済みの音声を files / jobs に登録し、文字起こしタスクを投入する。
+    同期 I/O (DB / broker) なので async ハンドラからはスレッドで呼ぶ。
+    language (ISO-639) は Whisper に渡し、resume でも使えるよう jobs.metrics に残す。
+    キューは duration_sec (呼び出し側で測定済みなら) か保存サイズで決める (ffprobe しない)。
+    """
+    job_id = str(uuid4())  # task_id == job_id
+    queue = stt_queue_for(duration_sec, stored.size)  # 短い音声は stt-fast
+
+    # files + jobs + outbox を 1 トランザクションで (worker が Job 無しで起動しない)
+    sess = SessionLocal()
+    try:
+        sess.add(
+            M.File(
+                file_id=file_id,
+                filename=filename,
+                mime_type=mime_type,
+                content_sha256=stored.sha256,
+                duration_sec=duration_sec,
+                uploaded_by=user.id,
+                user_id=user.id,
+            )
+        )
+        sess.add(
+            M.Job(
+                id=job_id,          # ← primary key を task.id に固定
+                task_id=job_id,
+                file_id=file_id,
+                status=M.JobStatus.PENDING,
+                user_id=user.id,
+                metrics={"language": language} if language else None,
+            )
+        )
+        row = outbox.enqueue(
+            sess,
+            transcribe_and_generate_minutes.name,
+            args=(file_id, job_id, str(user.id)),
+            kwargs={"force_transcribe": force_transcribe, "language": language},
+            task_id=job_id,
+            queue=queue,
+        )
+        sess.flush()
+        outbox_ids = [row.id]
+        sess.commit()
+    finally:
+        sess.close()
+
+    outbox.dispatch_after_commit(outbox_ids)
+    return {"file_id": file_id, "task_id": job_id}
+
+
+# --------------------------------------------------------------------------- #
+#  再開可能アップロードの途中状態
+# --------------------------------------------------------------------------- #
+class UploadLocked(RuntimeError):
+    """同じアップロードに別の PATCH / finalize が進行中"""
+
+
+@dataclass
+class PartialUpload:
+    file_id: str
+    filename: str
+    content_type: str | None
+    length: int
+    user_id: str
+    force_transcribe: bool = False
+    created_at: float = 0.0
+    # promote_partial 済みなら StoredUpload の各値 (part ファイルはもう無い)
+    stored: list | None = None
+
+    @property
+    def part_path(self) -> Path:
+        return PARTIAL_DIR / f"{self.file_id}.part"
+
+    @property
+    def meta_path(self) -> Path:
+        return PARTIAL_DIR / f"{self.file_id}.json"
+
+    @property
+    def promoted(self) -> StoredUpload | None:
+        return StoredUpload(*self.stored) if self.stored else None
+
+    @property
+    def offset(self) -> int:
+        if self.stored:
+            return self.length
+        try:
+            return self.part_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    # ---- lifecycle -------------------------------------------------------
+    @classmethod
+    def create(cls, **fields) -> "PartialUpload":
+        upload = cls(file_id=str(uuid4()), created_at=time.time(), **fields)
+        upload.part_path.touch()
+        upload._save()
+        return upload
+
+    def _save(self) -> None:
+        self.meta_path.write_text(json.dumps(asdict(self), ensure_ascii=False))
+
+    def mark_promoted(self, stored: StoredUpload) -> None:
+        """part を正式な保存先へ移したことを記録する (finalize の再試行で移し直さない)"""
+        self.stored = list(stored)
+        self._save()
+
+    @classmethod
+    def load(cls, file_id: str) -> "PartialUpload" | None:
+        try:
+            meta = json.loads((PARTIAL_DIR / f"{Path(file_id).name}.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        return cls(**meta)
+
+    def discard(self) -> None:
+        self.part_path.unlink(missing_ok=True)
+        self.meta_path.unlink(missing_ok=True)
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """part ファイルへの排他ロック (取れなければ UploadLocked)"""
+        with self.part_path.open("ab") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError as exc:
+                raise UploadLocked(self.file_id) from exc
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def sweep_stale_partials(ttl_sec: int = PARTIAL_TTL_SEC) -> int:
+    """最終更新が ttl_sec より古い途中アップロードを削除し、件数を返す"""
+    cutoff = time.time() - ttl_sec
+    removed = 0
+    for meta in PARTIAL_DIR.glob("*.json"):
+        part = meta.with_suffix(".part")
+        try:
+            mtime = max(meta.stat().st_mtime, part.stat().st_mtime if part.exists() else 0)
+        except FileNotFoundError:
+            continue
+        if mtime < cutoff:
+            part.unlink(missing_ok=True)
+            meta.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -0,0 +1,91 @@
+import json
+import types
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from minutes_maker.app.api import jobs_router as J
+from minutes_maker.app.db import models as M
+from minutes_maker.app.services import progress
+from shared import job_progress as P
+
+OWNER = uuid.uuid4()
+
+
+class _FakePubSub:
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    async def subscribe(self, channel):
+        pass
+
+    async def unsubscribe(self, channel):
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+        if not self.messages:
+            raise AssertionError("stream kept waiting for progress")
+        return {"data": json.dumps(self.messages.pop(0))}
+
+
+class _FakeRedis:
+    def __init__(self, snapshot=None, messages=()):
+        self.snapshot = snapshot
+        self.messages = messages
+
+    async def get(self, key):
+        return json.dumps(self.snapshot) if self.snapshot else None
+
+    def pubsub(self):
+        return _FakePubSub(self.messages)
+
+
+def _client(monkeypatch, job, redis):
+    class _Session:
+        def get(self, model, job_id):
+            return job
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(J, "SessionLocal", _Session)
+    monkeypatch.setattr(progress, "progress_redis", redis)
+    app = FastAPI()
+    app.include_router(J.router)
+    app.dependency_overrides[J.current_active_user] = lambda: types.SimpleNamespace(id=OWNER)
+    return TestClient(app)
+
+
+def _job(status, user_id=OWNER):
+    return types.SimpleNamespace(user_id=user_id, status=status, transcript_id=5)
+
+
+def _events(text):
+    return [json.loads(line[6:]) for line in text.splitlines() if line.startswith("data: ")]
+
+
+def test_other_users_job_is_not_found(monkeypatch):
+    client = _client(monkeypatch, _job(M.JobStatus.PROCESSING, uuid.uuid4()), _FakeRedis())
+    assert client.get("/api/jobs/j1/events").status_code == 404
+
+
+def test_finished_job_without_snapshot_ends_with_db_status(monkeypatch):
+    client = _client(monkeypatch, _job(M.JobStatus.DRAFT_READY), _FakeRedis())
+
+    rsp = client.get("/api/jobs/j1/events")
+
+    assert rsp.status_code == 200
+    assert _events(rsp.text) == [{"job_id": "j1", "stage": P.DRAFT_READY, "transcript_id": 5}]
+
+
+@pytest.mark.parametrize("status", [M.JobStatus.PENDING, M.JobStatus.PROCESSING])
+def test_running_job_without_snapshot_follows_pubsub(monkeypatch, status):
+    done = {"job_id": "j1", "stage": P.FAILED}
+    client = _client(monkeypatch, _job(status), _FakeRedis(messages=[done]))
+
+    assert _events(client.get("/api/jobs/j1/events").text) == [done]
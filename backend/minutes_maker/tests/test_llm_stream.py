@@ -0,0 +1,151 @@
+import asyncio
+import types
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from openai import OpenAIError
+
+from minutes_maker.app.services import llm_stream as LS
+
+
+def _split(pieces: list[str]) -> list[tuple[str, str]]:
+    splitter = LS.MarkerSplitter()
+    out = [item for p in pieces for item in splitter.feed(p)]
+    return out + splitter.flush()
+
+
+def _joined(items, event):
+    return "".join(t for ev, t in items if ev == event)
+
+
+def test_marker_split_across_deltas():
+    text = f"直しました。\n{LS.MINUTES_MARKER}\n# 概要\n- A"
+    items = _split([text[i:i + 3] for i in range(0, len(text), 3)])
+
+    assert _joined(items, LS.MESSAGE) == "直しました。\n"
+    assert _joined(items, LS.MINUTES) == "# 概要\n- A"
+
+
+def test_partial_marker_without_minutes_stays_in_message():
+    items = _split(["了解 <<", "< です"])
+    assert _joined(items, LS.MESSAGE) == "了解 <<< です"
+    assert _joined(items, LS.MINUTES) == ""
+
+
+def _client(deltas, finish):
+    app = FastAPI()
+
+    @app.post("/s")
+    def _route(request: Request):
+        return LS.stream_response(request, deltas(), finish)
+
+    return TestClient(app)
+
+
+def test_stream_forwards_deltas_then_persists_on_completion():
+    calls = []
+
+    async def deltas():
+        yield LS.MESSAGE, "ok"
+        yield LS.MINUTES, "# 概要"
+        yield LS.MINUTES, "\n- A"
+
+    def finish(outcome, texts):
+        calls.append((outcome, texts))
+        return {"version_no": 2}
+
+    rsp = _client(deltas, finish).post("/s")
+
+    assert rsp.headers["content-type"].startswith("text/event-stream")
+    assert 'event: minutes\ndata: {"delta": "# 概要"}' in rsp.text
+    assert rsp.text.endswith('event: done\ndata: {"version_no": 2}\n\n')
+    assert calls == [(LS.COMPLETED, {LS.MESSAGE: "ok", LS.MINUTES: "# 概要\n- A"})]
+
+
+def test_openai_error_is_reported_and_not_persisted():
+    calls = []
+
+    async def deltas():
+        yield LS.MINUTES, "# 概"
+        raise OpenAIError("boom")
+
+    rsp = _client(deltas, lambda *a: calls.append(a)).post("/s")
+
+    assert "event: error" in rsp.text and "boom" in rsp.text
+    assert calls == []
+
+
+def test_unexpected_error_is_reported_and_not_persisted():
+    calls = []
+
+    async def deltas():
+        yield LS.MINUTES, "# 概"
+        raise KeyError("splitter")
+
+    rsp = _client(deltas, lambda *a: calls.append(a)).post("/s")
+
+    assert "event: error" in rsp.text
+    assert calls == []
+
+
+class _DisconnectAfter:
+    def __init__(self, n: int):
+        self.n = n
+
+    async def is_disconnected(self) -> bool:
+        self.n -= 1
+        return self.n < 0
+
+
+def test_disconnect_passes_partial_text_as_cancelled():
+    calls = []
+
+    async def deltas():
+        yield LS.MESSAGE, "途中"
+        yield LS.MINUTES, "# 概要"
+        yield LS.MINUTES, "\n- A"
+
+    async def _consume():
+        rsp = LS.stream_response(_DisconnectAfter(2), deltas(), lambda *a: calls.append(a))
+        return [chunk async for chunk in rsp.body_iterator]
+
+    sent = asyncio.run(_consume())
+
+    assert len(sent) == 2 and "event: done" not in "".join(sent)
+    assert calls == [(LS.CANCELLED, {LS.MESSAGE: "途中", LS.MINUTES: "# 概要"})]
+
+
+def test_agent_stream_without_marker_keeps_the_reply(monkeypatch):
+    from minutes_maker.app.api import agent_router as A
+
+    added, versions = [], []
+
+    class _Session:
+        def add(self, row):
+            added.append(row)
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    async def deltas(*a, **k):
+        yield "その点は議事録に"
+        yield "書かれていません"
+
+    monkeypatch.setattr(A, "_prepare", lambda q, db, user, system: [])
+    monkeypatch.setattr(LS, "chat_deltas", deltas)
+    monkeypatch.setattr(A, "SessionLocal", _Session)
+    monkeypatch.setattr(A, "M", types.SimpleNamespace(Message=types.SimpleNamespace))
+    monkeypatch.setattr(A, "_store_reply", lambda *a, **k: versions.append(a))
+    app = FastAPI()
+    app.include_router(A.router)
+    app.dependency_overrides[A.current_active_user] = lambda: types.SimpleNamespace(id=1)
+    app.dependency_overrides[A.get_db] = lambda: None
+
+    rsp = TestClient(app).post("/api/agent/stream", json={"body": "x", "transcript_id": 3})
+
+    assert "event: done" in rsp.text
+    assert [(m.role, m.body) for m in added] == [("assistant", "その点は議事録に書かれていません")]
+    assert versions == []
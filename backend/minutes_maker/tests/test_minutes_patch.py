@@ -0,0 +1,115 @@
+import json
+import types
+
+import pytest
+
+from minutes_maker.app.services import minutes_patch as MP
+
+_DOC = (
+    "## 概要\n- 予算案を確認した\n- 次回は 5/1\n\n"
+    "## 決定事項\n- リリースは来月\n- 次回は 5/1\n\n"
+    "## ToDo\n- [ ] 見積もり更新 (田中)\n"
+)
+
+
+def test_edits_are_applied_in_order():
+    out = MP.apply_edits(
+        _DOC,
+        [
+            MP.Edit("- リリースは来月", "- リリースは来月第二週"),
+            MP.Edit("- [ ] 見積もり更新 (田中)", "- [ ] 見積もり更新 (田中)\n- [ ] 環境構築 (鈴木)"),
+        ],
+    )
+    assert "- リリースは来月第二週\n" in out
+    assert out.endswith("(田中)\n- [ ] 環境構築 (鈴木)\n")
+
+
+def test_section_disambiguates_repeated_text():
+    with pytest.raises(MP.PatchFailed, match="ambiguous"):
+        MP.apply_edits(_DOC, [MP.Edit("- 次回は 5/1", "- 次回は 5/8")])
+
+    out = MP.apply_edits(_DOC, [MP.Edit("- 次回は 5/1", "- 次回は 5/8", "## 決定事項")])
+    assert "- 予算案を確認した\n- 次回は 5/1\n" in out
+    assert "- リリースは来月\n- 次回は 5/8\n" in out
+
+
+def test_whitespace_and_width_drift_is_tolerated_but_other_text_is_not():
+    out = MP.apply_edits(_DOC, [MP.Edit("- [ ] 見積もり更新（田中）", "- [x] 見積もり更新 (田中)")])
+    assert "- [x] 見積もり更新 (田中)\n" in out
+
+    with pytest.raises(MP.PatchFailed):
+        MP.apply_edits(_DOC, [MP.Edit("- 予算案を否決した", "- 予算案を承認した")])
+
+
+def test_anchor_outside_its_section_is_not_applied_elsewhere():
+    with pytest.raises(MP.PatchFailed):
+        MP.apply_edits(_DOC, [MP.Edit("- 予算案を確認した", "- 予算案を承認した", "## 決定事項")])
+
+
+def test_fuzzy_anchor_matching_two_places_is_ambiguous():
+    with pytest.raises(MP.PatchFailed, match="ambiguous"):
+        MP.apply_edits(_DOC, [MP.Edit("- 次回は　5/1", "- 次回は 5/8")])
+
+
+def _long_doc(lines: int = 240) -> str:
+    body = "".join(f"- 議題 {i:03d} について担当者から報告があった\n" for i in range(lines))
+    return f"## 概要\n{body}\n## ToDo\n- [ ] 見積もり更新 (田中)\n- [ ] 議事録の共有 (佐藤)\n"
+
+
+def test_drifted_anchor_is_found_far_into_long_minutes():
+    doc = _long_doc()
+    assert len(doc) > 5000
+
+    out = MP.apply_edits(doc, [MP.Edit("- [ ] 議事録の共有（佐藤）", "- [x] 議事録の共有 (佐藤)")])
+    assert out.endswith("- [ ] 見積もり更新 (田中)\n- [x] 議事録の共有 (佐藤)\n")
+
+    out = MP.apply_edits(doc, [MP.Edit("- 議題 230 について担当者から 報告があった", "- 議題 230 は延期")])
+    assert "- 議題 229 について担当者から報告があった\n- 議題 230 は延期\n- 議題 231 " in out
+
+
+def test_parse_rejects_malformed_edits():
+    reply, edits, rewrite = MP.parse_edits(
+        '```json\n{"reply": "直しました", "edits": [{"find": "a", "replace": "b"}]}\n```'
+    )
+    assert (reply, edits, rewrite) == ("直しました", [MP.Edit("a", "b")], False)
+
+    for raw in ("not json", '{"edits": "## 概要"}', '{"edits": [{"find": "", "replace": "x"}]}'):
+        with pytest.raises(MP.PatchFailed):
+            MP.parse_edits(raw)
+
+
+def _reply(payload: dict):
+    message = types.SimpleNamespace(content=json.dumps(payload, ensure_ascii=False))
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def test_request_edits_uses_json_mode_and_signals_rewrite(monkeypatch):
+    sent = []
+
+    def fake_chat(model, messages, **kwargs):
+        sent.append(kwargs)
+        return _reply({"reply": "ok", "edits": [], "rewrite": len(sent) > 1})
+
+    monkeypatch.setattr(MP.llm_gateway, "chat", fake_chat)
+
+    result = MP.request_edits("gpt-4o-mini", [], _DOC)
+    assert result == MP.PatchResult("ok", _DOC, 0)
+    assert sent[0]["response_format"] == {"type": "json_object"}
+
+    with pytest.raises(MP.PatchFailed, match="rewrite"):
+        MP.request_edits("gpt-4o-mini", [], _DOC)
+
+
+def test_agent_patches_only_the_minutes_the_model_saw(monkeypatch):
+    from minutes_maker.app.api import agent_router as A
+
+    doc = _long_doc()
+    monkeypatch.setattr(
+        MP, "request_edits", lambda model, messages, document, **kw: MP.PatchResult("ok", document, 0)
+    )
+    same = [{"role": "system", "content": ""}, {"role": "user", "content": "直して\n" + doc}]
+    edited = [{"role": "system", "content": ""}, {"role": "user", "content": "直して\n" + doc + "- 手元の追記\n"}]
+
+    assert A._try_patch(same, doc, True)[0] == ("ok", doc)
+    patched, meta = A._try_patch(edited, doc.replace("議題 100", "議題 百"), True)
+    assert patched is None and "differ" in meta["patch_error"]
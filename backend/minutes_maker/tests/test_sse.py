@@ -0,0 +1,11 @@
+from minutes_maker.app.services.sse import sse_event
+
+
+def test_sse_event_json_payload():
+    assert sse_event({"stage": "chunks_stored", "chunks": 3}, event="progress") == (
+        'event: progress\ndata: {"stage": "chunks_stored", "chunks": 3}\n\n'
+    )
+
+
+def test_sse_event_multiline_text_is_split_into_data_lines():
+    assert sse_event("# 概要\n- A") == "data: # 概要\ndata: - A\n\n"
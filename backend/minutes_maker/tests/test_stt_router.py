@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import types
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from minutes_maker.app.api import stt_router as R
+
+
+class _FakeSession:
+    threads: list = []
+
+    def add(self, row):
+        self.row = row
+        self.threads.append(threading.get_ident())
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # ORM mapper の初期化 (users テーブル等) を避けるため行オブジェクトは素の namespace
+    monkeypatch.setattr(R, "M", types.SimpleNamespace(File=types.SimpleNamespace))
+    monkeypatch.setattr(
+        R.stt, "add_transcript", lambda *a, **k: (types.SimpleNamespace(id=1), 0)
+    )
+    monkeypatch.setattr(R.stt, "probe_bytes_duration", lambda data: 60.0)
+    app = FastAPI()
+    app.include_router(R.router)
+    app.dependency_overrides[R.current_active_user] = lambda: types.SimpleNamespace(id=None)
+    monkeypatch.setattr(R, "SessionLocal", _FakeSession)
+    monkeypatch.setattr(_FakeSession, "threads", [])
+    return TestClient(app)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """パイプラインへの引き渡しを記録する"""
+    calls = []
+    monkeypatch.setattr(
+        R, "save_upload", lambda f, file_id, name: R.stt.storage.StoredUpload("k", 0, "h")
+    )
+
+    def _register(file_id, *a, language=None, **k):
+        calls.append((file_id, language))
+        return {"file_id": file_id, "task_id": "job-1"}
+
+    monkeypatch.setattr(R, "register_upload", _register)
+    return calls
+
+
+def _post(client, data=None, **form):
+    return client.post(
+        "/stt", files={"audio": ("a.mp3", b"ID3", "audio/mpeg")}, data=data or form
+    )
+
+
+def test_transcribes_when_slot_free(client, pipeline, monkeypatch):
+    async def fake(filename, content, mime, language=None):
+        await asyncio.sleep(0)
+        return {"text": "こんにちは", "segments": []}
+
+    monkeypatch.setattr(R, "_transcribe", fake)
+    rsp = _post(client)
+    assert rsp.status_code == 201
+    assert rsp.json()["content"] == "こんにちは"
+    assert pipeline == []
+
+
+def test_direct_result_is_stored_off_the_event_loop(client, pipeline, monkeypatch):
+    loop_threads = []
+
+    async def fake(filename, content, mime, language=None):
+        loop_threads.append(threading.get_ident())
+        return {"text": "こんにちは", "segments": []}
+
+    monkeypatch.setattr(R, "_transcribe", fake)
+    assert _post(client).status_code == 201
+    assert len(_FakeSession.threads) == 1
+    assert _FakeSession.threads[0] != loop_threads[0]
+
+
+def test_saturated_returns_503_with_retry_after(client, monkeypatch):
+    called = []
+    monkeypatch.setattr(R, "_transcribe", lambda *a, **k: called.append(a))
+    monkeypatch.setattr(R, "_inflight", asyncio.Semaphore(0))
+
+    rsp = _post(client)
+    assert rsp.status_code == 503
+    assert rsp.headers["Retry-After"] == str(R.STT_RETRY_AFTER_SEC)
+    assert called == []
+
+
+def test_oversized_upload_returns_job_handle(client, pipeline, monkeypatch):
+    monkeypatch.setattr(R.stt, "MAX_BYTES", 2)
+    rsp = _post(client)
+    assert rsp.status_code == 202
+    assert rsp.json()["job_id"] == "job-1"
+    assert rsp.headers["Location"] == "/api/jobs/job-1"
+    assert len(pipeline) == 1
+
+
+def test_long_upload_waits_for_pipeline(client, pipeline, monkeypatch):
+    monkeypatch.setattr(R.stt, "probe_bytes_duration", lambda data: R.STT_DIRECT_MAX_SEC + 1)
+
+    async def _done(job_id, timeout):
+        assert timeout == 30
+        return 7
+
+    monkeypatch.setattr(R, "_wait_for_transcript", _done)
+    monkeypatch.setattr(
+        R,
+        "_load_transcript",
+        lambda tid: types.SimpleNamespace(id=tid, content="長い会議", language="ja"),
+    )
+    rsp = _post(client, wait="30", lang="ja")
+    assert rsp.status_code == 201
+    assert rsp.json()["transcript_id"] == 7
+    assert rsp.json()["content"] == "長い会議"
+    assert rsp.json()["language"] == "ja"
+    assert pipeline[0][1] == "ja"
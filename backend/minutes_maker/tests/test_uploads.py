@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+from minutes_maker.app.services import uploads as U
+
+
+@pytest.fixture(autouse=True)
+def _partial_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(U, "PARTIAL_DIR", tmp_path)
+
+
+def _create(**kw):
+    fields = dict(filename="meeting.m4a", content_type="audio/mp4", length=10, user_id="u1")
+    fields.update(kw)
+    return U.PartialUpload.create(**fields)
+
+
+def test_offset_follows_part_file_and_survives_reload():
+    upload = _create()
+    assert upload.offset == 0
+
+    with upload.part_path.open("ab") as f:
+        f.write(b"12345")
+
+    reloaded = U.PartialUpload.load(upload.file_id)
+    assert reloaded == upload
+    assert reloaded.offset == 5
+
+
+def test_lock_is_exclusive():
+    upload = _create()
+    with upload.locked():
+        with pytest.raises(U.UploadLocked):
+            with upload.locked():
+                pass
+    with upload.locked():
+        pass
+
+
+def test_load_rejects_path_traversal_and_unknown():
+    assert U.PartialUpload.load("../../etc/passwd") is None
+    assert U.PartialUpload.load("missing") is None
+
+
+def test_sweep_removes_only_stale_uploads():
+    fresh, stale = _create(), _create()
+    old = time.time() - 2 * U.PARTIAL_TTL_SEC
+    for p in (stale.part_path, stale.meta_path):
+        os.utime(p, (old, old))
+
+    assert U.sweep_stale_partials() == 1
+    assert U.PartialUpload.load(fresh.file_id) is not None
+    assert U.PartialUpload.load(stale.file_id) is None
+
+
+def test_promoted_upload_survives_reload_for_finalize_retry():
+    upload = _create()
+    upload.part_path.unlink()  # promote_partial で移動済み
+    upload.mark_promoted(U.StoredUpload("/data/uploads/x_meeting.m4a", 10, "ab" * 32))
+
+    reloaded = U.PartialUpload.load(upload.file_id)
+    assert reloaded.promoted == U.StoredUpload("/data/uploads/x_meeting.m4a", 10, "ab" * 32)
+    assert reloaded.offset == reloaded.length
@@ -1,6 +1,7 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from kombu import Queue
 
 celery_app = Celery(
     "ne_navi",
@@ -10,13 +11,68 @@ celery_app = Celery(
         "shared.etl_dify",
         "shared.draft_minutes",  # Minutes draft task
         "shared.stt_transcribe",
+        "shared.outbox",  # task_outbox dispatcher
     ],
 )
 
+# ---- queues (workload class ごとに worker プールを分ける) ----------------------
+# 長い ffmpeg / Whisper や ETL が、ユーザーが待っているドラフト生成を塞がないように
+# キューを分け、docker-compose でキュー毎に worker を立てる。
+STT_HEAVY = "stt-heavy"              # 長尺音声の re-encode + 分割 + Whisper
+STT_FAST = "stt-fast"                # 短い音声 (STT_FAST_MAX_SEC 以下) の fast lane
+LLM_INTERACTIVE = "llm-interactive"  # 議事録ドラフトなど、ユーザーが待つ LLM 処理
+ETL_BATCH = "etl-batch"              # Dify 同期などのバッチ
+
+celery_app.conf.task_queues = [Queue(q) for q in (STT_HEAVY, STT_FAST, LLM_INTERACTIVE, ETL_BATCH)]
+celery_app.conf.task_default_queue = LLM_INTERACTIVE
+celery_app.conf.task_routes = {
+    "minutes.transcribe_and_generate": {"queue": STT_HEAVY},  # fast lane は投入時に queue 指定
+    "minutes.draft.*": {"queue": LLM_INTERACTIVE},
+    "etl.*": {"queue": ETL_BATCH},
+    "outbox.*": {"queue": LLM_INTERACTIVE},  # 短い DB + publish のみ
+}
+
+# ---- time limits (秒, soft で SoftTimeLimitExceeded → 後始末) -----------------
+STT_TIME_LIMIT = int(os.getenv("STT_TIME_LIMIT", str(3 * 60 * 60)))
+DRAFT_TIME_LIMIT = int(os.getenv("DRAFT_TIME_LIMIT", "300"))
+ETL_TIME_LIMIT = int(os.getenv("ETL_TIME_LIMIT", str(30 * 60)))
+celery_app.conf.task_annotations = {
+    "minutes.transcribe_and_generate": {
+        "soft_time_limit": STT_TIME_LIMIT - 60,
+        "time_limit": STT_TIME_LIMIT,
+    },
+    "minutes.draft.generate": {
+        "soft_time_limit": DRAFT_TIME_LIMIT - 30,
+        "time_limit": DRAFT_TIME_LIMIT,
+    },
+    "etl.sync_dify": {
+        "soft_time_limit": ETL_TIME_LIMIT - 60,
+        "time_limit": ETL_TIME_LIMIT,
+    },
+}
+
+# 長いタスクを先取りして抱え込まない (空いている worker に回す)。
+# acks_late なので Redis の visibility_timeout は最長タスクより長くする (二重実行防止)
+celery_app.conf.worker_prefetch_multiplier = 1
+celery_app.conf.task_acks_late = True
+celery_app.conf.broker_transport_options = {"visibility_timeout": STT_TIME_LIMIT + 600}
+
 # ---- periodic tasks (example) ---------------------------------------------
+# beat は worker とは別プロセス (docker-compose の celery-beat) で動かす
+OUTBOX_DISPATCH_SEC = float(os.getenv("OUTBOX_DISPATCH_SEC", "5"))
 celery_app.conf.beat_schedule = {
     "sync-dify-15min": {
         "task": "etl.sync_dify",
         "schedule": 900,  # 15 min
     },
+    # commit 直後の即時送信に失敗した outbox 行の回収
+    "outbox-dispatch": {
+        "task": "outbox.dispatch",
+        "schedule": OUTBOX_DISPATCH_SEC,
+        "options": {"expires": OUTBOX_DISPATCH_SEC * 2},  # worker 停止中に溜めない
+    },
+    "outbox-purge-daily": {
+        "task": "outbox.purge",
+        "schedule": crontab(hour=3, minute=0),
+    },
 }
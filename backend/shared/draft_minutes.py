@@ -1,24 +1,82 @@
-"""Generate meeting-minutes draft from a transcript via OpenAI (model selectable)."""
+"""Generate meeting-minutes draft from a transcript via OpenAI (model selectable).
+
+Short transcripts are drafted in one call (``single``).  Transcripts above
+``DRAFT_SINGLE_MAX_TOKENS`` (or the model's context window, whichever is
+smaller; counted with :mod:`shared.prompt_budget`) use ``map_reduce``: the transcript is cut on
+``TranscriptChunk`` time boundaries into windows of ``DRAFT_WINDOW_TOKENS``,
+each window is summarised in parallel (``DRAFT_MAP_CONCURRENCY``), and the
+partial notes are reduced into the 概要 / 決定事項 / ToDo structure.  Wall time
+is therefore about one window call plus one reduce call.
+
+Every call goes through the LLM completion cache unless ``use_cache=False``, so
+regenerating a draft for an unchanged transcript (or a partly re-used window)
+is free.
+"""
 from __future__ import annotations
 
+import contextvars
+import math
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
 
-import openai
 from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 
-from shared.celery_app import celery_app
+from shared.celery_app import DRAFT_TIME_LIMIT, celery_app
 from minutes_maker.app import SessionLocal
 from minutes_maker.app.db import models as M
+from shared import job_progress as P
+from shared import llm_gateway
+from shared import prompt_budget as PB
+from shared.job_progress import publish_progress
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# 1 回の呼び出しに入れる transcript の上限 (これを超えたら map-reduce)
+DRAFT_SINGLE_MAX_TOKENS = int(os.getenv("DRAFT_SINGLE_MAX_TOKENS", "24000"))
+# map 1 窓あたりの入力トークン予算
+DRAFT_WINDOW_TOKENS = int(os.getenv("DRAFT_WINDOW_TOKENS", "6000"))
+# map を同時に走らせる数
+DRAFT_MAP_CONCURRENCY = int(os.getenv("DRAFT_MAP_CONCURRENCY", "4"))
+# reduce 入力が大きすぎるときの中間まとめの段数上限
+DRAFT_REDUCE_MAX_LEVELS = 3
+# 議事録 1 本ぶんとして確保しておく completion トークン
+DRAFT_COMPLETION_TOKENS = 4096
+# map の 1 巡 (DRAFT_MAP_CONCURRENCY 窓) ごとにタスクの時間制限へ足す秒数
+DRAFT_TIME_PER_ROUND_SEC = int(os.getenv("DRAFT_TIME_PER_ROUND_SEC", "90"))
 
 _SYSTEM_PROMPT = (
     "You are an expert secretary. Summarise the following meeting transcript "
     "into Japanese markdown with sections: 概要 / 決定事項 / ToDo."
 )
+_MAP_PROMPT = (
+    "You are an expert secretary. The following is one part ({span}) of a longer "
+    "meeting transcript. List, as Japanese markdown bullet points, the topics "
+    "discussed, decisions made and action items (with owner / due date if stated) "
+    "in this part only. Do not invent anything that is not in the text."
+)
+_COMBINE_PROMPT = (
+    "You are an expert secretary. Merge the following partial meeting notes "
+    "(in time order) into one shorter list of Japanese markdown bullet points, "
+    "keeping every decision and action item and removing duplicates."
+)
+_REDUCE_PROMPT = (
+    "You are an expert secretary. The following are notes taken from consecutive "
+    "parts of one meeting, in time order. Write the meeting minutes as Japanese "
+    "markdown with sections: 概要 / 決定事項 / ToDo. Merge duplicates across parts "
+    "and do not invent anything that is not in the notes."
+)
+
+
+class Window(NamedTuple):
+    start_ms: Optional[int]
+    end_ms: Optional[int]
+    text: str
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """model のトークナイザで数えたトークン数 (tiktoken が無ければ文字数)"""
+    return PB.count_tokens(text, model)
 
 
 def _fetch_transcript(sess: Session, transcript_id: int) -> str:
@@ -28,7 +86,237 @@ def _fetch_transcript(sess: Session, transcript_id: int) -> str:
     return txt
 
 
-def _store_new_version(sess: Session, transcript_id: int, markdown: str):
+def _fetch_chunks(sess: Session, transcript_id: int) -> List[Tuple[int, int, str]]:
+    return [
+        tuple(row)
+        for row in sess.execute(
+            select(M.TranscriptChunk.start_ms, M.TranscriptChunk.end_ms, M.TranscriptChunk.text)
+            .where(M.TranscriptChunk.transcript_id == transcript_id)
+            .order_by(M.TranscriptChunk.start_ms)
+        )
+    ]
+
+
+def _split_text(text: str, budget: int, model: Optional[str] = None) -> List[str]:
+    """budget 以下になるよう、なるべく改行 / 句点で text を区切る"""
+    parts: List[str] = []
+    while estimate_tokens(text, model) > budget:
+        head = PB.truncate(text, budget, model)
+        cut = max(head.rfind("\n"), head.rfind("。"))
+        cut = cut + 1 if cut > len(head) // 2 else len(head)
+        # 予算が 1 トークン (多バイト文字) に満たず head が空でも必ず進める
+        cut = max(cut, 1)
+        parts.append(text[:cut])
+        text = text[cut:]
+    if text.strip():
+        parts.append(text)
+    return parts
+
+
+def build_windows(
+    chunks: Sequence[Tuple[int, int, str]],
+    content: str,
+    budget: int,
+    model: Optional[str] = None,
+) -> List[Window]:
+    """
+    TranscriptChunk の時刻境界で budget 以下の窓にまとめる。
+    chunks が無い transcript (古いデータ等) は content を改行で区切る。
+    """
+    if not chunks:
+        return [Window(None, None, t) for t in _split_text(content, budget, model)]
+
+    windows: List[Window] = []
+    lines: List[str] = []
+    start = end = None
+    used = 0
+    for s_ms, e_ms, text in chunks:
+        cost = estimate_tokens(text, model) + 1
+        if lines and used + cost > budget:
+            windows.append(Window(start, end, "\n".join(lines)))
+            lines, start, used = [], None, 0
+        if cost > budget:  # 1 チャンクだけで予算超過 (無音の少ない長い発話)
+            windows.extend(
+                Window(s_ms, e_ms, t) for t in _split_text(text, budget, model)
+            )
+            continue
+        start = s_ms if start is None else start
+        end = e_ms
+        lines.append(text)
+        used += cost
+    if lines:
+        windows.append(Window(start, end, "\n".join(lines)))
+    return windows
+
+
+def _fmt_ms(ms: Optional[int]) -> str:
+    if ms is None:
+        return "?"
+    sec = ms // 1000
+    return f"{sec // 3600:02d}:{sec % 3600 // 60:02d}:{sec % 60:02d}"
+
+
+def _chat(
+    model: str, system: str, user: str, temperature: float = 0.4, cache: bool = True
+) -> str:
+    completion = llm_gateway.chat(
+        model,
+        [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ],
+        temperature=temperature,
+        cache=cache,
+    )
+    return completion.choices[0].message.content  # type: ignore[index]
+
+
+def _parallel(fn, items: Sequence[Any], concurrency: int) -> List[str]:
+    """fn を最大 concurrency 並列で適用 (結果は入力順)"""
+    workers = max(1, min(concurrency, len(items)))
+    if workers == 1:
+        return [fn(item) for item in items]
+    # llm_gateway.tagged のタグをワーカースレッドにも引き継ぐ (item ごとにコピー)
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="draft") as pool:
+        return list(pool.map(lambda ctx, item: ctx.run(fn, item), contexts, items))
+
+
+def _pack(
+    notes: Sequence[str], budget: int, model: Optional[str] = None
+) -> List[List[str]]:
+    """連続する notes を budget 以下のグループにまとめる (各グループ最低 1 件)"""
+    groups: List[List[str]] = [[]]
+    used = 0
+    for note in notes:
+        cost = estimate_tokens(note, model)
+        if groups[-1] and used + cost > budget:
+            groups.append([])
+            used = 0
+        groups[-1].append(note)
+        used += cost
+    return groups
+
+
+def map_reduce_draft(
+    windows: Sequence[Window],
+    model: str,
+    reduce_budget: int = DRAFT_SINGLE_MAX_TOKENS,
+    concurrency: int = DRAFT_MAP_CONCURRENCY,
+    cache: bool = True,
+) -> Tuple[str, int]:
+    """窓ごとの要約 (並列) → 統合。(markdown, 中間まとめの段数) を返す"""
+
+    def _map(w: Window) -> str:
+        span = f"{_fmt_ms(w.start_ms)}–{_fmt_ms(w.end_ms)}"
+        notes = _chat(
+            model, _MAP_PROMPT.format(span=span), w.text, temperature=0.2, cache=cache
+        )
+        return f"### {span}\n{notes}"
+
+    notes = _parallel(_map, windows, concurrency)
+
+    # まとめきれない量なら中間まとめを挟む (階層的 reduce)
+    levels = 0
+    while (
+        len(notes) > 1
+        and sum(estimate_tokens(n, model) for n in notes) > reduce_budget
+        and levels < DRAFT_REDUCE_MAX_LEVELS
+    ):
+        groups = _pack(notes, reduce_budget, model)
+        notes = _parallel(
+            lambda g: _chat(
+                model, _COMBINE_PROMPT, "\n\n".join(g), temperature=0.2, cache=cache
+            ),
+            groups,
+            concurrency,
+        )
+        levels += 1
+
+    return _chat(model, _REDUCE_PROMPT, "\n\n".join(notes), cache=cache), levels
+
+
+def single_max_tokens(model: str) -> int:
+    """1 回の呼び出しに入れてよい transcript のトークン数 (設定値とモデルの窓の小さい方)"""
+    return min(
+        DRAFT_SINGLE_MAX_TOKENS, PB.prompt_limit(model, DRAFT_COMPLETION_TOKENS)
+    )
+
+
+def draft_markdown(
+    content: str,
+    chunks: Sequence[Tuple[int, int, str]],
+    model: str,
+    use_cache: bool = True,
+) -> Tuple[str, dict]:
+    """transcript から議事録 Markdown を作る。(markdown, meta) を返す"""
+    tokens = estimate_tokens(content, model)
+    limit = single_max_tokens(model)
+    meta: dict[str, Any] = {
+        "model": model,
+        "tokenizer": PB.tokenizer_name(model),
+        "input_tokens_est": tokens,
+    }
+    if tokens <= limit:
+        meta["strategy"] = "single"
+        markdown = _chat(model, _SYSTEM_PROMPT, content, cache=use_cache)
+    else:
+        window_tokens = min(DRAFT_WINDOW_TOKENS, limit)
+        windows = build_windows(chunks, content, window_tokens, model)
+        markdown, levels = map_reduce_draft(
+            windows, model, limit, DRAFT_MAP_CONCURRENCY, cache=use_cache
+        )
+        meta.update(
+            strategy="map_reduce",
+            windows=len(windows),
+            window_tokens=window_tokens,
+            map_concurrency=DRAFT_MAP_CONCURRENCY,
+            reduce_levels=levels + 1,
+        )
+    meta["completion_tokens_est"] = estimate_tokens(markdown, model)
+    return markdown, meta
+
+
+def draft_time_limit(tokens: int, model: str) -> int:
+    """
+    tokens の transcript を下書きするタスクの時間制限 (秒)。
+    DRAFT_TIME_LIMIT は single と map 1 巡 + reduce の分で、窓が並列数を超える長い会議は
+    map が何巡もするので、その巡回数だけ延ばす
+    """
+    limit = single_max_tokens(model)
+    if tokens <= limit:
+        return DRAFT_TIME_LIMIT
+    windows = math.ceil(tokens / min(DRAFT_WINDOW_TOKENS, limit))
+    rounds = math.ceil(windows / max(1, DRAFT_MAP_CONCURRENCY))
+    return DRAFT_TIME_LIMIT + (rounds - 1) * DRAFT_TIME_PER_ROUND_SEC
+
+
+def enqueue_draft(
+    transcript_id: int,
+    content: str | None = None,
+    model: str = "gpt-4o-mini",
+    **kwargs: Any,
+):
+    """generate_minutes_draft を transcript の長さに合わせた時間制限で投入する"""
+    if content is None:
+        with SessionLocal() as sess:
+            content = _fetch_transcript(sess, transcript_id)
+    limit = draft_time_limit(estimate_tokens(content or "", model), model)
+    return generate_minutes_draft.apply_async(
+        (transcript_id, model),
+        kwargs,
+        time_limit=limit,
+        soft_time_limit=limit - 30,
+    )
+
+
+def _store_new_version(
+    sess: Session,
+    transcript_id: int,
+    markdown: str,
+    user_id: str | None = None,
+    meta: dict | None = None,
+) -> M.MinutesVersion:
     next_no: int = (
         sess.execute(
             select(
@@ -42,33 +330,53 @@ def _store_new_version(sess: Session, transcript_id: int, markdown: str):
         markdown=markdown,
         created_by="draft_bot",
         created_at=datetime.utcnow(),
+        user_id=user_id,
+        meta=meta,
     )
     sess.add(mv)
     sess.commit()
+    return mv
 
 
 @celery_app.task(name="minutes.draft.generate")
 def generate_minutes_draft(
     transcript_id: int,
     model: str = "gpt-4o-mini",
+    user_id: str | None = None,
+    job_id: str | None = None,
+    use_cache: bool = True,
 ) -> dict[str, Any]:
-    """Celery entry point. Returns {'status': 'ok'} on success."""
+    """Celery entry point. Returns {'status': 'ok'} on success.
+
+    When *job_id* is given (STT pipeline), progress is published for that job.
+    ``use_cache=False`` forces fresh completions (``X-LLM-Cache: bypass``).
+    """
     sess = SessionLocal()
     try:
         content = _fetch_transcript(sess, transcript_id)
         if not content:
             raise ValueError("transcript not found")
 
-        completion = openai.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": _SYSTEM_PROMPT},
-                {"role": "user", "content": content[:32_768]},
-            ],
-            temperature=0.4,
+        chunks = (
+            _fetch_chunks(sess, transcript_id)
+            if estimate_tokens(content, model) > single_max_tokens(model)
+            else []
+        )
+        with llm_gateway.tagged(
+            operation="minutes_draft", transcript_id=transcript_id, user_id=user_id
+        ):
+            markdown, meta = draft_markdown(content, chunks, model, use_cache)
+        mv = _store_new_version(sess, transcript_id, markdown, user_id, meta)
+        publish_progress(
+            job_id,
+            P.DRAFT_READY,
+            transcript_id=transcript_id,
+            version_no=mv.version_no,
+            strategy=meta["strategy"],
         )
-        markdown = completion.choices[0].message.content  # type: ignore[index]
-        _store_new_version(sess, transcript_id, markdown)
-        return {"status": "ok", "model": model}
+        return {"status": "ok", "model": model, "strategy": meta["strategy"]}
+    except Exception as exc:
+        publish_progress(job_id, P.FAILED, error=str(exc)[:200])
+        raise
     finally:
         sess.close()
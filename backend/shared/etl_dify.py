@@ -19,7 +19,7 @@ from typing import Any, Dict, List
 from urllib.parse import urljoin
 
 import requests
-from openai import OpenAI, OpenAIError
+from openai import OpenAIError
 from sqlalchemy.orm import Session
 from tenacity import (
     retry,
@@ -28,6 +28,7 @@ from tenacity import (
     wait_exponential_jitter,
 )
 
+from shared import llm_gateway
 from shared.celery_app import celery_app
 from chat_explorer.app.db import SessionLocal
 from chat_explorer.app.db import models as M
@@ -49,7 +50,6 @@ HEADERS = {
     "User-Agent": "ne-navi-etl/0.4",
 }
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", ""))
 PAGE_LIMIT = 100
 BATCH_EMB_LIMIT = 96
 
@@ -126,10 +126,8 @@ def _iter_messages(conversation_id: str) -> Iterator[Dict[str, Any]]:
 
 def _embed_texts(texts: list[str]) -> list[list[float]]:
     try:
-        rsp = openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=texts,
-        )
+        with llm_gateway.tagged(operation="etl_embed"):
+            rsp = llm_gateway.embed("text-embedding-3-small", texts)
         return [d.embedding for d in rsp.data]
     except OpenAIError as e:  # log & skip batch
         logger.error("Embedding batch failed – skipped (%s)", e)
@@ -0,0 +1,73 @@
+"""Fine-grained job progress events over Redis pub/sub.
+
+Celery tasks call :func:`publish_progress`; the API streams the events to
+clients via SSE (``GET /api/jobs/{job_id}/events``) without touching the DB.
+
+* channel  ``jobs:progress:<job_id>``  – live events
+* key      ``jobs:progress:<job_id>:last`` – latest event (for late subscribers)
+
+Publishing is best-effort: a Redis outage must never fail an STT / draft job.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from typing import Any
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv(
+    "PROGRESS_REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+)
+SNAPSHOT_TTL_SEC = 6 * 60 * 60
+
+# stage 名 (フロントエンドとの取り決め)
+PROCESSING = "processing"
+CACHE_HIT = "cache_hit"
+REENCODE_DONE = "reencode_done"
+SEGMENTS_PLANNED = "segments_planned"
+SEGMENT_TRANSCRIBED = "segment_transcribed"
+CHUNKS_STORED = "chunks_stored"
+DRAFT_QUEUED = "draft_queued"
+DRAFT_READY = "draft_ready"
+FAILED = "failed"
+
+TERMINAL_STAGES = frozenset({DRAFT_READY, FAILED})
+
+_client: redis.Redis | None = None
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
+
+
+def channel(job_id: str) -> str:
+    return f"jobs:progress:{job_id}"
+
+
+def snapshot_key(job_id: str) -> str:
+    return f"{channel(job_id)}:last"
+
+
+def publish_progress(job_id: str | None, stage: str, **data: Any) -> None:
+    """job_id の進捗イベントを publish し、最新イベントとしても保存する"""
+    if not job_id:
+        return
+    payload = json.dumps(
+        {"job_id": job_id, "stage": stage, "ts": time.time(), **data},
+        ensure_ascii=False,
+    )
+    try:
+        pipe = _redis().pipeline()
+        pipe.set(snapshot_key(job_id), payload, ex=SNAPSHOT_TTL_SEC)
+        pipe.publish(channel(job_id), payload)
+        pipe.execute()
+    except redis.RedisError as exc:
+        logger.warning("progress publish failed for job %s (%s): %s", job_id, stage, exc)
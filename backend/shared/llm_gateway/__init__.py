@@ -0,0 +1,46 @@
+"""
+Central gateway for every OpenAI call (chat, embeddings, Whisper).
+
+* :mod:`.clients` – pooled sync / async clients, one pair per process
+* :mod:`.limiter` – Redis token buckets (RPM / TPM per model)
+* :mod:`.cache`   – content-addressed chat completion cache
+* :mod:`.gateway` – jittered retries, per-call timeouts
+* :mod:`.metrics` – one record per call, tagged with :func:`tagged`
+* :mod:`.telemetry` – batched background writes of those records to ``llm_calls``
+
+Call sites use the functions re-exported here instead of their own clients.
+"""
+from .cache import BYPASS_HEADER, bypass_requested
+from .cache import stats as cache_stats
+from .clients import async_client, sync_client
+from .gateway import (
+    RETRYABLE_ERRORS,
+    achat,
+    achat_stream,
+    atranscribe,
+    chat,
+    embed,
+    transcribe,
+)
+from .metrics import current_tags, tagged
+from .metrics import snapshot as metrics_snapshot
+from .telemetry import cost_usd
+
+__all__ = [
+    "BYPASS_HEADER",
+    "RETRYABLE_ERRORS",
+    "achat",
+    "achat_stream",
+    "async_client",
+    "atranscribe",
+    "bypass_requested",
+    "cache_stats",
+    "chat",
+    "cost_usd",
+    "current_tags",
+    "embed",
+    "metrics_snapshot",
+    "sync_client",
+    "tagged",
+    "transcribe",
+]
@@ -0,0 +1,130 @@
+"""
+Content-addressed chat completion cache in Redis.
+
+The key is a SHA-256 of the model, the normalised messages and every other
+request parameter (temperature, response_format, …), so an identical request
+returns the stored ``ChatCompletion`` without calling OpenAI.
+
+* ``llm:cache:<sha256>`` – completion JSON, expires after ``LLM_CACHE_TTL_SEC``
+  (refreshed on every hit)
+* ``llm:cache:lru``       – last access time per key; beyond
+  ``LLM_CACHE_MAX_ENTRIES`` the least recently used entries are evicted
+* ``llm:cache:stats``     – hit / miss counters (total and per model)
+
+Lookups are best-effort: a Redis error counts as a miss.  Clients can skip the
+cache for one request with the ``X-LLM-Cache: bypass`` header (or
+``Cache-Control: no-cache``).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv(
+    "LLM_CACHE_REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", str(7 * 24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+
+BYPASS_HEADER = "X-LLM-Cache"
+PREFIX = "llm:cache:"
+LRU_KEY = PREFIX + "lru"
+STATS_KEY = PREFIX + "stats"
+# OpenAI の既定値。省略時と明示時で同じキーになるように補う
+_DEFAULT_TEMPERATURE = 1.0
+
+_client: redis.Redis | None = None
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
+
+
+def bypass_requested(cache_header: Optional[str], cache_control: Optional[str] = None) -> bool:
+    """リクエストヘッダがキャッシュの迂回を求めているか"""
+    if cache_header and cache_header.strip().lower() in ("bypass", "off", "no-cache"):
+        return True
+    return bool(cache_control and "no-cache" in cache_control.lower())
+
+
+def _normalise(text: Optional[str]) -> str:
+    lines = (text or "").replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def fingerprint(model: str, messages: Sequence[Dict[str, str]], params: Dict[str, Any]) -> str:
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": m.get("role", "user"), "content": _normalise(m.get("content"))}
+            for m in messages
+        ],
+        "params": {"temperature": _DEFAULT_TEMPERATURE, **params},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return PREFIX + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _count(model: str, outcome: str) -> None:
+    pipe = _redis().pipeline()
+    pipe.hincrby(STATS_KEY, outcome, 1)
+    pipe.hincrby(STATS_KEY, f"{outcome}:{model}", 1)
+    pipe.execute()
+
+
+def get(key: str, model: str) -> Optional[str]:
+    """キャッシュ済みの completion JSON (無ければ None)"""
+    try:
+        value = _redis().get(key)
+        if value is None:
+            _count(model, "miss")
+            return None
+        pipe = _redis().pipeline()
+        pipe.expire(key, LLM_CACHE_TTL_SEC)
+        pipe.zadd(LRU_KEY, {key: time.time()})
+        pipe.execute()
+        _count(model, "hit")
+        return value.decode()
+    except redis.RedisError as exc:
+        logger.warning("LLM cache lookup failed: %s", exc)
+        return None
+
+
+def put(key: str, value: str) -> None:
+    now = time.time()
+    try:
+        pipe = _redis().pipeline()
+        pipe.set(key, value, ex=LLM_CACHE_TTL_SEC)
+        pipe.zadd(LRU_KEY, {key: now})
+        # TTL で消えたキーの索引を掃除
+        pipe.zremrangebyscore(LRU_KEY, "-inf", now - LLM_CACHE_TTL_SEC)
+        pipe.zcard(LRU_KEY)
+        size = pipe.execute()[-1]
+        overflow = size - LLM_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = [k for k, _ in _redis().zpopmin(LRU_KEY, overflow)]
+            if evicted:
+                _redis().delete(*evicted)
+    except redis.RedisError as exc:
+        logger.warning("LLM cache store failed: %s", exc)
+
+
+def stats() -> Dict[str, int]:
+    """{"hit": n, "miss": n, "hit:<model>": n, ...}"""
+    try:
+        return {k.decode(): int(v) for k, v in _redis().hgetall(STATS_KEY).items()}
+    except redis.RedisError as exc:
+        logger.warning("LLM cache stats unavailable: %s", exc)
+        return {}
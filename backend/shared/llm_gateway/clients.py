@@ -0,0 +1,64 @@
+"""
+Process-wide OpenAI clients with tuned connection pools.
+
+Clients are created lazily so that Celery prefork children each build their
+own pool after fork.  SDK-level retries are disabled (``max_retries=0``): the
+gateway retries itself so that every attempt passes the rate limiter and is
+counted in metrics.  ``OPENAI_API_KEY`` / ``OPENAI_BASE_URL`` are read from env.
+"""
+from __future__ import annotations
+
+import os
+import threading
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "16"))
+LLM_KEEPALIVE_SEC = float(os.getenv("LLM_KEEPALIVE_SEC", "60"))
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "120"))
+LLM_CONNECT_TIMEOUT_SEC = float(os.getenv("LLM_CONNECT_TIMEOUT_SEC", "5"))
+
+_lock = threading.Lock()
+_sync: OpenAI | None = None
+_async: AsyncOpenAI | None = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_SEC,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT_SEC, connect=LLM_CONNECT_TIMEOUT_SEC)
+
+
+def sync_client() -> OpenAI:
+    global _sync
+    if _sync is None:
+        with _lock:
+            if _sync is None:
+                _sync = OpenAI(
+                    max_retries=0,
+                    timeout=_timeout(),
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+                )
+    return _sync
+
+
+def async_client() -> AsyncOpenAI:
+    """API プロセス (単一 event loop) 用"""
+    global _async
+    if _async is None:
+        with _lock:
+            if _async is None:
+                _async = AsyncOpenAI(
+                    max_retries=0,
+                    timeout=_timeout(),
+                    http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+                )
+    return _async
@@ -0,0 +1,302 @@
+"""
+Rate-limited, retried and metered OpenAI calls.
+
+Every attempt first takes a slot from the model's token bucket
+(:mod:`.limiter`), runs with a per-call timeout, and is retried with
+exponential back-off + jitter on transient errors only.  One
+:class:`~.metrics.CallRecord` is written per call (not per attempt).
+``chat(..., cache=True)`` is answered from :mod:`.cache` when possible.
+"""
+from __future__ import annotations
+
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, TypeVar
+
+import openai
+from openai.types.chat import ChatCompletion
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+from shared import prompt_budget as PB
+
+from . import cache as llm_cache
+from . import limiter, metrics
+from .clients import async_client, sync_client
+
+T = TypeVar("T")
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+LLM_RETRY_INITIAL_SEC = float(os.getenv("LLM_RETRY_INITIAL_SEC", "1"))
+LLM_RETRY_MAX_SEC = float(os.getenv("LLM_RETRY_MAX_SEC", "20"))
+
+# endpoint 毎の既定タイムアウト (秒)。呼び出し側で timeout= を渡せば上書き
+TIMEOUTS: Dict[str, float] = {
+    "chat": float(os.getenv("LLM_CHAT_TIMEOUT_SEC", "120")),
+    "chat_stream": float(os.getenv("LLM_CHAT_TIMEOUT_SEC", "120")),
+    "embeddings": float(os.getenv("LLM_EMBED_TIMEOUT_SEC", "30")),
+    "transcriptions": float(os.getenv("STT_TIMEOUT_SEC", "300")),
+}
+
+
+def _retry_kwargs() -> Dict[str, Any]:
+    return dict(
+        retry=retry_if_exception_type(RETRYABLE_ERRORS),
+        wait=wait_exponential_jitter(initial=LLM_RETRY_INITIAL_SEC, max=LLM_RETRY_MAX_SEC),
+        stop=stop_after_attempt(LLM_MAX_ATTEMPTS),
+        reraise=True,
+    )
+
+
+def _record(
+    endpoint: str,
+    model: str,
+    t0: float,
+    attempts: int,
+    waited: float,
+    rsp: Any,
+    exc: Any,
+    tags: Optional[Dict[str, Any]] = None,
+) -> None:
+    prompt_tokens, completion_tokens = metrics.usage_tokens(rsp)
+    rec = metrics.CallRecord(
+        endpoint=endpoint,
+        model=model,
+        latency_sec=time.perf_counter() - t0,
+        attempts=attempts,
+        ok=exc is None,
+        limiter_wait_sec=waited,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        error=type(exc).__name__ if exc is not None else None,
+    )
+    # ストリームは with tagged(...) を抜けた後に記録するので、開始時のタグを渡す
+    metrics.record(rec._replace(**tags) if tags else rec)
+
+
+def _call(endpoint: str, model: str, tokens: int, fn: Callable[[], T]) -> T:
+    t0 = time.perf_counter()
+    attempts, waited, rsp, error = 0, 0.0, None, None
+    try:
+        for attempt in Retrying(**_retry_kwargs()):
+            with attempt:
+                attempts += 1
+                waited += limiter.acquire(model, tokens)
+                rsp = fn()
+        return rsp  # type: ignore[return-value]
+    except Exception as exc:
+        error = exc
+        raise
+    finally:
+        _record(endpoint, model, t0, attempts, waited, rsp, error)
+
+
+async def _acall(
+    endpoint: str,
+    model: str,
+    tokens: int,
+    fn: Callable[[], Awaitable[T]],
+    on_success: Optional[Callable[[T, float, int, float], T]] = None,
+) -> T:
+    """on_success があれば成功時の記録はそちらに任せる (ストリームは読み終えてから記録)"""
+    t0 = time.perf_counter()
+    attempts, waited, rsp, error = 0, 0.0, None, None
+    try:
+        async for attempt in AsyncRetrying(**_retry_kwargs()):
+            with attempt:
+                attempts += 1
+                waited += await limiter.aacquire(model, tokens)
+                rsp = await fn()
+        if on_success is not None:
+            return on_success(rsp, t0, attempts, waited)  # type: ignore[arg-type]
+        return rsp  # type: ignore[return-value]
+    except Exception as exc:
+        error = exc
+        raise
+    finally:
+        if on_success is None or error is not None:
+            _record(endpoint, model, t0, attempts, waited, rsp, error)
+
+
+def _chat_tokens(model: str, messages: Sequence[Dict[str, str]], kwargs: Dict[str, Any]) -> int:
+    # OpenAI の TPM 計上と同じく prompt + max_tokens で見積もる
+    return PB.count_messages(messages, model) + int(kwargs.get("max_tokens") or 0)
+
+
+def _rewind(params: Dict[str, Any]) -> Dict[str, Any]:
+    """リトライ時にファイルを先頭から送り直す"""
+    fp = params.get("file")
+    if hasattr(fp, "seek"):
+        fp.seek(0)
+    return params
+
+
+# --------------------------------------------------------------------------- #
+#  Public API
+# --------------------------------------------------------------------------- #
+def chat(
+    model: str,
+    messages: Sequence[Dict[str, str]],
+    *,
+    timeout: Optional[float] = None,
+    cache: bool = False,
+    **kwargs: Any,
+):
+    """chat.completions.create (同期)。cache=True なら同一リクエストの結果を再利用"""
+    key = None
+    if cache and llm_cache.LLM_CACHE_ENABLED:
+        t0 = time.perf_counter()
+        key = llm_cache.fingerprint(model, messages, kwargs)
+        hit = llm_cache.get(key, model)
+        if hit is not None:
+            rsp = ChatCompletion.model_validate_json(hit)
+            prompt_tokens, completion_tokens = metrics.usage_tokens(rsp)
+            metrics.record(
+                metrics.CallRecord(
+                    endpoint="chat",
+                    model=model,
+                    latency_sec=time.perf_counter() - t0,
+                    attempts=0,
+                    ok=True,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                    cache_hit=True,
+                )
+            )
+            return rsp
+
+    rsp = _call(
+        "chat",
+        model,
+        _chat_tokens(model, messages, kwargs),
+        lambda: sync_client().chat.completions.create(
+            model=model, messages=messages, timeout=timeout or TIMEOUTS["chat"], **kwargs
+        ),
+    )
+    if key is not None:
+        llm_cache.put(key, rsp.model_dump_json())
+    return rsp
+
+
+async def achat(
+    model: str,
+    messages: Sequence[Dict[str, str]],
+    *,
+    timeout: Optional[float] = None,
+    **kwargs: Any,
+):
+    """chat.completions.create (async)"""
+    return await _acall(
+        "chat",
+        model,
+        _chat_tokens(model, messages, kwargs),
+        lambda: async_client().chat.completions.create(
+            model=model, messages=messages, timeout=timeout or TIMEOUTS["chat"], **kwargs
+        ),
+    )
+
+
+async def achat_stream(
+    model: str,
+    messages: Sequence[Dict[str, str]],
+    *,
+    timeout: Optional[float] = None,
+    **kwargs: Any,
+):
+    """
+    stream=True の chat.completions。リトライは最初のチャンクが届く前 (接続確立) まで。
+    記録はストリームを読み終えた (閉じた) 時点で 1 件。usage は最後のチャンクから取り、
+    届かなかった場合 (途中で閉じた等) は prompt と受信済み本文から見積もる
+    """
+    kwargs.setdefault("stream_options", {"include_usage": True})
+    tags = metrics.current_tags()
+
+    def _metered(stream: Any, t0: float, attempts: int, waited: float):
+        async def _chunks():
+            usage, parts, error = None, [], None
+            try:
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = chunk
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                    yield chunk
+            except Exception as exc:
+                error = exc
+                raise
+            finally:
+                if usage is None:
+                    usage = SimpleNamespace(
+                        usage=SimpleNamespace(
+                            prompt_tokens=PB.count_messages(messages, model),
+                            completion_tokens=PB.count_tokens("".join(parts), model),
+                        )
+                    )
+                _record("chat_stream", model, t0, attempts, waited, usage, error, tags)
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    await close()
+
+        return _chunks()
+
+    return await _acall(
+        "chat_stream",
+        model,
+        _chat_tokens(model, messages, kwargs),
+        lambda: async_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            timeout=timeout or TIMEOUTS["chat_stream"],
+            **kwargs,
+        ),
+        on_success=_metered,
+    )
+
+
+def embed(model: str, texts: Sequence[str], *, timeout: Optional[float] = None):
+    """embeddings.create (同期)"""
+    return _call(
+        "embeddings",
+        model,
+        sum(PB.count_tokens(t, model) for t in texts),
+        lambda: sync_client().embeddings.create(
+            model=model, input=list(texts), timeout=timeout or TIMEOUTS["embeddings"]
+        ),
+    )
+
+
+def transcribe(*, timeout: Optional[float] = None, **params: Any):
+    """audio.transcriptions.create (同期)。params は stt_transcribe.whisper_request"""
+    return _call(
+        "transcriptions",
+        params["model"],
+        0,
+        lambda: sync_client().audio.transcriptions.create(
+            timeout=timeout or TIMEOUTS["transcriptions"], **_rewind(params)
+        ),
+    )
+
+
+async def atranscribe(*, timeout: Optional[float] = None, **params: Any):
+    """audio.transcriptions.create (async)"""
+    return await _acall(
+        "transcriptions",
+        params["model"],
+        0,
+        lambda: async_client().audio.transcriptions.create(
+            timeout=timeout or TIMEOUTS["transcriptions"], **_rewind(params)
+        ),
+    )
@@ -0,0 +1,150 @@
+"""
+Redis token buckets per model, shared by every API process and Celery worker.
+
+Each model has two buckets that refill continuously over a minute:
+
+* ``llm:rl:<model>:rpm`` – one token per request
+* ``llm:rl:<model>:tpm`` – prompt + max completion tokens per request
+
+Limits come from ``LLM_RATE_LIMITS`` (JSON ``{"model-prefix": [rpm, tpm]}``,
+0 = unlimited) on top of the defaults below.  Like job progress, limiting is
+best-effort: if Redis is unreachable, or the wait would exceed
+``LLM_LIMIT_MAX_WAIT_SEC``, the call goes ahead and OpenAI's own 429 handling
+(retries in the gateway) takes over.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv(
+    "LLM_LIMIT_REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+)
+LLM_LIMIT_MAX_WAIT_SEC = float(os.getenv("LLM_LIMIT_MAX_WAIT_SEC", "30"))
+
+# (RPM, TPM) – 前方一致、長いプレフィックス優先。組織の tier に合わせて env で上書き
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "gpt-4o-mini": (500, 200_000),
+    "gpt-4o": (500, 30_000),
+    "text-embedding-3": (3_000, 1_000_000),
+    "whisper-1": (50, 0),
+}
+LIMITS: Dict[str, Tuple[int, int]] = {
+    **DEFAULT_LIMITS,
+    **{k: tuple(v) for k, v in json.loads(os.getenv("LLM_RATE_LIMITS") or "{}").items()},
+}
+
+# KEYS = [rpm bucket, tpm bucket], ARGV = [rpm, tpm, tokens]
+# 足りなければ何も減らさずに待ち秒数を返す (両方揃ったときだけ消費する)
+_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local caps = {tonumber(ARGV[1]), tonumber(ARGV[2])}
+local needs = {1, tonumber(ARGV[3])}
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+  if caps[i] > 0 then
+    local need = math.min(needs[i], caps[i])
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(state[1]) or caps[i]
+    local ts = tonumber(state[2]) or now
+    level = math.min(caps[i], level + (now - ts) * caps[i] / 60)
+    levels[i] = level
+    if level < need then
+      wait = math.max(wait, (need - level) * 60 / caps[i])
+    end
+  end
+end
+if wait > 0 then
+  return tostring(wait)
+end
+for i = 1, 2 do
+  if caps[i] > 0 then
+    redis.call('HSET', KEYS[i], 'level', levels[i] - math.min(needs[i], caps[i]), 'ts', now)
+    redis.call('EXPIRE', KEYS[i], 120)
+  end
+end
+return '0'
+"""
+
+_client: redis.Redis | None = None
+_aclient: aioredis.Redis | None = None
+
+
+def limits_for(model: str) -> Tuple[int, int]:
+    for prefix in sorted(LIMITS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return LIMITS[prefix]
+    return 0, 0
+
+
+def _keys(model: str) -> list[str]:
+    return [f"llm:rl:{model}:rpm", f"llm:rl:{model}:tpm"]
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
+
+
+def _aredis() -> aioredis.Redis:
+    global _aclient
+    if _aclient is None:
+        _aclient = aioredis.Redis.from_url(REDIS_URL)
+    return _aclient
+
+
+def acquire(model: str, tokens: int = 0) -> float:
+    """model の枠が空くまで待つ。待った秒数を返す"""
+    rpm, tpm = limits_for(model)
+    if not rpm and not tpm:
+        return 0.0
+    script = _redis().register_script(_ACQUIRE_LUA)
+    waited = 0.0
+    try:
+        while True:
+            wait = float(script(keys=_keys(model), args=[rpm, tpm, tokens]))
+            if wait <= 0:
+                return waited
+            if waited + wait > LLM_LIMIT_MAX_WAIT_SEC:
+                logger.warning("rate limit wait for %s exceeds %.0fs – sending anyway", model, LLM_LIMIT_MAX_WAIT_SEC)
+                return waited
+            time.sleep(wait)
+            waited += wait
+    except redis.RedisError as exc:
+        logger.warning("rate limiter unavailable for %s: %s", model, exc)
+        return waited
+
+
+async def aacquire(model: str, tokens: int = 0) -> float:
+    """acquire の async 版 (event loop を塞がずに待つ)"""
+    rpm, tpm = limits_for(model)
+    if not rpm and not tpm:
+        return 0.0
+    script = _aredis().register_script(_ACQUIRE_LUA)
+    waited = 0.0
+    try:
+        while True:
+            wait = float(await script(keys=_keys(model), args=[rpm, tpm, tokens]))
+            if wait <= 0:
+                return waited
+            if waited + wait > LLM_LIMIT_MAX_WAIT_SEC:
+                logger.warning("rate limit wait for %s exceeds %.0fs – sending anyway", model, LLM_LIMIT_MAX_WAIT_SEC)
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+    except redis.RedisError as exc:
+        logger.warning("rate limiter unavailable for %s: %s", model, exc)
+        return waited
@@ -0,0 +1,112 @@
+"""
+Single place where every gateway call is accounted for.
+
+Each call is logged (``shared.llm_gateway`` logger), summed into per-process
+counters keyed by (endpoint, model) (:func:`snapshot`) and handed to
+:mod:`.telemetry`, which persists one ``llm_calls`` row per call.
+
+Call sites say *what* the call was for with :func:`tagged`; the tags live in a
+context variable so they reach the gateway without being passed through every
+helper (and are copied into worker threads by the callers that fan out).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from . import telemetry
+
+logger = logging.getLogger("shared.llm_gateway")
+
+
+class CallRecord(NamedTuple):
+    endpoint: str  # chat / chat_stream / embeddings / transcriptions
+    model: str
+    latency_sec: float
+    attempts: int
+    ok: bool
+    limiter_wait_sec: float = 0.0
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    error: Optional[str] = None
+    cache_hit: bool = False
+    # 呼び出し元 (tagged で付与)
+    operation: Optional[str] = None  # minutes_draft / ai_edit / agent / etl_embed / stt ...
+    transcript_id: Optional[int] = None
+    user_id: Optional[str] = None
+
+
+_TAG_FIELDS = ("operation", "transcript_id", "user_id")
+_tags: ContextVar[Dict[str, Any]] = ContextVar("llm_call_tags", default={})
+
+
+@contextmanager
+def tagged(**tags: Any) -> Iterator[None]:
+    """with 内の gateway 呼び出しに operation / transcript_id / user_id を付ける (入れ子可)"""
+    unknown = set(tags) - set(_TAG_FIELDS)
+    if unknown:
+        raise TypeError(f"unknown llm call tags: {sorted(unknown)}")
+    token = _tags.set({**_tags.get(), **{k: v for k, v in tags.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags() -> Dict[str, Any]:
+    return dict(_tags.get())
+
+
+_lock = threading.Lock()
+_totals: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(
+    lambda: defaultdict(float)
+)
+
+
+def usage_tokens(rsp: Any) -> Tuple[Optional[int], Optional[int]]:
+    """レスポンスの usage から (prompt, completion) トークン数 (無ければ None)"""
+    usage = getattr(rsp, "usage", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def record(rec: CallRecord) -> None:
+    tags = {k: v for k, v in _tags.get().items() if getattr(rec, k) is None}
+    if tags:
+        rec = rec._replace(**tags)
+    logger.info(
+        "llm %s op=%s model=%s ok=%s cache=%s latency=%.2fs attempts=%d wait=%.2fs tokens=%s/%s%s",
+        rec.endpoint,
+        rec.operation or "-",
+        rec.model,
+        rec.ok,
+        "hit" if rec.cache_hit else "-",
+        rec.latency_sec,
+        rec.attempts,
+        rec.limiter_wait_sec,
+        rec.prompt_tokens,
+        rec.completion_tokens,
+        f" error={rec.error}" if rec.error else "",
+    )
+    with _lock:
+        t = _totals[(rec.endpoint, rec.model)]
+        t["calls"] += 1
+        t["cache_hits"] += 1 if rec.cache_hit else 0
+        t["errors"] += 0 if rec.ok else 1
+        t["retries"] += max(0, rec.attempts - 1)
+        t["latency_sec"] += rec.latency_sec
+        t["limiter_wait_sec"] += rec.limiter_wait_sec
+        t["prompt_tokens"] += rec.prompt_tokens or 0
+        t["completion_tokens"] += rec.completion_tokens or 0
+    telemetry.submit(rec)
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """{"endpoint:model": {calls, errors, retries, ...}} (このプロセスの累計)"""
+    with _lock:
+        return {f"{e}:{m}": dict(t) for (e, m), t in _totals.items()}
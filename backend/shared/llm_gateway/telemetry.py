@@ -0,0 +1,173 @@
+"""
+Persist one ``minutes.llm_calls`` row per gateway call, off the request path.
+
+:func:`submit` only turns the record into a row and puts it on an in-process
+queue; a daemon thread drains the queue and bulk-inserts up to
+``LLM_TELEMETRY_BATCH`` rows at a time, at least every
+``LLM_TELEMETRY_FLUSH_SEC``.  Like job progress this is best-effort: a full
+queue or a failed insert drops rows (and logs), it never fails the LLM call.
+
+The writer is started lazily per process, so forked Celery children each get
+their own.  Rows still queued at interpreter exit are flushed by ``atexit``.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_TELEMETRY_ENABLED = os.getenv("LLM_TELEMETRY_ENABLED", "1") == "1"
+LLM_TELEMETRY_BATCH = int(os.getenv("LLM_TELEMETRY_BATCH", "200"))
+LLM_TELEMETRY_FLUSH_SEC = float(os.getenv("LLM_TELEMETRY_FLUSH_SEC", "5"))
+LLM_TELEMETRY_QUEUE_MAX = int(os.getenv("LLM_TELEMETRY_QUEUE_MAX", "10000"))
+
+# USD / 1M tokens (input, output) – 前方一致、長いプレフィックス優先。env で上書き
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+PRICES: Dict[str, Tuple[float, float]] = {
+    **DEFAULT_PRICES,
+    **{k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES") or "{}").items()},
+}
+
+_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=LLM_TELEMETRY_QUEUE_MAX)
+_writer: Optional[threading.Thread] = None
+_writer_pid: Optional[int] = None
+_lock = threading.Lock()
+_dropped = 0
+
+
+def cost_usd(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Optional[float]:
+    """料金表に無いモデル (whisper 等) は None"""
+    for prefix in sorted(PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            p_in, p_out = PRICES[prefix]
+            return ((prompt_tokens or 0) * p_in + (completion_tokens or 0) * p_out) / 1_000_000
+    return None
+
+
+def _uuid(value: Any) -> Optional[uuid.UUID]:
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def to_row(rec: Any) -> Dict[str, Any]:
+    """metrics.CallRecord → llm_calls の 1 行"""
+    return {
+        "created_at": datetime.now(timezone.utc),
+        "endpoint": rec.endpoint,
+        "operation": rec.operation,
+        "model": rec.model,
+        "prompt_tokens": rec.prompt_tokens,
+        "completion_tokens": rec.completion_tokens,
+        "latency_ms": int(rec.latency_sec * 1000),
+        "limiter_wait_ms": int(rec.limiter_wait_sec * 1000),
+        "attempts": rec.attempts,
+        "ok": rec.ok,
+        "cache_hit": rec.cache_hit,
+        "error": rec.error[:64] if rec.error else None,
+        "transcript_id": rec.transcript_id,
+        "user_id": _uuid(rec.user_id),
+    }
+
+
+def submit(rec: Any) -> None:
+    """行をキューに積むだけ (書き込みはバックグラウンド)"""
+    global _dropped
+    if not LLM_TELEMETRY_ENABLED:
+        return
+    _ensure_writer()
+    try:
+        _queue.put_nowait(to_row(rec))
+    except queue.Full:
+        _dropped += 1
+        if _dropped % 1000 == 1:
+            logger.warning("llm telemetry queue full, %d rows dropped so far", _dropped)
+
+
+def _write(rows: List[Dict[str, Any]]) -> None:
+    # DB 層は書き込み時にだけ import (gateway 自体は DB 無しでも使える)
+    from sqlalchemy import insert
+
+    from minutes_maker.app.db import SessionLocal
+    from minutes_maker.app.db import models as M
+
+    with SessionLocal() as sess:
+        sess.execute(insert(M.LlmCall), rows)
+        sess.commit()
+
+
+def _drain(limit: int) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    while len(rows) < limit:
+        try:
+            rows.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return rows
+
+
+def flush() -> int:
+    """キューに残っている行をこのスレッドで書き込む。書いた行数を返す"""
+    written = 0
+    while rows := _drain(LLM_TELEMETRY_BATCH):
+        try:
+            _write(rows)
+            written += len(rows)
+        except Exception as exc:
+            logger.warning("llm telemetry write failed (%d rows dropped): %s", len(rows), exc)
+    return written
+
+
+def _run() -> None:
+    while True:
+        deadline = time.monotonic() + LLM_TELEMETRY_FLUSH_SEC
+        rows: List[Dict[str, Any]] = []
+        while len(rows) < LLM_TELEMETRY_BATCH:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                rows.append(_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        if not rows:
+            continue
+        try:
+            _write(rows)
+        except Exception as exc:
+            logger.warning("llm telemetry write failed (%d rows dropped): %s", len(rows), exc)
+
+
+def _ensure_writer() -> None:
+    global _writer, _writer_pid, _queue
+    pid = os.getpid()
+    if _writer is not None and _writer_pid == pid and _writer.is_alive():
+        return
+    with _lock:
+        if _writer is not None and _writer_pid == pid and _writer.is_alive():
+            return
+        if _writer_pid is None:
+            atexit.register(flush)
+        elif _writer_pid != pid:
+            # fork 後: 親のキュー (とその lock) は引き継がない
+            _queue = queue.Queue(maxsize=LLM_TELEMETRY_QUEUE_MAX)
+        _writer = threading.Thread(target=_run, name="llm-telemetry", daemon=True)
+        _writer.start()
+        _writer_pid = pid
@@ -0,0 +1,125 @@
+"""
+Transactional outbox for Celery task dispatch.
+
+Handlers that create the rows a task depends on (``files`` / ``jobs``) do not
+call ``apply_async`` directly.  They add a ``task_outbox`` row with
+:func:`enqueue` in the *same* transaction, so a worker can never start before
+its Job exists and an upload is a single commit.
+
+Rows are published by :func:`dispatch_pending`:
+
+* right after the commit, for the rows just written (low latency, best-effort)
+* by the ``outbox.dispatch`` beat task, for anything left behind (broker down,
+  API crashed between commit and publish)
+
+Rows are claimed with ``FOR UPDATE SKIP LOCKED`` so concurrent dispatchers never
+publish the same row twice.  Delivery is still at-least-once (a crash between
+publish and commit re-sends), which the tasks tolerate via ``task_id == job_id``.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional, Sequence
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from minutes_maker.app import SessionLocal
+from minutes_maker.app.db import models as M
+from shared.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "100"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+
+def enqueue(
+    sess: Session,
+    task_name: str,
+    args: Sequence[Any] = (),
+    kwargs: Optional[dict] = None,
+    **options: Any,
+) -> M.TaskOutbox:
+    """sess のトランザクションに outbox 行を追加する (commit は呼び出し側)"""
+    row = M.TaskOutbox(
+        task_name=task_name,
+        args=list(args),
+        kwargs=kwargs or {},
+        options=options,
+    )
+    sess.add(row)
+    return row
+
+
+def dispatch_pending(
+    ids: Optional[Iterable[int]] = None, limit: int = OUTBOX_BATCH
+) -> int:
+    """
+    未送信の outbox 行を最大 limit 件 Celery へ publish し、送信件数を返す。
+    ids を渡すとその行だけ (commit 直後の即時送信用)。
+    """
+    sess = SessionLocal()
+    try:
+        stmt = (
+            select(M.TaskOutbox)
+            .where(M.TaskOutbox.dispatched_at.is_(None))
+            .order_by(M.TaskOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if ids is not None:
+            stmt = stmt.where(M.TaskOutbox.id.in_(list(ids)))
+        rows = sess.scalars(stmt).all()
+
+        sent = 0
+        for row in rows:
+            try:
+                celery_app.send_task(
+                    row.task_name, args=row.args, kwargs=row.kwargs, **row.options
+                )
+            except Exception as exc:  # broker 障害: 残りは次回に回す
+                row.attempts += 1
+                row.last_error = str(exc)[:1000]
+                logger.warning("outbox %s: publish failed: %s", row.id, exc)
+                break
+            row.dispatched_at = datetime.now(timezone.utc)
+            sent += 1
+        sess.commit()
+        return sent
+    finally:
+        sess.close()
+
+
+def dispatch_after_commit(ids: Iterable[int]) -> None:
+    """commit 済みの行を即時送信する。失敗しても beat の dispatcher が拾う"""
+    try:
+        dispatch_pending(ids=ids)
+    except Exception as exc:
+        logger.warning("outbox: immediate dispatch failed, left for dispatcher: %s", exc)
+
+
+@celery_app.task(name="outbox.dispatch", ignore_result=True)
+def dispatch_outbox() -> int:
+    """取り残された outbox 行をバッチで送信する (beat から数秒おき)"""
+    total = 0
+    while (sent := dispatch_pending()) == OUTBOX_BATCH:
+        total += sent
+    return total + sent
+
+
+@celery_app.task(name="outbox.purge", ignore_result=True)
+def purge_dispatched(days: int = OUTBOX_RETENTION_DAYS) -> int:
+    """送信済みで days 日より古い行を削除する"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    sess = SessionLocal()
+    try:
+        res = sess.execute(
+            delete(M.TaskOutbox).where(M.TaskOutbox.dispatched_at < cutoff)
+        )
+        sess.commit()
+        return res.rowcount or 0
+    finally:
+        sess.close()
@@ -0,0 +1,191 @@
+"""Token-accurate prompt budgeting shared by every LLM call site.
+
+Tokens are counted locally with ``tiktoken`` (encoding chosen per model).  If
+``tiktoken`` is not installed, or its BPE file cannot be loaded (no network and
+nothing in ``TIKTOKEN_CACHE_DIR``), the character count is used instead, which
+is a safe over-estimate for Japanese text (≈ 1 char / token) and for English.
+
+* :func:`count_tokens` / :func:`count_messages` – prompt size
+* :func:`truncate`      – longest prefix of a document that fits N tokens
+* :func:`fit_messages`  – drop the oldest chat history until the prompt fits
+* :func:`estimate`      – prompt / completion estimate checked against the
+  model's context window (raises :class:`PromptTooLarge` on overflow)
+"""
+from __future__ import annotations
+
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover – tokenizer is optional
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# (context window, max completion tokens) – 前方一致、長いプレフィックス優先
+_MODEL_LIMITS: Dict[str, tuple[int, int]] = {
+    "gpt-4o-mini": (128_000, 16_384),
+    "gpt-4o": (128_000, 16_384),
+    "gpt-4.1": (1_047_576, 32_768),
+    "gpt-4-turbo": (128_000, 4_096),
+    "gpt-4": (8_192, 4_096),
+    "gpt-3.5-turbo": (16_385, 4_096),
+    "o1": (200_000, 100_000),
+    "o3": (200_000, 100_000),
+    "o4-mini": (200_000, 100_000),
+}
+_DEFAULT_LIMITS = (128_000, 16_384)
+_FALLBACK_ENCODING = "o200k_base"
+
+# 1 メッセージあたりの role / 区切りトークン、返答の priming トークン
+_PER_MESSAGE_TOKENS = 4
+_REPLY_PRIMING_TOKENS = 3
+# 実際のトークナイザとのずれを吸収する余白
+SAFETY_MARGIN_TOKENS = int(os.getenv("LLM_PROMPT_SAFETY_TOKENS", "256"))
+
+HISTORY_OMITTED_NOTE = "(これより前の会話 {n} 件は長さの都合で省略されています)"
+
+
+class PromptTooLarge(ValueError):
+    """必須部分だけでもモデルのコンテキスト長に収まらない"""
+
+    def __init__(self, model: str, prompt_tokens: int, limit: int):
+        super().__init__(
+            f"prompt needs ~{prompt_tokens} tokens but {model} accepts {limit}"
+        )
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.limit = limit
+
+
+class PromptEstimate(NamedTuple):
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    context_window: int
+
+    def as_meta(self) -> dict[str, Any]:
+        return {
+            "prompt_tokens_est": self.prompt_tokens,
+            "completion_tokens_est": self.completion_tokens,
+        }
+
+
+def model_limits(model: str) -> tuple[int, int]:
+    """(context window, max completion tokens)"""
+    for prefix in sorted(_MODEL_LIMITS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return _MODEL_LIMITS[prefix]
+    return _DEFAULT_LIMITS
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            return tiktoken.get_encoding(_FALLBACK_ENCODING)
+    except Exception as exc:
+        # BPE ファイルはキャッシュに無ければ初回にダウンロードされる (オフラインだとここで失敗)
+        logger.warning("tiktoken encoding for %r unavailable, counting chars: %s", model, exc)
+        return None
+
+
+def tokenizer_name(model: Optional[str] = None) -> str:
+    enc = _encoding(model)
+    return enc.name if enc is not None else "chars"
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    enc = _encoding(model)
+    if enc is None:
+        return len(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def count_messages(messages: Sequence[Dict[str, str]], model: Optional[str] = None) -> int:
+    """chat.completions に渡す messages 全体のトークン数"""
+    return _REPLY_PRIMING_TOKENS + sum(
+        _PER_MESSAGE_TOKENS + count_tokens(m.get("content") or "", model)
+        for m in messages
+    )
+
+
+def truncate(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """max_tokens に収まる text の最長の先頭部分"""
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        return text[:max_tokens]
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    # トークン境界が文字の途中に来ることがあるので壊れたバイトは捨てる
+    return enc.decode_bytes(tokens[:max_tokens]).decode("utf-8", errors="ignore")
+
+
+def prompt_limit(model: str, completion_tokens: int) -> int:
+    """completion 分を確保した上で prompt に使えるトークン数"""
+    window, max_out = model_limits(model)
+    return window - min(completion_tokens, max_out) - SAFETY_MARGIN_TOKENS
+
+
+def estimate(
+    messages: Sequence[Dict[str, str]],
+    model: str,
+    completion_tokens: int,
+) -> PromptEstimate:
+    """prompt / completion の見積もり。コンテキスト長を超えるなら PromptTooLarge"""
+    window, max_out = model_limits(model)
+    completion_tokens = min(completion_tokens, max_out)
+    prompt_tokens = count_messages(messages, model)
+    limit = prompt_limit(model, completion_tokens)
+    if prompt_tokens > limit:
+        raise PromptTooLarge(model, prompt_tokens, limit)
+    return PromptEstimate(model, prompt_tokens, completion_tokens, window)
+
+
+def fit_messages(
+    head: Sequence[Dict[str, str]],
+    history: Sequence[Dict[str, str]],
+    tail: Sequence[Dict[str, str]],
+    model: str,
+    completion_tokens: int,
+) -> tuple[List[Dict[str, str]], PromptEstimate]:
+    """
+    head (system prompt / 文書) と tail (今回の入力) は必ず残し、history は
+    新しいものから入るだけ入れる。省略した件数は 1 行の注記で伝える。
+    """
+    limit = prompt_limit(model, min(completion_tokens, model_limits(model)[1]))
+    used = count_messages([*head, *tail], model)
+    if used > limit:
+        raise PromptTooLarge(model, used, limit)
+
+    note_cost = _PER_MESSAGE_TOKENS + count_tokens(
+        HISTORY_OMITTED_NOTE.format(n=len(history)), model
+    )
+    kept: List[Dict[str, str]] = []
+    for i, msg in enumerate(reversed(history)):
+        cost = _PER_MESSAGE_TOKENS + count_tokens(msg.get("content") or "", model)
+        # まだ省略が出うる間は注記の分も空けておく
+        reserve = note_cost if i < len(history) - 1 else 0
+        if used + cost + reserve > limit:
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+
+    omitted = len(history) - len(kept)
+    if omitted:
+        kept.insert(
+            0, {"role": "system", "content": HISTORY_OMITTED_NOTE.format(n=omitted)}
+        )
+    messages = [*head, *kept, *tail]
+    return messages, estimate(messages, model, completion_tokens)
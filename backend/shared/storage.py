@@ -0,0 +1,276 @@
+"""
+音声ファイルの保存先 (ローカル volume / MinIO) をまとめたヘルパ。
+
+* AUDIO_STORAGE=local : /data/uploads/{file_id}_{filename}   (共有 volume が必要)
+* AUDIO_STORAGE=s3    : s3://{MINIO_BUCKET}/uploads/{file_id}_{filename}
+                        s3://{MINIO_BUCKET}/derived/{file_id}/...  (re-encode / セグメント,
+                        ライフサイクルで DERIVED_TTL_DAYS 日後に失効)
+
+s3 の場合、API とワーカはバケットだけを共有すればよい (RWX volume 不要)。
+
+アップロードは固定サイズのチャンクで流し込み、サイズと SHA-256 を
+その場で計算する (ファイル全体をメモリに載せない)。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import BinaryIO, NamedTuple, Sequence
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+AUDIO_STORAGE = os.getenv("AUDIO_STORAGE", "local").lower()
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "/data/uploads"))
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_PREFIX = "uploads/"
+DERIVED_PREFIX = "derived/"
+DERIVED_TTL_DAYS = int(os.getenv("DERIVED_TTL_DAYS", "7"))
+# ffmpeg が長時間 URL を読み続けても失効しないよう長めに
+PRESIGN_EXPIRES_SEC = 6 * 60 * 60
+
+# アップロード上限 (nginx の client_max_body_size と揃える)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+COPY_CHUNK_BYTES = 1024 * 1024
+MULTIPART_CHUNK_BYTES = 8 * 1024 * 1024
+
+_MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "http://minio:9000")
+_MINIO_ACCESS_KEY = os.getenv("MINIO_ROOT_USER", "minioadmin")
+_MINIO_SECRET_KEY = os.getenv("MINIO_ROOT_PASSWORD", "minioadmin")
+BUCKET = os.getenv("MINIO_BUCKET", "minutes-audio")
+
+s3 = boto3.client(
+    "s3",
+    endpoint_url=_MINIO_ENDPOINT,
+    aws_access_key_id=_MINIO_ACCESS_KEY,
+    aws_secret_access_key=_MINIO_SECRET_KEY,
+    region_name="us-east-1",
+)
+
+# 1 アップロードあたりのメモリを multipart 1 パート分に抑える
+_TRANSFER = TransferConfig(
+    multipart_threshold=MULTIPART_CHUNK_BYTES,
+    multipart_chunksize=MULTIPART_CHUNK_BYTES,
+    max_concurrency=1,
+)
+
+
+class UploadTooLarge(ValueError):
+    """UPLOAD_MAX_BYTES を超えた"""
+
+
+class StoredUpload(NamedTuple):
+    location: str  # ローカルパス or S3 キー
+    size: int
+    sha256: str
+
+
+class HashingReader:
+    """read() したバイト数と SHA-256 を数え、上限を超えたら UploadTooLarge"""
+
+    def __init__(self, raw: BinaryIO, max_bytes: int = UPLOAD_MAX_BYTES):
+        self._raw = raw
+        self._max = max_bytes
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def read(self, n: int = -1) -> bytes:
+        chunk = self._raw.read(n if n and n > 0 else COPY_CHUNK_BYTES)
+        self.size += len(chunk)
+        if self.size > self._max:
+            raise UploadTooLarge(f"upload exceeds {self._max} bytes")
+        self.digest.update(chunk)
+        return chunk
+
+
+def upload_name(file_id: str, filename: str) -> str:
+    return f"{file_id}_{Path(filename).name}"
+
+
+def save_upload(
+    fileobj: BinaryIO, file_id: str, filename: str, max_bytes: int = UPLOAD_MAX_BYTES
+) -> StoredUpload:
+    """
+    fileobj を AUDIO_STORAGE へチャンク単位で書き込む (同期 I/O ― スレッドで呼ぶこと)。
+    上限超過や途中失敗時は書きかけを残さない。
+    """
+    reader = HashingReader(fileobj, max_bytes)
+    name = upload_name(file_id, filename)
+
+    if AUDIO_STORAGE == "s3":
+        key = UPLOAD_PREFIX + name
+        # 失敗時は s3transfer が multipart upload を abort する
+        s3.upload_fileobj(reader, BUCKET, key, Config=_TRANSFER)
+        return StoredUpload(key, reader.size, reader.digest.hexdigest())
+
+    dst = UPLOAD_DIR / name
+    try:
+        with dst.open("wb") as out:
+            while chunk := reader.read(COPY_CHUNK_BYTES):
+                out.write(chunk)
+    except BaseException:
+        dst.unlink(missing_ok=True)
+        raise
+    return StoredUpload(str(dst), reader.size, reader.digest.hexdigest())
+
+
+def promote_partial(part: Path, file_id: str, filename: str) -> StoredUpload:
+    """
+    再開可能アップロードで組み上がった part ファイルを正式な保存先へ移す。
+    local は同一 volume 内の rename (コピーなし)、s3 は multipart で送ってから削除。
+    """
+    if AUDIO_STORAGE == "s3":
+        with part.open("rb") as f:
+            stored = save_upload(f, file_id, filename, max_bytes=part.stat().st_size)
+        part.unlink(missing_ok=True)
+        return stored
+
+    digest = hashlib.sha256()
+    size = 0
+    with part.open("rb") as f:
+        while chunk := f.read(COPY_CHUNK_BYTES):
+            digest.update(chunk)
+            size += len(chunk)
+    dst = UPLOAD_DIR / upload_name(file_id, filename)
+    os.replace(part, dst)
+    return StoredUpload(str(dst), size, digest.hexdigest())
+
+
+def find_upload(file_id: str) -> dict | None:
+    """uploads/{file_id}_* のオブジェクト情報 (Key / Size ...)"""
+    rsp = s3.list_objects_v2(Bucket=BUCKET, Prefix=f"{UPLOAD_PREFIX}{file_id}_", MaxKeys=1)
+    contents = rsp.get("Contents") or []
+    return contents[0] if contents else None
+
+
+def presigned_url(key: str, expires: int = PRESIGN_EXPIRES_SEC) -> str:
+    return s3.generate_presigned_url(
+        "get_object", Params={"Bucket": BUCKET, "Key": key}, ExpiresIn=expires
+    )
+
+
+class AudioSource:
+    """
+    ワーカが読む元音声。
+
+    input は ffmpeg / ffprobe にそのまま渡せる文字列 (ローカルパス or 署名付き URL)。
+    URL の場合 ffprobe / ffmpeg は HTTP Range で必要な部分だけを取りに行くので、
+    ワーカへ全体をダウンロードするのは materialize() したとき (fast path) だけ。
+    """
+
+    def __init__(self, file_id: str, name: str, input: str, size: int, key: str | None = None):
+        self.file_id = file_id
+        self.name = Path(name)
+        self.input = input
+        self.size = size
+        self.key = key
+
+    @property
+    def remote(self) -> bool:
+        return self.key is not None
+
+    def materialize(self, dst_dir: Path) -> Path:
+        """ローカルファイルとしてのパス (s3 なら dst_dir へダウンロード)"""
+        if not self.remote:
+            return Path(self.input)
+        dst = dst_dir / self.name.name
+        if not dst.exists():
+            s3.download_file(BUCKET, self.key, str(dst), Config=_TRANSFER)
+        return dst
+
+
+def open_audio(file_id: str) -> AudioSource:
+    """file_id の元音声 (AUDIO_STORAGE に応じてローカル or MinIO)"""
+    if AUDIO_STORAGE != "s3":
+        path = next(UPLOAD_DIR.glob(f"{file_id}_*"), None)
+        if not path:
+            raise FileNotFoundError(file_id)
+        return AudioSource(file_id, path.name, str(path), path.stat().st_size)
+
+    obj = find_upload(file_id)
+    if not obj:
+        raise FileNotFoundError(file_id)
+    key = obj["Key"]
+    return AudioSource(file_id, Path(key).name, presigned_url(key), obj["Size"], key)
+
+
+# --------------------------------------------------------------------------- #
+#  派生ファイル (re-encode / 分割済みセグメント) のキャッシュ
+# --------------------------------------------------------------------------- #
+def derived_prefix(file_id: str, variant: str) -> str:
+    return f"{DERIVED_PREFIX}{file_id}/{variant}/"
+
+
+def get_derived_manifest(prefix: str) -> list[tuple[str, float]] | None:
+    """prefix 下の manifest.json ([(name, offset_sec)]) 。無ければ None"""
+    try:
+        obj = s3.get_object(Bucket=BUCKET, Key=prefix + "manifest.json")
+    except ClientError as exc:
+        if exc.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+    return [(m["name"], float(m["offset"])) for m in json.loads(obj["Body"].read())]
+
+
+def put_derived(prefix: str, files: Sequence[tuple[Path, float]]) -> None:
+    """
+    files を prefix 下へ置き、最後に manifest.json を書く。
+    manifest があれば全ファイルが揃っている、という約束。
+    """
+    for path, _ in files:
+        s3.upload_file(str(path), BUCKET, prefix + path.name, Config=_TRANSFER)
+    manifest = [{"name": path.name, "offset": offset} for path, offset in files]
+    s3.put_object(
+        Bucket=BUCKET,
+        Key=prefix + "manifest.json",
+        Body=json.dumps(manifest).encode(),
+        ContentType="application/json",
+    )
+
+
+def fetch_derived(prefix: str, name: str, dst: Path) -> Path:
+    s3.download_file(BUCKET, prefix + name, str(dst), Config=_TRANSFER)
+    return dst
+
+
+def ensure_bucket() -> None:
+    """
+    バケットを作成し、ライフサイクルルールを設定する (起動時に呼ぶ、冪等)。
+    * derived/ は DERIVED_TTL_DAYS 日で失効
+    * 途中で止まった multipart upload は 1 日で破棄
+    """
+    if AUDIO_STORAGE != "s3":
+        return
+    try:
+        try:
+            s3.head_bucket(Bucket=BUCKET)
+        except ClientError:
+            s3.create_bucket(Bucket=BUCKET)
+        s3.put_bucket_lifecycle_configuration(
+            Bucket=BUCKET,
+            LifecycleConfiguration={
+                "Rules": [
+                    {
+                        "ID": "expire-derived",
+                        "Filter": {"Prefix": DERIVED_PREFIX},
+                        "Status": "Enabled",
+                        "Expiration": {"Days": DERIVED_TTL_DAYS},
+                    },
+                    {
+                        "ID": "abort-incomplete-multipart",
+                        "Filter": {"Prefix": ""},
+                        "Status": "Enabled",
+                        "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": 1},
+                    },
+                ]
+            },
+        )
+    except (BotoCoreError, ClientError) as exc:
+        logger.warning("could not prepare bucket %s: %s", BUCKET, exc)
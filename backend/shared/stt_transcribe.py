@@ -4,66 +4,128 @@ OpenAI Whisper – oversized audio (25 MB+) 対応版
 
 from __future__ import annotations
 
+import bisect
+import contextvars
+import csv
+import hashlib
+import itertools
 import json
+import logging
 import os
+import re
+import shutil
 import subprocess
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
-import boto3
-import openai
-from celery import shared_task
+from celery.signals import worker_init
+from celery.utils.time import get_exponential_backoff_interval
+from sqlalchemy import BigInteger, delete, insert, literal, select, update
 from sqlalchemy.orm import Session
 
-from shared.celery_app import celery_app
+from shared.celery_app import STT_FAST, STT_HEAVY, celery_app
 from minutes_maker.app import SessionLocal
 from minutes_maker.app.db import models as M
-from shared.draft_minutes import generate_minutes_draft
+from shared import job_progress as P
+from shared import llm_gateway
+from shared.draft_minutes import enqueue_draft
+from shared.job_progress import publish_progress
+from shared import storage
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+logger = logging.getLogger(__name__)
 
 # --------------------------------------------------------------------------- #
 #  Consts
 # --------------------------------------------------------------------------- #
 MAX_BYTES = 24 * 1024 * 1024
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "whisper-1")
 BITRATE = "32k"
 SAMPLE_RATE = 16000
-UPLOAD_DIR = Path("/data/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+SPLIT_HEADROOM = 0.9  # 実測ビットレートから計画したチャンク長に掛ける安全率
+SPLIT_MAX_DEPTH = 3  # 超過セグメントの再分割を何段まで許すか
+# 切れ目を無音に合わせる (silencedetect)。予算末尾 SILENCE_SEARCH_SEC 以内の無音を探す
+STT_SILENCE_SPLIT = os.getenv("STT_SILENCE_SPLIT", "1").lower() in ("1", "true", "yes")
+SILENCE_NOISE_DB = int(os.getenv("SILENCE_NOISE_DB", "-35"))
+SILENCE_MIN_SEC = float(os.getenv("SILENCE_MIN_SEC", "0.4"))
+SILENCE_SEARCH_SEC = float(os.getenv("SILENCE_SEARCH_SEC", "120"))
+# N 秒より長い無音を Whisper 前に取り除く (0 で無効)。前後 TRIM_PAD_SEC は残す
+STT_TRIM_SILENCE_SEC = float(os.getenv("STT_TRIM_SILENCE_SEC", "0"))
+TRIM_PAD_SEC = float(os.getenv("TRIM_PAD_SEC", "0.5"))
+WHISPER_USD_PER_MIN = float(os.getenv("WHISPER_USD_PER_MIN", "0.006"))
+# チャンク同士を重ねる秒数 (0 で重ねない)。重複は merge_overlaps で除去
+STT_OVERLAP_SEC = float(os.getenv("STT_OVERLAP_SEC", "0"))
+if STT_OVERLAP_SEC < 0:
+    raise ValueError(f"STT_OVERLAP_SEC must be >= 0, got {STT_OVERLAP_SEC}")
+# Whisper へ同時に投げるセグメント数の上限 (1 で従来どおり逐次)
+STT_CONCURRENCY = int(os.getenv("STT_CONCURRENCY", "4"))
+# Whisper の一時的エラー時の Celery retry (完了済みセグメントは再利用)
+STT_MAX_RETRIES = int(os.getenv("STT_MAX_RETRIES", "5"))
+STT_RETRY_BACKOFF_SEC = int(os.getenv("STT_RETRY_BACKOFF_SEC", "15"))
+STT_RETRY_BACKOFF_MAX_SEC = int(os.getenv("STT_RETRY_BACKOFF_MAX_SEC", "600"))
+# gateway 内のリトライを使い切ったもの (ジョブとしてやり直す)
+RETRYABLE_ERRORS = llm_gateway.RETRYABLE_ERRORS
+# transcript_chunks の一括 INSERT 1 回あたりの行数
+CHUNK_INSERT_BATCH = int(os.getenv("CHUNK_INSERT_BATCH", "1000"))
+# 条件を満たすアップロードは re-encode せず Whisper へ直接送る
+STT_FAST_PATH = os.getenv("STT_FAST_PATH", "1").lower() in ("1", "true", "yes")
+WHISPER_EXTS = {".mp3", ".mp4", ".m4a", ".mpeg", ".mpga", ".wav", ".webm", ".ogg", ".flac"}
+WHISPER_CODECS = {"mp3", "aac", "opus", "vorbis", "flac", "pcm_s16le"}
+# re-encode にかかる CPU 秒 / 音声秒 (スキップ時の節約時間の見積もりに使う)
+REENCODE_SEC_PER_AUDIO_SEC = float(os.getenv("REENCODE_SEC_PER_AUDIO_SEC", str(1 / 60)))
+# ジョブ毎の作業ディレクトリの親 (tmpfs を推奨: 例 /dev/shm/stt)。未設定なら OS の temp
+STT_SCRATCH_DIR = os.getenv("STT_SCRATCH_DIR") or None
+# 作業ディレクトリの空き容量として常に残しておくバイト数
+STT_SCRATCH_RESERVE_BYTES = int(os.getenv("STT_SCRATCH_RESERVE_BYTES", str(256 * 1024 * 1024)))
 
-_MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "http://minio:9000")
-_MINIO_ACCESS_KEY = os.getenv("MINIO_ROOT_USER", "minioadmin")
-_MINIO_SECRET_KEY = os.getenv("MINIO_ROOT_PASSWORD", "minioadmin")
-_BUCKET = os.getenv("MINIO_BUCKET", "minutes-audio")
+# この長さ以下の音声は stt-fast キューへ (長尺ジョブの後ろに並ばせない)
+STT_FAST_MAX_SEC = float(os.getenv("STT_FAST_MAX_SEC", "300"))
+# 長さが未測定のときはサイズで判定 (128 kbps で約 5 分)
+STT_FAST_MAX_BYTES = int(os.getenv("STT_FAST_MAX_BYTES", str(5 * 1024 * 1024)))
 
-s3 = boto3.client(
-    "s3",
-    endpoint_url=_MINIO_ENDPOINT,
-    aws_access_key_id=_MINIO_ACCESS_KEY,
-    aws_secret_access_key=_MINIO_SECRET_KEY,
-    region_name="us-east-1",
-)
+# ffmpeg / ffprobe への入力: ローカルパス or 署名付き URL (HTTP Range で読む)
+Source = Union[Path, str]
 
 
-def _run(cmd: List[str]):
+@worker_init.connect
+def _prepare_bucket(**_: Any) -> None:
+    storage.ensure_bucket()
+
+
+def _run(cmd: List[str]) -> str:
+    """cmd を実行し stderr (ffmpeg のログ) を返す。失敗時は RuntimeError"""
     proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if proc.returncode != 0:
         raise RuntimeError(proc.stderr.decode())
+    return proc.stderr.decode(errors="replace")
 
 
 # --------------------------------------------------------------------------- #
 #  Re-encode & split
 # --------------------------------------------------------------------------- #
-def reencode(src: Path) -> Path:
+def _stem(src: Source) -> str:
+    """パス / URL (クエリ付き) からファイル名の stem を取り出す"""
+    return Path(str(src).split("?", 1)[0]).stem
+
+
+def reencode(
+    src: Source,
+    out_dir: Path,
+    keep: Optional[Sequence[Tuple[float, float, float]]] = None,
+) -> Path:
     """
-    Always create **new** file.
-    src=xxx.mp3 -> xxx.reenc.mp3
+    Always create **new** file in out_dir.
+    src=xxx.m4a (または署名付き URL) -> out_dir/xxx.reenc.mp3
+    keep (build_keep_map の結果) を渡すとその区間だけを残す (無音トリム)。
     """
-    if src.suffix.lower() == ".mp3":
-        out = src.with_suffix(".reenc.mp3")
-    else:
-        out = src.with_suffix(".mp3")
+    out = out_dir / f"{_stem(src)}.reenc.mp3"
+    trim: List[str] = []
+    if keep:
+        aselect_expr = "+".join(f"between(t,{a:.3f},{b:.3f})" for a, b, _ in keep)
+        trim = ["-af", f"aselect='{aselect_expr}',asetpts=N/SR/TB"]
 
     _run(
         [
@@ -71,6 +133,7 @@ def reencode(src: Path) -> Path:
             "-y",
             "-i",
             str(src),
+            *trim,
             "-ac",
             "1",
             "-ar",
@@ -83,155 +146,994 @@ def reencode(src: Path) -> Path:
     return out
 
 
-def probe_duration(path: Path) -> float:
+def _ffprobe(path: Source, entries: str) -> dict:
+    """ffprobe -show_entries の結果を JSON (dict) で返す"""
     pp = subprocess.run(
         [
             "ffprobe",
             "-v",
             "error",
+            "-select_streams",
+            "a:0",
             "-show_entries",
-            "format=duration",
+            entries,
             "-of",
-            "default=nw=1:nk=1",
+            "json",
             str(path),
         ],
         stdout=subprocess.PIPE,
         check=True,
     )
-    return float(pp.stdout)
+    return json.loads(pp.stdout or b"{}")
 
 
-def split_by_bytes(path: Path) -> List[Tuple[Path, float]]:
-    duration = probe_duration(path)
-    bps = int(BITRATE.replace("k", "")) * 1024 // 8
-    approx_sec = MAX_BYTES / bps * 0.9
+def probe_duration(path: Source) -> float:
+    return float(_ffprobe(path, "format=duration")["format"]["duration"])
 
-    chunks: List[Tuple[Path, float]] = []
-    offset = 0.0
-    idx = 0
-    while offset < duration:
-        dur = min(approx_sec, duration - offset)
-        out = path.parent / f"seg_{idx:04d}.mp3"
-        _run(
+
+def probe_audio(path: Source) -> dict:
+    """先頭の音声ストリームの codec / channels / sample_rate と長さ・サイズ"""
+    info = _ffprobe(
+        path, "format=duration,size:stream=codec_name,channels,sample_rate"
+    )
+    fmt = info.get("format", {})
+    stream = (info.get("streams") or [{}])[0]
+    return {
+        "codec": stream.get("codec_name"),
+        "channels": int(stream.get("channels") or 0),
+        "sample_rate": int(stream.get("sample_rate") or 0),
+        "duration": float(fmt.get("duration") or 0.0),
+        "size": int(fmt.get("size") or (path.stat().st_size if isinstance(path, Path) else 0)),
+    }
+
+
+def probe_bytes_duration(data: bytes) -> Optional[float]:
+    """メモリ上の音声の長さ (秒)。ffprobe で読めなければ None"""
+    try:
+        pp = subprocess.run(
             [
-                "ffmpeg",
-                "-y",
-                "-i",
-                str(path),
-                "-ss",
-                str(offset),
-                "-t",
-                str(dur),
-                "-c",
-                "copy",
-                str(out),
-            ]
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "json",
+                "pipe:0",
+            ],
+            input=data,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            timeout=30,
         )
-        if out.stat().st_size > MAX_BYTES:  # safety fallback
-            dur /= 2
-            _run(
-                [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    str(path),
-                    "-ss",
-                    str(offset),
-                    "-t",
-                    str(dur),
-                    "-c",
-                    "copy",
-                    str(out),
-                ]
+        return float(json.loads(pp.stdout)["format"]["duration"])
+    except (OSError, subprocess.SubprocessError, KeyError, ValueError, TypeError):
+        return None
+
+
+def stt_queue_for(duration_sec: Optional[float] = None, size: Optional[int] = None) -> str:
+    """
+    文字起こしタスクの投入先キュー。短い音声は fast lane。
+    API から呼ぶので I/O はしない: 既に分かっている音声長 (files.duration_sec) か、
+    無ければ保存サイズで判定し、どちらも無ければ安全側の stt-heavy。
+    """
+    if duration_sec is not None:
+        return STT_FAST if duration_sec <= STT_FAST_MAX_SEC else STT_HEAVY
+    if size is not None:
+        return STT_FAST if size <= STT_FAST_MAX_BYTES else STT_HEAVY
+    return STT_HEAVY
+
+
+def reencode_reason(path: Path, info: dict) -> Optional[str]:
+    """
+    そのまま Whisper に送れるなら None、re-encode が必要なら理由を返す。
+    (小さい mono の電話録音などは transcode を省略する)
+    """
+    if not STT_FAST_PATH:
+        return "fast path disabled"
+    if path.suffix.lower() not in WHISPER_EXTS:
+        return f"extension {path.suffix or '(none)'}"
+    if info["codec"] not in WHISPER_CODECS:
+        return f"codec {info['codec']}"
+    if info["channels"] != 1:
+        return f"channels {info['channels']}"
+    if not 8000 <= info["sample_rate"] <= 48000:
+        return f"sample_rate {info['sample_rate']}"
+    if info["size"] > MAX_BYTES:
+        return f"size {info['size']}"
+    return None
+
+
+def build_keep_map(
+    duration: float,
+    silences: Sequence[Tuple[float, float]],
+    min_silence_sec: float,
+    pad_sec: float = TRIM_PAD_SEC,
+) -> List[Tuple[float, float, float]]:
+    """
+    min_silence_sec より長い無音を (前後 pad_sec を残して) 取り除いた時の
+    残す区間を [(元 start, 元 end, トリム後 start)] で返す。
+    """
+    cuts = [
+        (s + pad_sec, e - pad_sec)
+        for s, e in sorted(silences)
+        if e - s > min_silence_sec and e - s > 2 * pad_sec
+    ]
+    keep: List[Tuple[float, float, float]] = []
+    pos = trimmed = 0.0
+    for cut_start, cut_end in cuts:
+        if cut_start > pos:
+            keep.append((pos, cut_start, trimmed))
+            trimmed += cut_start - pos
+        pos = max(pos, cut_end)
+    if pos < duration:
+        keep.append((pos, duration, trimmed))
+    return keep
+
+
+def remap_timestamp(t: float, keep: Sequence[Tuple[float, float, float]]) -> float:
+    """トリム後の時刻 t を元音声の時刻へ戻す"""
+    if not keep:
+        return t
+    i = max(0, bisect.bisect_right([k[2] for k in keep], t) - 1)
+    orig_start, orig_end, trimmed_start = keep[i]
+    return min(orig_start + (t - trimmed_start), orig_end)
+
+
+def remap_results(
+    results: Sequence[dict], keep: Sequence[Tuple[float, float, float]]
+) -> List[dict]:
+    """セグメント / 単語の start・end を元音声の時間軸に戻す"""
+    if not keep:
+        return list(results)
+    remapped = []
+    for data in results:
+        for item in [*data["segments"], *data.get("words", [])]:
+            item["start"] = remap_timestamp(item["start"], keep)
+            item["end"] = remap_timestamp(item["end"], keep)
+        remapped.append(data)
+    return remapped
+
+
+def trim_silences(
+    silences: Sequence[Tuple[float, float]], keep: Sequence[Tuple[float, float, float]]
+) -> List[Tuple[float, float]]:
+    """
+    元音声の無音区間をトリム後の時間軸へ写す (残した区間に掛かる部分だけ)。
+    取り除いた無音の前後に残した pad は、トリム後は隣り合うので 1 つの無音にまとめる
+    """
+    if not keep:
+        return list(silences)
+    out: List[Tuple[float, float]] = []
+    for s, e in sorted(silences):
+        for orig_start, orig_end, trimmed_start in keep:
+            lo, hi = max(s, orig_start), min(e, orig_end)
+            if lo >= hi:
+                continue
+            piece = (trimmed_start + lo - orig_start, trimmed_start + hi - orig_start)
+            if out and piece[0] <= out[-1][1] + 1e-6:
+                out[-1] = (out[-1][0], max(out[-1][1], piece[1]))
+            else:
+                out.append(piece)
+    return out
+
+
+def _segment_once(
+    src: Path,
+    segment_sec: float,
+    out_dir: Path,
+    prefix: str,
+    cut_times: Optional[Sequence[float]] = None,
+) -> List[Tuple[Path, float]]:
+    """
+    ffmpeg の segment muxer で src を 1 パスで segment_sec ごと
+    (cut_times 指定時はその時刻) に切り出す。
+    実際の切れ目はパケット境界になるので、offset は segment_list の
+    start 時刻 (src 内の相対秒) を使う。
+    """
+    seg_list = out_dir / f"{prefix}list.csv"
+    if cut_times is not None:
+        split_opt = ["-segment_times", ",".join(f"{t:.3f}" for t in cut_times)]
+    else:
+        split_opt = ["-segment_time", f"{segment_sec:.3f}"]
+    _run(
+        [
+            "ffmpeg",
+            "-y",
+            "-i",
+            str(src),
+            "-f",
+            "segment",
+            *split_opt,
+            "-segment_list",
+            str(seg_list),
+            "-segment_list_type",
+            "csv",
+            "-reset_timestamps",
+            "1",
+            "-c",
+            "copy",
+            str(out_dir / f"{prefix}%04d{src.suffix}"),
+        ]
+    )
+    with open(seg_list, newline="") as fp:
+        rows = [r for r in csv.reader(fp) if r]
+    seg_list.unlink(missing_ok=True)
+    return [(out_dir / name, float(start)) for name, start, *_ in rows]
+
+
+class SegmentTooLarge(RuntimeError):
+    """SPLIT_MAX_DEPTH 段まで切り直しても MAX_BYTES に収まらない (Whisper が 413 を返す)"""
+
+
+def _too_large(seg: Path) -> SegmentTooLarge:
+    return SegmentTooLarge(
+        f"{seg.name} is still {seg.stat().st_size} bytes (limit {MAX_BYTES}) "
+        "and cannot be split further"
+    )
+
+
+def _fit_segment(
+    seg: Path, offset: float, segment_sec: float, depth: int = 0
+) -> List[Tuple[Path, float]]:
+    """MAX_BYTES を超えたセグメントだけを半分の長さで切り直す (再帰)"""
+    if seg.stat().st_size <= MAX_BYTES:
+        return [(seg, offset)]
+    if depth >= SPLIT_MAX_DEPTH:
+        raise _too_large(seg)
+
+    half = segment_sec / 2
+    parts = _segment_once(seg, half, seg.parent, f"{seg.stem}_")
+    seg.unlink(missing_ok=True)
+    fitted: List[Tuple[Path, float]] = []
+    for p, rel in parts:
+        fitted.extend(_fit_segment(p, offset + rel, half, depth + 1))
+    return fitted
+
+
+def detect_silences(path: Source) -> List[Tuple[float, float]]:
+    """ffmpeg silencedetect を 1 回だけ走らせ、無音区間 [(start, end)] を返す"""
+    log = _run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-nostats",
+            "-i",
+            str(path),
+            "-af",
+            f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SEC}",
+            "-f",
+            "null",
+            "-",
+        ]
+    )
+    starts = [float(m) for m in re.findall(r"silence_start: (-?[\d.]+)", log)]
+    ends = [float(m) for m in re.findall(r"silence_end: ([\d.]+)", log)]
+    return [(max(0.0, s), e) for s, e in zip(starts, ends)]
+
+
+def plan_cuts(
+    duration: float,
+    max_sec: float,
+    silences: Sequence[Tuple[float, float]] = (),
+    search_sec: float = SILENCE_SEARCH_SEC,
+) -> List[float]:
+    """
+    各チャンクが max_sec を超えないように切れ目 (秒) を決める。
+    予算内の末尾 search_sec 以内に無音があれば、予算に最も近い無音の中央で切る。
+    無ければ従来どおり max_sec ちょうどで切る。
+    """
+    if max_sec <= 0:
+        raise ValueError(f"chunk length must be positive, got {max_sec}")
+    mids = sorted((s + e) / 2 for s, e in silences)
+    cuts: List[float] = []
+    pos = 0.0
+    while duration - pos > max_sec:
+        limit = pos + max_sec
+        inside = [m for m in mids if limit - search_sec <= m <= limit and m > pos]
+        cut = inside[-1] if inside else limit
+        cuts.append(cut)
+        pos = cut
+    return cuts
+
+
+def _cut_range(src: Path, start: float, end: float, out: Path) -> Path:
+    """入力側 -ss (高速シーク) で [start, end) を切り出す"""
+    _run(
+        [
+            "ffmpeg",
+            "-y",
+            "-ss",
+            f"{start:.3f}",
+            "-t",
+            f"{end - start:.3f}",
+            "-i",
+            str(src),
+            "-c",
+            "copy",
+            str(out),
+        ]
+    )
+    return out
+
+
+def _cut_with_overlap(
+    path: Path, cuts: Sequence[float], duration: float, overlap: float
+) -> List[Tuple[Path, float]]:
+    """
+    各チャンクを次の切れ目 + overlap 秒まで伸ばして切り出す。
+    MAX_BYTES を超えたチャンクは範囲を半分にして (重なりを保ったまま) 切り直す。
+    """
+    bounds = [0.0, *cuts, duration]
+    ranges = [
+        (bounds[i], min(duration, bounds[i + 1] + overlap), 0)
+        for i in range(len(bounds) - 1)
+    ]
+    chunks: List[Tuple[Path, float]] = []
+    while ranges:
+        start, end, depth = ranges.pop(0)
+        out = path.parent / f"seg_{len(chunks):04d}{path.suffix}"
+        _cut_range(path, start, end, out)
+        too_big = out.stat().st_size > MAX_BYTES
+        if too_big:
+            if depth >= SPLIT_MAX_DEPTH or end - start <= 2 * overlap:
+                raise _too_large(out)
+            mid = (start + end - overlap) / 2
+            ranges[:0] = [(start, mid + overlap, depth + 1), (mid, end, depth + 1)]
+            continue
+        chunks.append((out, start))
+    return chunks
+
+
+def merge_overlaps(
+    results: Sequence[dict], offsets: Sequence[float], overlap: float
+) -> List[dict]:
+    """
+    重なりのあるチャンク結果から重複セグメント / 単語を除く。
+    境界 offsets[i] の重なり区間 [offsets[i], offsets[i] + overlap] の中央を境に、
+    前のチャンクは中央より前に始まるもの、後ろのチャンクは中央以降に始まるものだけ残す。
+    (timestamps はシフト済みである前提)
+    """
+    if overlap <= 0 or len(results) < 2:
+        return list(results)
+
+    merged: List[dict] = []
+    for i, data in enumerate(results):
+        lo = offsets[i] + overlap / 2 if i > 0 else float("-inf")
+        hi = offsets[i + 1] + overlap / 2 if i + 1 < len(results) else float("inf")
+        segs = [s for s in data["segments"] if lo <= s["start"] < hi]
+        words = [w for w in data.get("words", []) if lo <= w["start"] < hi]
+        merged.append(
+            {
+                **data,
+                "segments": segs,
+                "words": words,
+                "text": "".join(s["text"] for s in segs).strip(),
+            }
+        )
+    return merged
+
+
+def split_by_bytes(
+    path: Path, silences: Optional[Sequence[Tuple[float, float]]] = None
+) -> List[Tuple[Path, float]]:
+    """
+    path を MAX_BYTES 以下のセグメントに分割し [(seg_path, offset_sec)] を返す。
+
+    * チャンク長は re-encode 後ファイルの実測ビットレート (size / duration) から計画
+    * 切れ目は silencedetect で見つけた予算内の最寄りの無音 (STT_SILENCE_SPLIT)。
+      無音トリムのために検出済みなら silences (path の時間軸) を渡せば再検出しない
+    * ffmpeg は全体で 1 回だけ起動 (segment muxer)
+    * 超過したセグメントだけを個別に再分割する (収まらなければ SegmentTooLarge)
+    * STT_OVERLAP_SEC > 0 なら各チャンクを重ねて切り出す (merge_overlaps で重複除去)
+    """
+    duration = probe_duration(path)
+    bytes_per_sec = path.stat().st_size / duration if duration else 0.0
+    if bytes_per_sec <= 0:
+        bytes_per_sec = int(BITRATE.replace("k", "")) * 1024 / 8
+    segment_sec = MAX_BYTES / bytes_per_sec * SPLIT_HEADROOM
+
+    if not STT_SILENCE_SPLIT:
+        silences = []
+    elif silences is None:
+        silences = detect_silences(path)
+    if STT_OVERLAP_SEC > 0:
+        # 重なりがチャンク長を食い潰すと切れ目が進まないので半分までに抑える
+        overlap = min(STT_OVERLAP_SEC, segment_sec / 2)
+        if overlap < STT_OVERLAP_SEC:
+            logger.warning(
+                "STT_OVERLAP_SEC=%s is too long for %.1fs chunks, using %.1fs",
+                STT_OVERLAP_SEC, segment_sec, overlap,
             )
-        chunks.append((out, offset))
-        offset += dur
-        idx += 1
+        cuts = plan_cuts(duration, segment_sec - overlap, silences)
+        return _cut_with_overlap(path, cuts, duration, overlap)
+
+    cuts = plan_cuts(duration, segment_sec, silences)
+    chunks: List[Tuple[Path, float]] = []
+    for seg, offset in _segment_once(path, segment_sec, path.parent, "seg_", cut_times=cuts):
+        chunks.extend(_fit_segment(seg, offset, segment_sec))
     return chunks
 
 
 # --------------------------------------------------------------------------- #
-#  Celery task
+#  Whisper (segment fan-out)
 # --------------------------------------------------------------------------- #
-@celery_app.task(name="minutes.transcribe_and_generate")
-def transcribe_and_generate_minutes(audio_file_id: str, job_id: str):
-    """STT → minutes draft までを一括で処理し、途中経過を jobs テーブル更新"""
+def whisper_request(file: Any, language: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Whisper 呼び出しの共通パラメータ。
+    パイプライン (セグメント毎) と同期 /stt の直接呼び出しで同じ設定を使う。
+    """
+    params: Dict[str, Any] = {
+        "model": WHISPER_MODEL,
+        "file": file,
+        "response_format": "verbose_json",
+        "timestamp_granularities": ["segment", "word"],
+    }
+    if language:
+        params["language"] = language
+    return params
 
-    # ---------- Job row: set PROCESSING ----------
-    sess: Session = SessionLocal()
-    job = sess.get(M.Job, job_id)
-    if not job:  # safety
+
+def _as_dict(rsp: Any) -> dict:
+    data = rsp.model_dump() if hasattr(rsp, "model_dump") else json.loads(rsp)
+    data.setdefault("segments", [])
+    return data
+
+
+def _transcribe_segment(seg_path: Path, language: Optional[str] = None) -> dict:
+    """1 セグメントを Whisper に投げ、verbose_json を dict で返す"""
+    with open(seg_path, "rb") as fp:
+        rsp = llm_gateway.transcribe(**whisper_request(fp, language))
+    return _as_dict(rsp)
+
+
+async def atranscribe(
+    filename: str,
+    content: bytes,
+    mime: Optional[str],
+    language: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> dict:
+    """メモリ上の小さな音声を 1 回で文字起こしする (同期 /stt の直接パス)"""
+    rsp = await llm_gateway.atranscribe(
+        timeout=timeout, **whisper_request((filename, content, mime), language)
+    )
+    return _as_dict(rsp)
+
+
+def _shift_timestamps(data: dict, offset: float) -> dict:
+    """セグメント内の相対時刻を元音声の絶対時刻へずらす"""
+    for s in data["segments"]:
+        s["start"] += offset
+        s["end"] += offset
+    for w in data.get("words", []):
+        w["start"] += offset
+        w["end"] += offset
+    return data
+
+
+def transcribe_segments(
+    segments: Sequence[Tuple[Path, float]],
+    max_workers: int = STT_CONCURRENCY,
+    done: Optional[Dict[int, dict]] = None,
+    on_result: Optional[Callable[[int, dict], None]] = None,
+    language: Optional[str] = None,
+) -> List[dict]:
+    """
+    segments を最大 max_workers 並列で文字起こしする。
+    戻り値は入力と同じ (offset) 順で、時刻はシフト済み。
+
+    * done      : 既に結果があるセグメント {index: 結果(シフト済み)} ― 再送しない
+    * on_result : 各セグメント完了直後に (index, 結果) で呼ばれる (チェックポイント用)
+    * language  : Whisper に渡す ISO-639 言語コード (None なら自動判定)
+
+    一部が失敗しても他の完了分は on_result 済みで、最初の例外を送出する。
+    """
+    results: Dict[int, dict] = dict(done or {})
+    todo = [i for i in range(len(segments)) if i not in results]
+
+    def _one(i: int) -> dict:
+        seg_path, offset = segments[i]
+        data = _shift_timestamps(_transcribe_segment(seg_path, language), offset)
+        if on_result:
+            on_result(i, data)
+        return data
+
+    workers = max(1, min(max_workers, len(todo)))
+    if workers == 1:
+        for i in todo:
+            results[i] = _one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whisper") as pool:
+            # llm_gateway.tagged のタグを Whisper スレッドにも引き継ぐ
+            futures = {pool.submit(contextvars.copy_context().run, _one, i): i for i in todo}
+            errors: List[BaseException] = []
+            for fut in as_completed(futures):
+                try:
+                    results[futures[fut]] = fut.result()
+                except Exception as exc:  # 残りは走らせ切ってチェックポイントを残す
+                    errors.append(exc)
+            if errors:
+                raise errors[0]
+
+    return [results[i] for i in range(len(segments))]
+
+
+# --------------------------------------------------------------------------- #
+#  Per-job scratch workspace
+# --------------------------------------------------------------------------- #
+class ScratchBudgetError(RuntimeError):
+    """作業ディレクトリに必要な空き容量が無い"""
+
+
+def estimate_scratch_bytes(duration_sec: float) -> int:
+    """re-encode 後ファイル + 分割セグメント分の見積もり (1 割増し)"""
+    encoded = duration_sec * int(BITRATE.replace("k", "")) * 1024 / 8
+    return int(encoded * 2 * 1.1)
+
+
+def _check_budget(root: Path, need_bytes: int) -> bool:
+    root.mkdir(parents=True, exist_ok=True)
+    free = shutil.disk_usage(root).free
+    return free - STT_SCRATCH_RESERVE_BYTES >= need_bytes
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+@contextmanager
+def job_workspace(job_id: str, need_bytes: int) -> Iterator[Path]:
+    """
+    ジョブ専用の一時ディレクトリを作り、成功・失敗に関わらず最後に削除する。
+
+    STT_SCRATCH_DIR (tmpfs 想定) に need_bytes の空きが無ければ OS の temp に
+    フォールバックし、どちらにも無ければ ScratchBudgetError。
+    """
+    roots = [Path(r) for r in (STT_SCRATCH_DIR, tempfile.gettempdir()) if r]
+    root = next((r for r in roots if _check_budget(r, need_bytes)), None)
+    if root is None:
+        raise ScratchBudgetError(
+            f"job {job_id}: need {need_bytes} bytes of scratch space in {roots}"
+        )
+
+    work = Path(tempfile.mkdtemp(prefix=f"stt_{job_id}_", dir=root))
+    try:
+        yield work
+    finally:
+        written = _dir_bytes(work)
+        shutil.rmtree(work, ignore_errors=True)
+        logger.info("job %s: scratch %s used %d bytes (cleaned)", job_id, work, written)
+
+
+def _merge_job_metrics(job_id: str, **metrics: Any) -> None:
+    """jobs.metrics (JSON) にキーを追記する"""
+    sess = SessionLocal()
+    try:
+        job = sess.get(M.Job, job_id)
+        if job:
+            job.metrics = {**(job.metrics or {}), **metrics}
+            sess.commit()
+    finally:
         sess.close()
-        return
-    job.status = M.JobStatus.PROCESSING
-    sess.commit()
-    sess.close()
 
+
+# --------------------------------------------------------------------------- #
+#  DB helpers
+# --------------------------------------------------------------------------- #
+def bulk_insert_chunks(
+    sess: Session,
+    transcript_id: int,
+    segments: Sequence[dict],
+    batch_size: int = CHUNK_INSERT_BATCH,
+) -> int:
+    """
+    Whisper セグメントを transcript_chunks へ一括 INSERT する。
+    ORM の unit-of-work を通さず、batch_size 行ずつ executemany
+    (insertmanyvalues で複数行 VALUES にまとめられる)。
+    """
+    rows = [
+        {
+            "transcript_id": transcript_id,
+            "start_ms": int(seg["start"] * 1000),
+            "end_ms": int(seg["end"] * 1000),
+            "text": seg["text"].strip(),
+        }
+        for seg in segments
+    ]
+    for i in range(0, len(rows), batch_size):
+        sess.execute(insert(M.TranscriptChunk), rows[i : i + batch_size])
+    return len(rows)
+
+
+def record_duration(audio_file_id: str, duration_sec: float) -> None:
+    """files.duration_sec が未設定なら埋める (resume 時のキュー振り分け用)"""
+    sess = SessionLocal()
     try:
-        # 1) 音声取得
-        local_path: Optional[Path] = next(
-            UPLOAD_DIR.glob(f"{audio_file_id}_*"), None
-        )
-        if not local_path:
-            raise FileNotFoundError(audio_file_id)
-
-        # 2) re-encode + split
-        encoded = reencode(local_path)
-        segments = (
-            [(encoded, 0.0)]
-            if encoded.stat().st_size <= MAX_BYTES
-            else split_by_bytes(encoded)
+        sess.execute(
+            update(M.File)
+            .where(M.File.file_id == audio_file_id, M.File.duration_sec.is_(None))
+            .values(duration_sec=round(duration_sec, 2))
         )
+        sess.commit()
+    finally:
+        sess.close()
+
+
+def add_transcript(
+    sess: Session,
+    file_id: str,
+    text: str,
+    segments: Sequence[dict],
+    user_id: Optional[str] = None,
+    language: Optional[str] = None,
+) -> Tuple["M.Transcript", int]:
+    """Transcript + transcript_chunks を追加する (commit は呼び出し側)。(行, チャンク数) を返す"""
+    tr = M.Transcript(
+        file_id=file_id,
+        language=language,
+        content=text,
+        verbose_json=json.dumps({"segments": list(segments)}),
+        user_id=user_id,
+    )
+    sess.add(tr)
+    sess.flush()
+    return tr, bulk_insert_chunks(sess, tr.id, segments)
+
+
+def load_checkpoints(
+    job_id: str, segments: Sequence[Tuple[Path, float]]
+) -> Dict[int, dict]:
+    """
+    job_id の保存済みセグメント結果を {index: result} で返す。
+    分割計画 (セグメント数 / offset) が前回と違う場合は使えないので破棄する。
+    """
+    sess = SessionLocal()
+    try:
+        rows = sess.scalars(
+            select(M.SttCheckpoint).where(M.SttCheckpoint.job_id == job_id)
+        ).all()
+        valid = {
+            r.segment_index: r.result
+            for r in rows
+            if r.segment_count == len(segments)
+            and r.segment_index < len(segments)
+            and abs(r.offset_sec - segments[r.segment_index][1]) < 0.01
+        }
+        if rows and len(valid) != len(rows):
+            logger.warning("job %s: segment plan changed, dropping checkpoints", job_id)
+            sess.execute(delete(M.SttCheckpoint).where(M.SttCheckpoint.job_id == job_id))
+            sess.commit()
+            return {}
+        return valid
+    finally:
+        sess.close()
 
-        # 3) Whisper
-        full_text_parts: List[str] = []
-        all_segments: List[dict] = []
-        for seg_path, offset in segments:
-            with open(seg_path, "rb") as fp:
-                rsp = openai.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=fp,
-                    response_format="verbose_json",
-                    timestamp_granularities=["segment", "word"],
-                )
-            data = rsp.model_dump() if hasattr(rsp, "model_dump") else json.loads(rsp)
-
-            for s in data["segments"]:
-                s["start"] += offset
-                s["end"] += offset
-            for w in data.get("words", []):
-                w["start"] += offset
-                w["end"] += offset
-            all_segments.extend(data["segments"])
-            full_text_parts.append(data["text"].strip())
 
-        full_text = "\n".join(full_text_parts)
-        all_segments.sort(key=lambda s: s["start"])
+def _checkpoint_writer(
+    job_id: str, segments: Sequence[Tuple[Path, float]]
+) -> Callable[[int, dict], None]:
+    """transcribe_segments(on_result=...) 用: 完了したセグメントを即座に保存"""
 
-        # 4) DB へ保存
+    def _save(index: int, result: dict) -> None:
         sess = SessionLocal()
+        try:
+            sess.add(
+                M.SttCheckpoint(
+                    job_id=job_id,
+                    segment_index=index,
+                    segment_count=len(segments),
+                    offset_sec=segments[index][1],
+                    result=result,
+                )
+            )
+            sess.commit()
+        finally:
+            sess.close()
+
+    return _save
+
+
+def clear_checkpoints(job_id: str) -> None:
+    sess = SessionLocal()
+    try:
+        sess.execute(delete(M.SttCheckpoint).where(M.SttCheckpoint.job_id == job_id))
+        sess.commit()
+    finally:
+        sess.close()
+
+
+# --------------------------------------------------------------------------- #
+#  Content-hash transcription cache
+# --------------------------------------------------------------------------- #
+def _clone_cached_transcript(
+    audio_file_id: str, user_id: Optional[str], language: Optional[str] = None
+) -> Optional[Tuple[int, int]]:
+    """
+    同じ content_sha256 を持つ別ファイルの Transcript があれば複製する。
+    language 指定時は同じ言語で文字起こししたものだけを使う。
+    戻り値: (新 transcript_id, 複製元 transcript_id) / 無ければ None
+    """
+    sess = SessionLocal()
+    try:
+        digest = sess.scalar(
+            select(M.File.content_sha256).where(M.File.file_id == audio_file_id)
+        )
+        if not digest:
+            return None
+
+        src = sess.scalars(
+            select(M.Transcript)
+            .join(M.File, M.File.file_id == M.Transcript.file_id)
+            .where(
+                M.File.content_sha256 == digest,
+                M.File.file_id != audio_file_id,
+                M.Transcript.verbose_json.is_not(None),
+                *([M.Transcript.language == language] if language else []),
+            )
+            .order_by(M.Transcript.created_at.desc())
+            .limit(1)
+        ).first()
+        if src is None:
+            return None
+
         tr = M.Transcript(
             file_id=audio_file_id,
-            content=full_text,
-            verbose_json=json.dumps({"segments": all_segments}),
+            language=src.language,
+            content=src.content,
+            verbose_json=src.verbose_json,
+            user_id=user_id,
         )
         sess.add(tr)
         sess.flush()
-        for seg in all_segments:
-            sess.add(
-                M.TranscriptChunk(
-                    transcript_id=tr.id,
-                    start_ms=int(seg["start"] * 1000),
-                    end_ms=int(seg["end"] * 1000),
-                    text=seg["text"].strip(),
+        chunk_cols = ("start_ms", "end_ms", "text", "embedding")
+        sess.execute(
+            insert(M.TranscriptChunk).from_select(
+                ["transcript_id", *chunk_cols],
+                select(
+                    literal(tr.id, BigInteger),
+                    *(getattr(M.TranscriptChunk, c) for c in chunk_cols),
+                ).where(M.TranscriptChunk.transcript_id == src.id),
+            )
+        )
+        sess.commit()
+        return tr.id, src.id
+    finally:
+        sess.close()
+
+
+def _derived_variant(keep: Sequence[Tuple[float, float, float]]) -> str:
+    """re-encode / 分割結果を左右する設定のハッシュ (派生キャッシュのキー)"""
+    params = [
+        BITRATE, SAMPLE_RATE, MAX_BYTES, SPLIT_HEADROOM, STT_SILENCE_SPLIT,
+        SILENCE_NOISE_DB, SILENCE_MIN_SEC, SILENCE_SEARCH_SEC, STT_OVERLAP_SEC,
+        [list(k) for k in keep],
+    ]
+    return hashlib.sha1(json.dumps(params).encode()).hexdigest()[:16]
+
+
+def _fetch_missing_segments(
+    prefix: str, segments: Sequence[Tuple[Path, float]], done: Dict[int, dict]
+) -> int:
+    """チェックポイントの無いセグメントだけを派生キャッシュから取得し、件数を返す"""
+    todo = [path for i, (path, _) in enumerate(segments) if i not in done]
+    if todo:
+        workers = max(1, min(STT_CONCURRENCY, len(todo)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+            list(pool.map(lambda p: storage.fetch_derived(prefix, p.name, p), todo))
+    return len(todo)
+
+
+def _transcribe_fresh(
+    audio_file_id: str, job_id: str, user_id: Optional[str], language: Optional[str] = None
+) -> int:
+    """音声取得 → (re-encode + split) → Whisper → DB 保存。transcript_id を返す"""
+    # 1) 音声の所在 (AUDIO_STORAGE=s3 なら署名付き URL。ダウンロードはしない)
+    source = storage.open_audio(audio_file_id)
+
+    # 2) (無音トリム +) re-encode + split (ジョブ専用の作業ディレクトリ内で)
+    info = probe_audio(source.input)
+    info["size"] = info["size"] or source.size
+    record_duration(audio_file_id, info["duration"])
+    reason = reencode_reason(source.name, info)
+    keep: List[Tuple[float, float, float]] = []
+    silences: Optional[List[Tuple[float, float]]] = None  # 検出済みなら分割でも使う
+    if STT_TRIM_SILENCE_SEC > 0:
+        silences = detect_silences(source.input)
+        keep = build_keep_map(info["duration"], silences, STT_TRIM_SILENCE_SEC)
+        if len(keep) > 1 or (keep and keep[0][:2] != (0.0, info["duration"])):
+            reason = reason or "silence trim"
+        else:
+            keep = []
+    if reason is None:
+        need_bytes = source.size if source.remote else 0
+    else:
+        need_bytes = estimate_scratch_bytes(info["duration"])
+    # 派生ファイルのキャッシュは MinIO 利用時のみ (再試行 / resume で ffmpeg を省く)
+    cache_prefix = (
+        storage.derived_prefix(audio_file_id, _derived_variant(keep))
+        if source.remote and reason is not None
+        else None
+    )
+    cached = storage.get_derived_manifest(cache_prefix) if cache_prefix else None
+    full_text_parts: List[str] = []
+    all_segments: List[dict] = []
+    with job_workspace(job_id, need_bytes) as work:
+        if reason is None:  # fast path: 元ファイルをそのまま送る
+            segments = [(source.materialize(work), 0.0)]
+            reencode_metrics = {
+                "reencode": "skipped",
+                "reencode_saved_sec_est": round(
+                    info["duration"] * REENCODE_SEC_PER_AUDIO_SEC, 2
+                ),
+            }
+        elif cached:
+            segments = [(work / name, offset) for name, offset in cached]
+            reencode_metrics = {"reencode": "cached", "reencode_reason": reason}
+        else:
+            t0 = time.perf_counter()
+            encoded = reencode(source.input, work, keep)
+            reencode_metrics = {
+                "reencode": "done",
+                "reencode_reason": reason,
+                "reencode_sec": round(time.perf_counter() - t0, 2),
+            }
+            publish_progress(job_id, P.REENCODE_DONE, **reencode_metrics)
+            segments = (
+                [(encoded, 0.0)]
+                if encoded.stat().st_size <= MAX_BYTES
+                else split_by_bytes(
+                    encoded, None if silences is None else trim_silences(silences, keep)
                 )
             )
+            if cache_prefix:
+                try:
+                    storage.put_derived(cache_prefix, segments)
+                except Exception as exc:  # キャッシュは best-effort
+                    logger.warning("job %s: derived cache upload failed: %s", job_id, exc)
+
+        # 3) Whisper (セグメント並列 / 完了分はチェックポイントから再利用)
+        done = load_checkpoints(job_id, segments)
+        if cached:
+            reencode_metrics["derived_fetched"] = _fetch_missing_segments(
+                cache_prefix, segments, done
+            )
+        publish_progress(
+            job_id, P.SEGMENTS_PLANNED, total=len(segments), resumed=len(done)
+        )
+        save_checkpoint = _checkpoint_writer(job_id, segments)
+        done_counter = itertools.count(len(done) + 1)
+
+        def _on_result(index: int, result: dict) -> None:
+            save_checkpoint(index, result)
+            publish_progress(
+                job_id,
+                P.SEGMENT_TRANSCRIBED,
+                index=index,
+                done=next(done_counter),
+                total=len(segments),
+            )
+
+        t0 = time.perf_counter()
+        results = transcribe_segments(
+            segments, done=done, on_result=_on_result, language=language
+        )
+        whisper_sec = time.perf_counter() - t0
+        if STT_OVERLAP_SEC > 0:
+            results = merge_overlaps(
+                results, [off for _, off in segments], STT_OVERLAP_SEC
+            )
+        results = remap_results(results, keep)
+        for data in results:
+            all_segments.extend(data["segments"])
+            full_text_parts.append(data["text"].strip())
+        scratch_bytes = _dir_bytes(work)
+
+    _merge_job_metrics(
+        job_id,
+        scratch_bytes=scratch_bytes,
+        scratch_budget_bytes=need_bytes,
+        segments=len(segments),
+        segments_resumed=len(done),
+        **reencode_metrics,
+        **_trim_metrics(info["duration"], keep, whisper_sec),
+    )
+
+    full_text = "\n".join(full_text_parts)
+    all_segments.sort(key=lambda s: s["start"])
+
+    # 4) DB へ保存
+    sess = SessionLocal()
+    try:
+        tr, n_chunks = add_transcript(
+            sess, audio_file_id, full_text, all_segments, user_id, language=language
+        )
         sess.commit()
-        transcript_id = tr.id
+        publish_progress(job_id, P.CHUNKS_STORED, transcript_id=tr.id, chunks=n_chunks)
+        return tr.id
+    finally:
+        sess.close()
+
+
+def _trim_metrics(
+    duration: float, keep: Sequence[Tuple[float, float, float]], whisper_sec: float
+) -> dict:
+    """無音トリムで削った秒数と、節約できた Whisper 時間 / 費用の見積もり"""
+    if not keep:
+        return {}
+    kept = sum(b - a for a, b, _ in keep)
+    removed = max(0.0, duration - kept)
+    return {
+        "silence_removed_sec": round(removed, 1),
+        "silence_removed_ratio": round(removed / duration, 3) if duration else 0.0,
+        "whisper_cost_saved_usd": round(removed / 60 * WHISPER_USD_PER_MIN, 4),
+        "whisper_latency_saved_sec_est": round(whisper_sec * removed / kept, 1) if kept else 0.0,
+    }
+
+
+# --------------------------------------------------------------------------- #
+#  Celery task
+# --------------------------------------------------------------------------- #
+@celery_app.task(name="minutes.transcribe_and_generate", bind=True, max_retries=STT_MAX_RETRIES)
+def transcribe_and_generate_minutes(
+    self,
+    audio_file_id: str,
+    job_id: str,
+    user_id: Optional[str] = None,
+    force_transcribe: bool = False,
+    language: Optional[str] = None,
+):
+    """
+    STT → minutes draft までを一括で処理し、途中経過を jobs テーブル更新。
+    同一内容 (SHA-256) の音声が既に文字起こし済みなら Whisper を呼ばずに複製する
+    (force_transcribe=True で無効化)。
+    language (ISO-639) は Whisper に渡し、Transcript.language に保存する。
+
+    Whisper の一時的なエラー (rate limit / timeout / 接続断) は Celery の retry で
+    再実行し、完了済みセグメントは stt_checkpoints から再利用する。
+    """
+
+    # ---------- Job row: set PROCESSING ----------
+    sess: Session = SessionLocal()
+    job = sess.get(M.Job, job_id)
+    if not job:  # safety (outbox 経由なら Job は必ず先に commit 済み)
         sess.close()
+        logger.warning("job %s: no Job row, skipping", job_id)
+        return
+    if job.status == M.JobStatus.DRAFT_READY:  # outbox の再送 (at-least-once)
+        sess.close()
+        logger.info("job %s: already done, ignoring duplicate delivery", job_id)
+        return
+    job.status = M.JobStatus.PROCESSING
+    sess.commit()
+    sess.close()
+    publish_progress(job_id, P.PROCESSING, attempt=self.request.retries + 1)
+
+    try:
+        cached = (
+            None
+            if force_transcribe
+            else _clone_cached_transcript(audio_file_id, user_id, language)
+        )
+        if cached:
+            transcript_id, source_id = cached
+            _merge_job_metrics(
+                job_id, stt_cache="hit", stt_cache_source_transcript_id=source_id
+            )
+            logger.info(
+                "job %s: STT cache hit (transcript %s cloned from %s)",
+                job_id, transcript_id, source_id,
+            )
+            publish_progress(job_id, P.CACHE_HIT, transcript_id=transcript_id)
+        else:
+            _merge_job_metrics(job_id, stt_cache="bypass" if force_transcribe else "miss")
+            with llm_gateway.tagged(operation="stt", user_id=user_id):
+                transcript_id = _transcribe_fresh(audio_file_id, job_id, user_id, language)
 
         # 5) Draft minutes
-        generate_minutes_draft.delay(transcript_id)
+        enqueue_draft(transcript_id, user_id=user_id, job_id=job_id)
+        publish_progress(job_id, P.DRAFT_QUEUED, transcript_id=transcript_id)
 
         # ---------- Job row: set DRAFT_READY ----------
         sess = SessionLocal()
@@ -241,12 +1143,35 @@ def transcribe_and_generate_minutes(audio_file_id: str, job_id: str):
             job.status = M.JobStatus.DRAFT_READY
             sess.commit()
         sess.close()
+        clear_checkpoints(job_id)
+
+    except RETRYABLE_ERRORS as exc:
+        if self.request.retries >= self.max_retries:
+            _mark_job_failed(job_id)
+            raise
+        countdown = get_exponential_backoff_interval(
+            factor=STT_RETRY_BACKOFF_SEC,
+            retries=self.request.retries,
+            maximum=STT_RETRY_BACKOFF_MAX_SEC,
+            full_jitter=True,
+        )
+        logger.warning(
+            "job %s: retryable error (%s), retry %d in %ds",
+            job_id, exc, self.request.retries + 1, countdown,
+        )
+        _merge_job_metrics(job_id, stt_retries=self.request.retries + 1)
+        raise self.retry(exc=exc, countdown=countdown)
 
     except Exception:
-        sess = SessionLocal()
-        job = sess.get(M.Job, job_id)
-        if job:
-            job.status = M.JobStatus.FAILED
-            sess.commit()
-        sess.close()
+        _mark_job_failed(job_id)
         raise
+
+
+def _mark_job_failed(job_id: str) -> None:
+    sess = SessionLocal()
+    job = sess.get(M.Job, job_id)
+    if job:
+        job.status = M.JobStatus.FAILED
+        sess.commit()
+    sess.close()
+    publish_progress(job_id, P.FAILED)
@@ -0,0 +1,105 @@
+# backend/shared/tests/test_draft_map_reduce.py
+import threading
+import time
+
+import pytest
+
+from shared import draft_minutes as D
+
+_LATENCY = 0.05  # stub LLM の 1 呼び出しあたり待ち時間 (秒)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """_chat を一定時間待つ stub に置き換え、(system, user) を記録する"""
+    log: list[tuple[str, str]] = []
+    lock = threading.Lock()
+
+    def _stub(model, system, user, temperature=0.4, cache=True):
+        time.sleep(_LATENCY)
+        with lock:
+            log.append((system, user))
+        if system == D._REDUCE_PROMPT or system == D._SYSTEM_PROMPT:
+            return "## 概要\n## 決定事項\n## ToDo"
+        return f"- notes({len(user)})"
+
+    monkeypatch.setattr(D, "_chat", _stub)
+    return log
+
+
+def _chunks(n: int, chars: int = 100) -> list[tuple[int, int, str]]:
+    return [(i * 10_000, (i + 1) * 10_000, f"{i:03d}" + "あ" * (chars - 3)) for i in range(n)]
+
+
+def test_windows_follow_chunk_boundaries_within_budget():
+    windows = D.build_windows(_chunks(10), "", budget=350)
+
+    assert [len(w.text.splitlines()) for w in windows] == [3, 3, 3, 1]
+    assert all(D.estimate_tokens(w.text) <= 350 for w in windows)
+    assert (windows[0].start_ms, windows[0].end_ms) == (0, 30_000)
+    assert (windows[-1].start_ms, windows[-1].end_ms) == (90_000, 100_000)
+    # 全チャンクが順番どおり 1 回ずつ入っている
+    assert "\n".join(w.text for w in windows) == "\n".join(c[2] for c in _chunks(10))
+
+
+def test_oversized_chunk_and_missing_chunks_are_split():
+    windows = D.build_windows([(0, 60_000, "あ" * 1000)], "", budget=300)
+    assert len(windows) == 4 and all(len(w.text) <= 300 for w in windows)
+
+    fallback = D.build_windows([], "行\n" * 500, budget=300)
+    assert all(w.start_ms is None for w in fallback)
+    assert "".join(w.text for w in fallback) == "行\n" * 500
+
+
+def test_short_transcript_uses_single_call(calls):
+    markdown, meta = D.draft_markdown("短い会議", [], "m")
+
+    assert meta["strategy"] == "single"
+    assert len(calls) == 1 and calls[0] == (D._SYSTEM_PROMPT, "短い会議")
+    assert "決定事項" in markdown
+
+
+def test_long_transcript_is_mapped_in_parallel_then_reduced(calls, monkeypatch):
+    monkeypatch.setattr(D, "DRAFT_SINGLE_MAX_TOKENS", 1000)
+    monkeypatch.setattr(D, "DRAFT_WINDOW_TOKENS", 500)
+    monkeypatch.setattr(D, "DRAFT_MAP_CONCURRENCY", 10)
+    chunks = _chunks(40)  # 4 chunks / window → 10 windows
+    content = "\n".join(c[2] for c in chunks)
+
+    t0 = time.perf_counter()
+    markdown, meta = D.draft_markdown(content, chunks, "m")
+    elapsed = time.perf_counter() - t0
+
+    assert meta["strategy"] == "map_reduce"
+    assert meta["windows"] == 10 and meta["reduce_levels"] == 1
+    maps = [u for s, u in calls if "one part (" in s]
+    assert len(maps) == 10 and calls[-1][0] == D._REDUCE_PROMPT
+    # 全窓の内容が map に渡っている (先頭 truncation で失われない)
+    assert "039" in "".join(maps)
+    # 壁時計 ≈ 1 窓 + 1 reduce
+    assert elapsed < _LATENCY * 4
+    assert "決定事項" in markdown
+
+
+def test_reduce_is_hierarchical_when_notes_overflow(calls):
+    windows = [D.Window(i, i + 1, "x") for i in range(6)]
+    _, levels = D.map_reduce_draft(windows, "m", reduce_budget=40, concurrency=6)
+
+    assert levels >= 1
+    assert any(s == D._COMBINE_PROMPT for s, _ in calls)
+    assert calls[-1][0] == D._REDUCE_PROMPT
+
+
+def test_split_always_makes_progress_when_budget_is_below_one_token(monkeypatch):
+    monkeypatch.setattr(D.PB, "truncate", lambda text, max_tokens, model=None: "")
+    assert D._split_text("あいう", budget=0) == ["あ", "い", "う"]
+
+
+def test_time_limit_grows_with_map_rounds(monkeypatch):
+    monkeypatch.setattr(D, "DRAFT_SINGLE_MAX_TOKENS", 300)
+    monkeypatch.setattr(D, "DRAFT_WINDOW_TOKENS", 100)
+    monkeypatch.setattr(D, "DRAFT_MAP_CONCURRENCY", 4)
+
+    assert D.draft_time_limit(300, "gpt-4o-mini") == D.DRAFT_TIME_LIMIT  # single
+    assert D.draft_time_limit(400, "gpt-4o-mini") == D.DRAFT_TIME_LIMIT  # 4 窓 = 1 巡
+    assert D.draft_time_limit(100 * 40, "gpt-4o-mini") == D.DRAFT_TIME_LIMIT + 9 * D.DRAFT_TIME_PER_ROUND_SEC
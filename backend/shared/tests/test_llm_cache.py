@@ -0,0 +1,81 @@
+# backend/shared/tests/test_llm_cache.py
+import types
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from shared.llm_gateway import cache as C
+from shared.llm_gateway import gateway as G
+
+_MSGS = [{"role": "system", "content": "sys"}, {"role": "user", "content": "本文\n"}]
+
+
+def _completion(text: str) -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "c1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text},
+                }
+            ],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+        }
+    )
+
+
+def test_fingerprint_normalises_whitespace_and_default_temperature():
+    crlf = [{"role": "system", "content": "sys  "}, {"role": "user", "content": "本文\r\n"}]
+    base = C.fingerprint("gpt-4o-mini", _MSGS, {})
+
+    assert C.fingerprint("gpt-4o-mini", crlf, {"temperature": 1.0}) == base
+    assert C.fingerprint("gpt-4o", _MSGS, {}) != base
+    assert C.fingerprint("gpt-4o-mini", _MSGS, {"temperature": 0.3}) != base
+    assert C.fingerprint("gpt-4o-mini", _MSGS, {"response_format": {"type": "json_object"}}) != base
+
+
+def test_bypass_header_values():
+    assert C.bypass_requested("bypass")
+    assert C.bypass_requested(None, "no-cache, no-store")
+    assert not C.bypass_requested(None, None)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Redis の代わりに dict を使い、OpenAI 呼び出しを数える"""
+    data: dict[str, str] = {}
+    calls = []
+    monkeypatch.setattr(C, "get", lambda key, model: data.get(key))
+    monkeypatch.setattr(C, "put", lambda key, value: data.__setitem__(key, value))
+    monkeypatch.setattr(C, "LLM_CACHE_ENABLED", True)
+
+    def _create(**kwargs):
+        calls.append(kwargs)
+        return _completion(f"answer {len(calls)}")
+
+    client = types.SimpleNamespace(
+        chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=_create))
+    )
+    monkeypatch.setattr(G, "sync_client", lambda: client)
+    monkeypatch.setattr(G.limiter, "acquire", lambda model, tokens=0: 0.0)
+    return calls
+
+
+def test_identical_request_is_served_from_cache(store):
+    first = G.chat("gpt-4o-mini", _MSGS, temperature=0.3, cache=True)
+    second = G.chat("gpt-4o-mini", _MSGS, temperature=0.3, cache=True)
+
+    assert len(store) == 1
+    assert second.choices[0].message.content == first.choices[0].message.content == "answer 1"
+
+
+def test_cache_false_always_calls_openai(store):
+    G.chat("gpt-4o-mini", _MSGS, temperature=0.3, cache=True)
+    rsp = G.chat("gpt-4o-mini", _MSGS, temperature=0.3, cache=False)
+
+    assert len(store) == 2 and rsp.choices[0].message.content == "answer 2"
@@ -0,0 +1,139 @@
+# backend/shared/tests/test_llm_gateway.py
+import asyncio
+import io
+import types
+
+import httpx
+import openai
+import pytest
+
+from shared.llm_gateway import gateway as G
+from shared.llm_gateway import limiter, metrics
+
+
+class _FakeCompletions:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls: list[dict] = []
+
+    def create(self, **kwargs):
+        if "file" in kwargs:
+            kwargs["data"] = kwargs["file"].read()
+        self.calls.append(kwargs)
+        if len(self.calls) <= self.failures:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://test"))
+        usage = types.SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+        return types.SimpleNamespace(usage=usage)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    """sync クライアントを stub にし、limiter / back-off 待ちを無効化する"""
+    completions = _FakeCompletions(failures=0)
+    client = types.SimpleNamespace(
+        chat=types.SimpleNamespace(completions=completions),
+        audio=types.SimpleNamespace(transcriptions=completions),
+    )
+    monkeypatch.setattr(G, "sync_client", lambda: client)
+    monkeypatch.setattr(G.limiter, "acquire", lambda model, tokens=0: 0.0)
+    monkeypatch.setattr(G, "LLM_RETRY_INITIAL_SEC", 0)
+    monkeypatch.setattr(G, "LLM_RETRY_MAX_SEC", 0)
+    monkeypatch.setattr(metrics, "_totals", metrics.defaultdict(lambda: metrics.defaultdict(float)))
+    monkeypatch.setattr(metrics.telemetry, "LLM_TELEMETRY_ENABLED", False)
+    return completions
+
+
+def test_transient_errors_are_retried_and_counted(fake):
+    fake.failures = 2
+    G.chat("gpt-4o-mini", [{"role": "user", "content": "hi"}], temperature=0)
+
+    assert len(fake.calls) == 3
+    assert fake.calls[-1]["timeout"] == G.TIMEOUTS["chat"]
+    stats = metrics.snapshot()["chat:gpt-4o-mini"]
+    assert stats["calls"] == 1 and stats["retries"] == 2 and stats["errors"] == 0
+    assert stats["prompt_tokens"] == 12
+
+
+def test_gives_up_after_max_attempts(fake, monkeypatch):
+    monkeypatch.setattr(G, "LLM_MAX_ATTEMPTS", 2)
+    fake.failures = 5
+    with pytest.raises(openai.APIConnectionError):
+        G.chat("gpt-4o-mini", [{"role": "user", "content": "hi"}], timeout=3)
+
+    assert len(fake.calls) == 2 and fake.calls[0]["timeout"] == 3
+    assert metrics.snapshot()["chat:gpt-4o-mini"]["errors"] == 1
+
+
+def test_audio_file_is_rewound_between_attempts(fake):
+    fake.failures = 1
+    fp = io.BytesIO(b"audio")
+
+    G.transcribe(model="whisper-1", file=fp)
+    assert [c["data"] for c in fake.calls] == [b"audio", b"audio"]
+
+
+def _chunk(text=None, usage=None):
+    choices = [types.SimpleNamespace(delta=types.SimpleNamespace(content=text))] if text else []
+    return types.SimpleNamespace(choices=choices, usage=usage)
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        for c in self.chunks:
+            yield c
+
+    async def close(self):
+        self.closed = True
+
+
+def test_stream_is_recorded_with_usage_once_read(fake, monkeypatch):
+    sent, records = [], []
+    usage = types.SimpleNamespace(prompt_tokens=20, completion_tokens=2)
+    streams = [_FakeStream([_chunk("議事"), _chunk("録"), _chunk(usage=usage)]) for _ in range(2)]
+
+    async def create(**kwargs):
+        sent.append(kwargs)
+        return streams[len(sent) - 1]
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setattr(G, "async_client", lambda: client)
+
+    async def aacquire(model, tokens=0):
+        return 0.0
+
+    monkeypatch.setattr(G.limiter, "aacquire", aacquire)
+    monkeypatch.setattr(metrics, "record", records.append)
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def _run():
+        with metrics.tagged(operation="agent_stream"):
+            full = await G.achat_stream("gpt-4o-mini", messages)
+            cut = await G.achat_stream("gpt-4o-mini", messages)
+        assert records == []  # 読み終えるまでは記録しない
+        texts = [c.choices[0].delta.content async for c in full if c.choices]
+        async for _ in cut:
+            break
+        await cut.aclose()
+        return texts
+
+    assert asyncio.run(_run()) == ["議事", "録"]
+    assert sent[0]["stream_options"] == {"include_usage": True}
+    full, cut = records
+    assert (full.endpoint, full.operation, full.prompt_tokens, full.completion_tokens) == (
+        "chat_stream", "agent_stream", 20, 2,
+    )
+    # usage が届く前に閉じたら prompt と受信済み本文から見積もる
+    assert cut.operation == "agent_stream" and cut.prompt_tokens > 0 and cut.completion_tokens > 0
+    assert all(s.closed for s in streams)
+
+
+def test_limits_prefer_longest_prefix(monkeypatch):
+    monkeypatch.setattr(limiter, "LIMITS", {"gpt-4o": (1, 2), "gpt-4o-mini": (3, 4)})
+    assert limiter.limits_for("gpt-4o-mini-2024-07-18") == (3, 4)
+    assert limiter.limits_for("gpt-4o-2024-08-06") == (1, 2)
+    assert limiter.limits_for("other") == (0, 0)
+    assert limiter.acquire("other", 10) == 0.0  # 無制限なら Redis に触れない
@@ -0,0 +1,67 @@
+# backend/shared/tests/test_llm_telemetry.py
+import queue
+import uuid
+
+import pytest
+
+from shared.draft_minutes import _parallel
+from shared.llm_gateway import metrics, telemetry
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """DB の代わりに書き込まれた行を集める (バックグラウンドスレッドは起動しない)"""
+    batches: list[list[dict]] = []
+    monkeypatch.setattr(telemetry, "_queue", queue.Queue(maxsize=telemetry.LLM_TELEMETRY_QUEUE_MAX))
+    monkeypatch.setattr(telemetry, "_ensure_writer", lambda: None)
+    monkeypatch.setattr(telemetry, "_write", batches.append)
+    monkeypatch.setattr(telemetry, "LLM_TELEMETRY_ENABLED", True)
+    monkeypatch.setattr(telemetry, "LLM_TELEMETRY_BATCH", 2)
+    return batches
+
+
+def _rec(**kw) -> metrics.CallRecord:
+    return metrics.CallRecord(endpoint="chat", model="gpt-4o-mini", latency_sec=0.25, attempts=1, ok=True, **kw)
+
+
+def test_tags_are_attached_and_rows_batched(written):
+    user = uuid.uuid4()
+    with metrics.tagged(operation="ai_edit", transcript_id=7, user_id=str(user)):
+        with metrics.tagged(operation="agent"):
+            metrics.record(_rec(prompt_tokens=10, completion_tokens=5))
+        metrics.record(_rec(cache_hit=True))
+    metrics.record(_rec())
+
+    assert telemetry.flush() == 3
+    assert [len(b) for b in written] == [2, 1]
+    first, second, third = (row for batch in written for row in batch)
+    assert (first["operation"], first["transcript_id"], first["user_id"]) == ("agent", 7, user)
+    assert first["latency_ms"] == 250 and first["prompt_tokens"] == 10
+    assert second["operation"] == "ai_edit" and second["cache_hit"] is True
+    assert third["operation"] is None and third["user_id"] is None
+
+
+def test_unknown_tag_is_rejected():
+    with pytest.raises(TypeError):
+        with metrics.tagged(job="x"):
+            pass
+
+
+def test_full_queue_drops_instead_of_blocking(written, monkeypatch):
+    monkeypatch.setattr(telemetry, "_queue", queue.Queue(maxsize=1))
+    metrics.record(_rec())
+    metrics.record(_rec())
+
+    assert telemetry.flush() == 1
+
+
+def test_tags_reach_parallel_draft_workers():
+    with metrics.tagged(operation="minutes_draft", transcript_id=3):
+        seen = _parallel(lambda _: metrics.current_tags()["transcript_id"], range(6), 3)
+    assert seen == [3] * 6
+
+
+def test_cost_uses_longest_price_prefix():
+    assert telemetry.cost_usd("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+    assert telemetry.cost_usd("gpt-4o", 0, 1_000_000) == pytest.approx(10.0)
+    assert telemetry.cost_usd("whisper-1", None, None) is None
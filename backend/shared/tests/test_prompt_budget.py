@@ -0,0 +1,76 @@
+# backend/shared/tests/test_prompt_budget.py
+import pytest
+
+from shared import prompt_budget as PB
+
+
+def _msg(role: str, text: str) -> dict[str, str]:
+    return {"role": role, "content": text}
+
+
+def test_model_limits_prefer_longest_prefix():
+    assert PB.model_limits("gpt-4o-mini-2024-07-18") == (128_000, 16_384)
+    assert PB.model_limits("gpt-4-0613") == (8_192, 4_096)
+    assert PB.model_limits("unknown-model") == PB._DEFAULT_LIMITS
+
+
+def test_truncate_returns_prefix_within_budget():
+    text = "議事録のテキスト。" * 200
+    head = PB.truncate(text, 50, "gpt-4o-mini")
+
+    assert text.startswith(head) and head
+    assert PB.count_tokens(head, "gpt-4o-mini") <= 50
+    assert PB.truncate("短い", 50) == "短い"
+    assert PB.truncate(text, 0) == ""
+
+
+def test_fit_messages_drops_oldest_history_first(monkeypatch):
+    monkeypatch.setattr(PB, "SAFETY_MARGIN_TOKENS", 0)
+    # トークナイザの有無に依らないよう 1 文字 = 1 token で数える
+    monkeypatch.setattr(PB, "count_tokens", lambda text, model=None: len(text))
+    # gpt-4 の 8k 窓: completion 4k を確保すると prompt は約 4k
+    head = [_msg("system", "sys"), _msg("user", "議" * 2000)]
+    history = [_msg("user", f"{i:02d}" + "x" * 500) for i in range(10)]
+    tail = [_msg("user", "今回の指示")]
+
+    messages, est = PB.fit_messages(head, history, tail, "gpt-4", completion_tokens=4096)
+
+    assert messages[:2] == head and messages[-1] == tail[0]
+    kept = [m for m in messages if m in history]
+    assert kept and kept == history[-len(kept):]  # 新しいものが残る
+    assert len(kept) < len(history)
+    assert messages[2]["content"] == PB.HISTORY_OMITTED_NOTE.format(n=len(history) - len(kept))
+    assert est.prompt_tokens <= PB.prompt_limit("gpt-4", 4096)
+    assert est.completion_tokens == 4096
+
+
+def test_fit_messages_keeps_everything_when_it_fits():
+    history = [_msg("user", "a"), _msg("assistant", "b")]
+    messages, _ = PB.fit_messages([_msg("system", "s")], history, [_msg("user", "c")], "gpt-4o", 100)
+    assert [m["content"] for m in messages] == ["s", "a", "b", "c"]
+
+
+def test_estimate_raises_when_required_part_overflows(monkeypatch):
+    monkeypatch.setattr(PB, "count_tokens", lambda text, model=None: len(text))
+    with pytest.raises(PB.PromptTooLarge) as exc:
+        PB.estimate([_msg("user", "x" * 100_000)], "gpt-4", completion_tokens=1000)
+    assert exc.value.model == "gpt-4"
+    assert exc.value.prompt_tokens > exc.value.limit
+
+
+def test_unloadable_encoding_falls_back_to_char_count(monkeypatch):
+    if PB.tiktoken is None:
+        pytest.skip("tiktoken not installed")
+
+    def offline(*_a, **_kw):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(PB.tiktoken, "encoding_for_model", offline)
+    monkeypatch.setattr(PB.tiktoken, "get_encoding", offline)
+    PB._encoding.cache_clear()
+    try:
+        assert PB.tokenizer_name("gpt-4o-mini") == "chars"
+        assert PB.count_tokens("議事録", "gpt-4o-mini") == 3
+        assert PB.truncate("議事録のテキスト", 3, "gpt-4o-mini") == "議事録"
+    finally:
+        PB._encoding.cache_clear()
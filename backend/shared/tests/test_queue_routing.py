@@ -0,0 +1,120 @@
+# backend/shared/tests/test_queue_routing.py
+import queue
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+import pytest
+
+from shared import celery_app as C
+from shared import stt_transcribe as stt
+
+STT = "minutes.transcribe_and_generate"
+DRAFT = "minutes.draft.generate"
+ETL = "etl.sync_dify"
+
+
+def _queue_of(task: str, **options) -> str:
+    """celery_app の task_routes を実際に通したキュー名"""
+    return C.celery_app.amqp.router.route(options, task)["queue"].name
+
+
+def test_routes_by_workload_class():
+    assert _queue_of(STT) == C.STT_HEAVY
+    assert _queue_of(STT, queue=C.STT_FAST) == C.STT_FAST
+    assert _queue_of(DRAFT) == C.LLM_INTERACTIVE
+    assert _queue_of(ETL) == C.ETL_BATCH
+
+
+@pytest.mark.parametrize(
+    "duration, expected",
+    [(60.0, C.STT_FAST), (stt.STT_FAST_MAX_SEC, C.STT_FAST), (3600.0, C.STT_HEAVY)],
+)
+def test_stt_queue_by_known_duration(duration, expected):
+    # 長さが分かっていればサイズより優先
+    assert stt.stt_queue_for(duration, size=10 * stt.STT_FAST_MAX_BYTES) == expected
+
+
+def test_stt_queue_falls_back_to_size_then_heavy():
+    assert stt.stt_queue_for(size=stt.STT_FAST_MAX_BYTES) == C.STT_FAST
+    assert stt.stt_queue_for(size=stt.STT_FAST_MAX_BYTES + 1) == C.STT_HEAVY
+    assert stt.stt_queue_for() == C.STT_HEAVY
+
+
+def test_routing_never_probes_audio(monkeypatch):
+    def _probe(*a, **k):
+        raise AssertionError("ffprobe must not run at routing time")
+
+    monkeypatch.setattr(stt, "probe_duration", _probe)
+    monkeypatch.setattr(stt.storage, "open_audio", _probe)
+    assert stt.stt_queue_for(None, 1024) == C.STT_FAST
+
+
+# --------------------------------------------------------------------------- #
+#  head-of-line blocking simulation (stub tasks, threads as worker slots)
+# --------------------------------------------------------------------------- #
+_COST = {"stt-long": 0.40, "stt-short": 0.05, ETL: 0.60, DRAFT: 0.02}
+
+
+def _workload():
+    """長尺 STT と ETL が先に積まれ、直後にユーザー向けの短い仕事が来る"""
+    return (
+        [("stt-long", C.STT_HEAVY)] * 3
+        + [(ETL, C.ETL_BATCH)]
+        + [("stt-short", C.STT_FAST), (DRAFT, C.LLM_INTERACTIVE)] * 4
+    )
+
+
+def _simulate(pools: dict[str, int], route) -> dict[str, list[float]]:
+    """pools={queue: concurrency} で workload を流し、種類ごとの待ち時間 (秒) を返す"""
+    queues = {name: queue.Queue() for name in pools}
+    waits: dict[str, list[float]] = defaultdict(list)
+    lock = threading.Lock()
+
+    def _worker(q: queue.Queue) -> None:
+        while (item := q.get()) is not None:
+            kind, enqueued = item
+            with lock:
+                waits[kind].append(time.perf_counter() - enqueued)
+            time.sleep(_COST[kind])
+
+    threads = [
+        threading.Thread(target=_worker, args=(queues[name],))
+        for name, n in pools.items()
+        for _ in range(n)
+    ]
+    for t in threads:
+        t.start()
+    for kind, q in _workload():
+        queues[route(q)].put((kind, time.perf_counter()))
+    for name, n in pools.items():
+        for _ in range(n):
+            queues[name].put(None)
+    for t in threads:
+        t.join()
+    return waits
+
+
+@pytest.mark.benchmark
+def test_benchmark_head_of_line_blocking(capsys):
+    """同じ総並列数 4 で、単一キュー vs workload class 別キューの待ち時間を比較"""
+    single = _simulate({"celery": 4}, route=lambda q: "celery")
+    routed = _simulate(
+        {C.STT_HEAVY: 1, C.STT_FAST: 1, C.LLM_INTERACTIVE: 1, C.ETL_BATCH: 1},
+        route=lambda q: q,
+    )
+
+    with capsys.disabled():
+        print("\ntask        single-queue p50/max[s]  routed p50/max[s]")
+        for kind in ("stt-short", DRAFT):
+            s, r = single[kind], routed[kind]
+            print(
+                f"{kind:<22}  {statistics.median(s):.3f}/{max(s):.3f}"
+                f"        {statistics.median(r):.3f}/{max(r):.3f}"
+            )
+
+    # 単一キューではドラフトが長尺 STT / ETL の後ろで待たされる
+    assert min(single[DRAFT]) >= _COST["stt-long"] * 0.9
+    assert max(routed[DRAFT]) < _COST["stt-long"] / 2
+    assert max(routed["stt-short"]) < _COST["stt-long"]
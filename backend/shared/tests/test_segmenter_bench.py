@@ -0,0 +1,99 @@
+# backend/shared/tests/test_segmenter_bench.py
+"""
+split_by_bytes (segment muxer 1 パス) と旧実装 (チャンク毎に ffmpeg -ss/-t) の比較。
+
+    pytest -m benchmark -s shared/tests/test_segmenter_bench.py
+
+30 / 60 / 180 分の合成音声 (sine + anoisesrc) を ffmpeg でローカル生成する。
+ffmpeg / ffprobe が無い環境では skip。
+本番では無音トリムで検出済みの silences を渡すので、分割は silences=[] で計測し、
+silencedetect 単体の時間は別列に出す。
+"""
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from shared import stt_transcribe as stt
+
+pytestmark = [
+    pytest.mark.benchmark,
+    pytest.mark.skipif(
+        not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+        reason="ffmpeg/ffprobe not installed",
+    ),
+]
+
+# 合成音声は小さい MAX_BYTES で切ってセグメント数を稼ぐ (32 kbps ≒ 14 MB/h)
+_BENCH_MAX_BYTES = 4 * 1024 * 1024
+
+
+def _synth(path: Path, minutes: int) -> Path:
+    """sine + anoisesrc を混ぜた 16 kHz mono 32 kbps の mp3 を作る"""
+    sec = minutes * 60
+    stt._run(
+        [
+            "ffmpeg", "-y",
+            "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate={stt.SAMPLE_RATE}:duration={sec}",
+            "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.05:sample_rate={stt.SAMPLE_RATE}:duration={sec}",
+            "-filter_complex", "amix=inputs=2:duration=shortest",
+            "-ac", "1", "-ar", str(stt.SAMPLE_RATE), "-b:a", stt.BITRATE,
+            str(path),
+        ]
+    )
+    return path
+
+
+def _legacy_split(path: Path) -> list[tuple[Path, float]]:
+    """旧 split_by_bytes: チャンク毎に入力全体を開き直して -ss でシーク"""
+    duration = stt.probe_duration(path)
+    bps = int(stt.BITRATE.replace("k", "")) * 1024 // 8
+    approx_sec = stt.MAX_BYTES / bps * 0.9
+    chunks, offset, idx = [], 0.0, 0
+    while offset < duration:
+        dur = min(approx_sec, duration - offset)
+        out = path.parent / f"legacy_{idx:04d}.mp3"
+        stt._run(["ffmpeg", "-y", "-i", str(path), "-ss", str(offset), "-t", str(dur), "-c", "copy", str(out)])
+        chunks.append((out, offset))
+        offset += dur
+        idx += 1
+    return chunks
+
+
+@pytest.fixture(autouse=True)
+def _small_max_bytes(monkeypatch):
+    monkeypatch.setattr(stt, "MAX_BYTES", _BENCH_MAX_BYTES)
+
+
+@pytest.mark.parametrize("minutes", [30, 60, 180])
+def test_single_pass_segmenter_timing(tmp_path, minutes, capsys):
+    src = _synth(tmp_path / f"synth_{minutes}.mp3", minutes)
+
+    legacy_dir = tmp_path / "legacy"
+    legacy_dir.mkdir()
+    legacy_src = shutil.copy(src, legacy_dir / src.name)
+    t0 = time.perf_counter()
+    legacy = _legacy_split(Path(legacy_src))
+    t_legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    chunks = stt.split_by_bytes(src, silences=[])
+    t_new = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    stt.detect_silences(src)
+    t_detect = time.perf_counter() - t0
+
+    with capsys.disabled():
+        print(
+            f"\n{minutes:>4} min  legacy: {len(legacy):>2} chunks {t_legacy:7.2f}s"
+            f"  single-pass: {len(chunks):>2} chunks {t_new:7.2f}s"
+            f"  (silencedetect {t_detect:7.2f}s)"
+        )
+
+    assert all(p.stat().st_size <= stt.MAX_BYTES for p, _ in chunks)
+    offsets = [off for _, off in chunks]
+    assert offsets == sorted(offsets) and offsets[0] == 0.0
+    total = sum(stt.probe_duration(p) for p, _ in chunks)
+    assert total == pytest.approx(minutes * 60, rel=0.01)
@@ -0,0 +1,51 @@
+# backend/shared/tests/test_storage.py
+import hashlib
+import io
+
+import pytest
+
+from shared import storage
+
+
+@pytest.fixture(autouse=True)
+def _local_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "AUDIO_STORAGE", "local")
+    monkeypatch.setattr(storage, "UPLOAD_DIR", tmp_path)
+
+
+def test_save_upload_streams_and_hashes(tmp_path):
+    payload = b"\x00\x01" * (storage.COPY_CHUNK_BYTES + 123)
+    stored = storage.save_upload(io.BytesIO(payload), "fid", "../meeting.wav")
+
+    assert stored.size == len(payload)
+    assert stored.sha256 == hashlib.sha256(payload).hexdigest()
+    assert stored.location == str(tmp_path / "fid_meeting.wav")
+
+    source = storage.open_audio("fid")
+    assert not source.remote
+    assert source.size == len(payload)
+    assert source.name.name == "fid_meeting.wav"
+    assert source.materialize(tmp_path / "unused").read_bytes() == payload
+
+
+def test_save_upload_over_limit_leaves_nothing(tmp_path):
+    with pytest.raises(storage.UploadTooLarge):
+        storage.save_upload(io.BytesIO(b"x" * 100), "big", "a.wav", max_bytes=10)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_open_audio_missing():
+    with pytest.raises(FileNotFoundError):
+        storage.open_audio("nope")
+
+
+def test_promote_partial_renames_and_hashes(tmp_path):
+    part = tmp_path / "fid.part"
+    part.write_bytes(b"abc" * 1000)
+
+    stored = storage.promote_partial(part, "fid", "rec.m4a")
+
+    assert not part.exists()
+    assert stored.location == str(tmp_path / "fid_rec.m4a")
+    assert stored.size == 3000
+    assert stored.sha256 == hashlib.sha256(b"abc" * 1000).hexdigest()
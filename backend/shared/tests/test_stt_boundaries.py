@@ -0,0 +1,140 @@
+# backend/shared/tests/test_stt_boundaries.py
+import types
+
+import pytest
+
+from shared import stt_transcribe as stt
+
+
+# --------------------------------------------------------------------------- #
+#  plan_cuts
+# --------------------------------------------------------------------------- #
+def test_cuts_snap_to_latest_pause_within_budget():
+    silences = [(500.0, 501.0), (560.0, 562.0), (650.0, 651.0)]
+    cuts = stt.plan_cuts(1000.0, 600.0, silences, search_sec=120.0)
+    # 600 秒の予算内で最も遅い無音 (560-562) の中央で切る
+    assert cuts[0] == pytest.approx(561.0)
+    assert all(b - a <= 600.0 for a, b in zip([0.0, *cuts], [*cuts, 1000.0]))
+
+
+def test_cuts_fall_back_to_budget_without_pause():
+    assert stt.plan_cuts(1300.0, 600.0, [], search_sec=120.0) == [600.0, 1200.0]
+
+
+def test_no_cut_when_audio_fits():
+    assert stt.plan_cuts(300.0, 600.0, [(100.0, 101.0)]) == []
+
+
+def test_non_positive_chunk_length_is_rejected():
+    with pytest.raises(ValueError):
+        stt.plan_cuts(1000.0, 0.0)
+
+
+# --------------------------------------------------------------------------- #
+#  split_by_bytes の上限
+# --------------------------------------------------------------------------- #
+def test_segment_still_too_large_at_max_depth_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(stt, "MAX_BYTES", 10)
+    seg = tmp_path / "seg_0000_0_0.mp3"
+    seg.write_bytes(b"x" * 11)
+
+    with pytest.raises(stt.SegmentTooLarge, match="seg_0000_0_0.mp3"):
+        stt._fit_segment(seg, 0.0, 1.0, depth=stt.SPLIT_MAX_DEPTH)
+
+
+def test_overlap_is_clamped_to_half_the_chunk(tmp_path, monkeypatch):
+    src = tmp_path / "in.mp3"
+    src.write_bytes(b"x" * 1000)
+    monkeypatch.setattr(stt, "MAX_BYTES", 100)
+    monkeypatch.setattr(stt, "STT_SILENCE_SPLIT", False)
+    monkeypatch.setattr(stt, "STT_OVERLAP_SEC", 10_000.0)
+    monkeypatch.setattr(stt, "probe_duration", lambda path: 3600.0)
+    seen = {}
+
+    def _cut(path, cuts, duration, overlap):
+        seen.update(cuts=cuts, overlap=overlap)
+        return []
+
+    monkeypatch.setattr(stt, "_cut_with_overlap", _cut)
+    stt.split_by_bytes(src)
+
+    segment_sec = 100 / (1000 / 3600.0) * stt.SPLIT_HEADROOM
+    assert seen["overlap"] == pytest.approx(segment_sec / 2)
+    assert len(seen["cuts"]) == 3600 // (segment_sec / 2)
+
+
+# --------------------------------------------------------------------------- #
+#  merge_overlaps
+# --------------------------------------------------------------------------- #
+def _seg(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+def test_overlap_duplicates_are_removed_at_midpoint():
+    # chunk0: 0-610 秒 / chunk1: 600- (10 秒重なり、中央 605)
+    chunk0 = {
+        "text": "",
+        "segments": [_seg(590.0, 598.0, "A"), _seg(599.0, 604.0, "B"), _seg(606.0, 610.0, "C")],
+        "words": [{"start": 603.0, "end": 604.0, "word": "B"}, {"start": 607.0, "end": 608.0, "word": "C"}],
+    }
+    chunk1 = {
+        "text": "",
+        "segments": [_seg(600.5, 604.0, "B"), _seg(606.0, 610.0, "C"), _seg(611.0, 615.0, "D")],
+        "words": [{"start": 603.0, "end": 604.0, "word": "B"}, {"start": 607.0, "end": 608.0, "word": "C"}],
+    }
+
+    out = stt.merge_overlaps([chunk0, chunk1], [0.0, 600.0], overlap=10.0)
+
+    texts = [s["text"] for d in out for s in d["segments"]]
+    assert texts == ["A", "B", "C", "D"]
+    assert [w["word"] for d in out for w in d["words"]] == ["B", "C"]
+    assert out[0]["text"] == "AB" and out[1]["text"] == "CD"
+
+
+def test_merge_is_noop_without_overlap():
+    chunks = [{"text": "x", "segments": [_seg(0, 1, "x")]}, {"text": "y", "segments": [_seg(600, 601, "y")]}]
+    assert stt.merge_overlaps(chunks, [0.0, 600.0], overlap=0) == chunks
+
+
+# --------------------------------------------------------------------------- #
+#  silence trimming + timestamp remap
+# --------------------------------------------------------------------------- #
+def test_keep_map_drops_long_silences_with_padding():
+    # 100-160 秒の休憩 (60 秒) は削る、200-201 秒の短い間は残す
+    keep = stt.build_keep_map(300.0, [(100.0, 160.0), (200.0, 201.0)], 5.0, pad_sec=0.5)
+    assert keep == [(0.0, 100.5, 0.0), (159.5, 300.0, 100.5)]
+
+
+def test_source_silences_are_reused_on_the_trimmed_timeline(monkeypatch):
+    keep = stt.build_keep_map(300.0, [(100.0, 160.0), (200.0, 201.0)], 5.0, pad_sec=0.5)
+    # 削った休憩は前後の pad (0.5 + 0.5 秒) が隣り合って 1 つの無音になる
+    assert stt.trim_silences([(100.0, 160.0), (200.0, 201.0)], keep) == [
+        (100.0, 101.0),
+        (141.0, 142.0),
+    ]
+    assert stt.trim_silences([(1.0, 2.0)], []) == [(1.0, 2.0)]
+
+    # 渡された無音があれば split_by_bytes は silencedetect を走らせない
+    monkeypatch.setattr(stt, "detect_silences", lambda path: pytest.fail("silencedetect ran twice"))
+    monkeypatch.setattr(stt, "probe_duration", lambda path: 0.0)
+    monkeypatch.setattr(stt, "STT_OVERLAP_SEC", 1.0)
+    monkeypatch.setattr(stt, "_cut_with_overlap", lambda path, cuts, duration, overlap: [])
+
+    class _Path:
+        def stat(self):
+            return types.SimpleNamespace(st_size=0)
+
+    assert stt.split_by_bytes(_Path(), [(10.0, 11.0)]) == []
+
+
+def test_remap_restores_original_timeline():
+    keep = stt.build_keep_map(300.0, [(100.0, 160.0)], 5.0, pad_sec=0.5)
+    assert stt.remap_timestamp(50.0, keep) == pytest.approx(50.0)
+    # トリム後 110 秒 = 再開点 (159.5) から 9.5 秒後
+    assert stt.remap_timestamp(110.0, keep) == pytest.approx(169.0)
+
+    results = [{"segments": [_seg(99.0, 102.0, "x")], "words": [{"start": 101.0, "end": 101.5}]}]
+    out = stt.remap_results(results, keep)
+    assert out[0]["segments"][0]["start"] == pytest.approx(99.0)
+    assert out[0]["segments"][0]["end"] == pytest.approx(161.0)
+    assert out[0]["words"][0]["start"] == pytest.approx(160.0)
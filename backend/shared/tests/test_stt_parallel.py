@@ -0,0 +1,121 @@
+# backend/shared/tests/test_stt_parallel.py
+import time
+from pathlib import Path
+
+import pytest
+
+from shared import stt_transcribe as stt
+
+_LATENCY = 0.05  # stub Whisper の 1 呼び出しあたり待ち時間 (秒)
+
+
+def _stub_transcribe(seg_path: Path, language=None) -> dict:
+    """Whisper の代わりに一定時間待ってセグメント名入りの verbose_json を返す"""
+    time.sleep(_LATENCY)
+    return {
+        "text": f" {seg_path.name} ",
+        "segments": [{"start": 0.0, "end": 1.0, "text": seg_path.name}],
+        "words": [{"start": 0.5, "end": 0.8, "word": seg_path.name}],
+    }
+
+
+@pytest.fixture(autouse=True)
+def _stub_whisper(monkeypatch):
+    monkeypatch.setattr(stt, "_transcribe_segment", _stub_transcribe)
+
+
+def _segments(n: int) -> list[tuple[Path, float]]:
+    return [(Path(f"seg_{i:04d}.mp3"), i * 600.0) for i in range(n)]
+
+
+def test_results_keep_offset_order_and_shift():
+    out = stt.transcribe_segments(_segments(5), max_workers=3)
+
+    assert [d["text"].strip() for d in out] == [f"seg_{i:04d}.mp3" for i in range(5)]
+    for i, d in enumerate(out):
+        assert d["segments"][0]["start"] == pytest.approx(i * 600.0)
+        assert d["segments"][0]["end"] == pytest.approx(i * 600.0 + 1.0)
+        assert d["words"][0]["start"] == pytest.approx(i * 600.0 + 0.5)
+
+
+def test_error_in_one_segment_propagates(monkeypatch):
+    def _boom(seg_path: Path, language=None) -> dict:
+        if seg_path.name == "seg_0002.mp3":
+            raise RuntimeError("rate limited")
+        return _stub_transcribe(seg_path)
+
+    monkeypatch.setattr(stt, "_transcribe_segment", _boom)
+    with pytest.raises(RuntimeError, match="rate limited"):
+        stt.transcribe_segments(_segments(4), max_workers=4)
+
+
+def test_completed_segments_are_checkpointed_when_one_fails(monkeypatch):
+    def _boom(seg_path: Path, language=None) -> dict:
+        if seg_path.name == "seg_0004.mp3":
+            raise RuntimeError("timeout")
+        return _stub_transcribe(seg_path)
+
+    monkeypatch.setattr(stt, "_transcribe_segment", _boom)
+    saved: dict[int, dict] = {}
+    with pytest.raises(RuntimeError, match="timeout"):
+        stt.transcribe_segments(
+            _segments(6), max_workers=3, on_result=saved.__setitem__
+        )
+    assert sorted(saved) == [0, 1, 2, 3, 5]
+
+
+def test_resume_only_transcribes_missing_segments(monkeypatch):
+    calls: list[str] = []
+
+    def _count(seg_path: Path, language=None) -> dict:
+        calls.append(seg_path.name)
+        return _stub_transcribe(seg_path)
+
+    monkeypatch.setattr(stt, "_transcribe_segment", _count)
+    segs = _segments(6)
+    done = {i: stt._shift_timestamps(_stub_transcribe(p), off)
+            for i, (p, off) in enumerate(segs) if i != 4}
+
+    out = stt.transcribe_segments(segs, max_workers=4, done=done)
+
+    assert calls == ["seg_0004.mp3"]
+    assert [d["segments"][0]["start"] for d in out] == [i * 600.0 for i in range(6)]
+
+
+def test_language_is_passed_to_every_segment(monkeypatch):
+    langs: list = []
+
+    def _lang(seg_path: Path, language=None) -> dict:
+        langs.append(language)
+        return _stub_transcribe(seg_path)
+
+    monkeypatch.setattr(stt, "_transcribe_segment", _lang)
+    stt.transcribe_segments(_segments(3), max_workers=2, language="ja")
+    assert langs == ["ja"] * 3
+
+
+@pytest.mark.benchmark
+def test_benchmark_speedup_vs_segment_count(capsys):
+    """セグメント数ごとの逐次 / 並列 (cap=4) の所要時間と speedup を表示"""
+    rows = []
+    for n in (1, 2, 4, 6):
+        segs = _segments(n)
+
+        t0 = time.perf_counter()
+        stt.transcribe_segments(segs, max_workers=1)
+        seq = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        stt.transcribe_segments(segs, max_workers=4)
+        par = time.perf_counter() - t0
+
+        rows.append((n, seq, par, seq / par))
+
+    with capsys.disabled():
+        print("\nsegments  sequential[s]  parallel(cap=4)[s]  speedup")
+        for n, seq, par, sp in rows:
+            print(f"{n:>8}  {seq:>13.3f}  {par:>18.3f}  {sp:>7.2f}x")
+
+    speedup = {n: sp for n, _, _, sp in rows}
+    assert speedup[4] > 2.0
+    assert speedup[6] > 2.0
@@ -0,0 +1,83 @@
+# backend/shared/tests/test_stt_workspace.py
+import pytest
+
+from shared import stt_transcribe as stt
+
+
+@pytest.fixture(autouse=True)
+def _scratch_root(monkeypatch, tmp_path):
+    monkeypatch.setattr(stt, "STT_SCRATCH_DIR", str(tmp_path / "scratch"))
+    monkeypatch.setattr(stt, "STT_SCRATCH_RESERVE_BYTES", 0)
+
+
+def test_workspace_is_isolated_and_removed_on_failure(tmp_path):
+    with pytest.raises(RuntimeError):
+        with stt.job_workspace("job-a", 1024) as work_a:
+            with stt.job_workspace("job-b", 1024) as work_b:
+                assert work_a != work_b
+                assert work_a.parent == tmp_path / "scratch"
+                (work_a / "seg_0000.mp3").write_bytes(b"x" * 10)
+            raise RuntimeError("whisper failed")
+
+    assert not work_a.exists()
+    assert not work_b.exists()
+
+
+def test_budget_error_when_no_root_has_space(monkeypatch):
+    monkeypatch.setattr(stt, "_check_budget", lambda root, need: False)
+    with pytest.raises(stt.ScratchBudgetError):
+        with stt.job_workspace("job-c", 10**15):
+            pass
+
+
+def test_estimate_covers_reencode_and_segments():
+    # 32 kbps × 1 時間 ≒ 14.7 MB、re-encode + 分割で 2 倍 + 1 割
+    assert stt.estimate_scratch_bytes(3600) == int(3600 * 32 * 1024 / 8 * 2 * 1.1)
+
+
+# --------------------------------------------------------------------------- #
+#  re-encode fast path
+# --------------------------------------------------------------------------- #
+_PHONE = {"codec": "aac", "channels": 1, "sample_rate": 16000, "duration": 600.0, "size": 5 * 1024 * 1024}
+
+
+def test_small_mono_upload_skips_reencode(tmp_path):
+    assert stt.reencode_reason(tmp_path / "call.m4a", _PHONE) is None
+
+
+@pytest.mark.parametrize(
+    "name, override, reason",
+    [
+        ("call.m4a", {"channels": 2}, "channels 2"),
+        ("call.m4a", {"size": stt.MAX_BYTES + 1}, f"size {stt.MAX_BYTES + 1}"),
+        ("call.m4a", {"codec": "amr_nb"}, "codec amr_nb"),
+        ("call.m4a", {"sample_rate": 96000}, "sample_rate 96000"),
+        ("call.amr", {}, "extension .amr"),
+    ],
+)
+def test_reencode_required(tmp_path, name, override, reason):
+    assert stt.reencode_reason(tmp_path / name, {**_PHONE, **override}) == reason
+
+
+def test_stem_of_presigned_url():
+    url = "http://minio:9000/minutes-audio/uploads/f_rec.m4a?X-Amz-Signature=abc"
+    assert stt._stem(url) == "f_rec"
+    assert stt._stem(stt.Path("/data/uploads/f_rec.m4a")) == "f_rec"
+
+
+def test_derived_cache_fetches_only_unfinished_segments(monkeypatch, tmp_path):
+    fetched = []
+    monkeypatch.setattr(
+        stt.storage, "fetch_derived", lambda prefix, name, dst: fetched.append(name)
+    )
+    segments = [(tmp_path / f"seg_{i:04d}.mp3", i * 600.0) for i in range(4)]
+
+    n = stt._fetch_missing_segments("derived/f/v/", segments, done={0: {}, 2: {}})
+
+    assert n == 2
+    assert sorted(fetched) == ["seg_0001.mp3", "seg_0003.mp3"]
+
+
+def test_derived_variant_depends_on_trim_map():
+    assert stt._derived_variant([]) == stt._derived_variant([])
+    assert stt._derived_variant([]) != stt._derived_variant([(0.0, 10.0, 0.0)])
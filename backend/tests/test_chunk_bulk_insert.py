@@ -0,0 +1,77 @@
+"""
+TranscriptChunk の書き込み方式の比較 (ORM add × N vs bulk_insert_chunks)。
+
+    pytest -m benchmark -s tests/test_chunk_bulk_insert.py
+"""
+import time
+from uuid import uuid4
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from minutes_maker.app.db import models as M
+from shared.stt_transcribe import bulk_insert_chunks
+
+N_ROWS = 10_000
+
+
+def _segments(n: int) -> list[dict]:
+    return [
+        {"start": i * 2.0, "end": i * 2.0 + 1.8, "text": f" 発言 {i} です。 "}
+        for i in range(n)
+    ]
+
+
+def _new_transcript(sess: Session) -> int:
+    file_id = f"bench-{uuid4()}"
+    sess.add(M.File(file_id=file_id, filename="bench.mp3"))
+    tr = M.Transcript(file_id=file_id, content="bench")
+    sess.add(tr)
+    sess.flush()
+    return tr.id
+
+
+def _count(sess: Session, transcript_id: int) -> int:
+    return sess.scalar(
+        sa.select(sa.func.count()).where(M.TranscriptChunk.transcript_id == transcript_id)
+    )
+
+
+@pytest.mark.benchmark
+def test_bulk_insert_vs_orm_add(db_engine: Engine, capsys):
+    segs = _segments(N_ROWS)
+
+    with Session(db_engine) as sess:
+        try:
+            # --- ORM: 1 行ずつ add -------------------------------------------
+            tid_orm = _new_transcript(sess)
+            t0 = time.perf_counter()
+            for seg in segs:
+                sess.add(
+                    M.TranscriptChunk(
+                        transcript_id=tid_orm,
+                        start_ms=int(seg["start"] * 1000),
+                        end_ms=int(seg["end"] * 1000),
+                        text=seg["text"].strip(),
+                    )
+                )
+            sess.flush()
+            t_orm = time.perf_counter() - t0
+
+            # --- bulk --------------------------------------------------------
+            tid_bulk = _new_transcript(sess)
+            t0 = time.perf_counter()
+            bulk_insert_chunks(sess, tid_bulk, segs)
+            sess.flush()
+            t_bulk = time.perf_counter() - t0
+
+            assert _count(sess, tid_orm) == N_ROWS
+            assert _count(sess, tid_bulk) == N_ROWS
+        finally:
+            sess.rollback()
+
+    with capsys.disabled():
+        print(f"\nORM add : {N_ROWS / t_orm:>10,.0f} rows/s ({t_orm:.2f}s)")
+        print(f"bulk    : {N_ROWS / t_bulk:>10,.0f} rows/s ({t_bulk:.2f}s)")
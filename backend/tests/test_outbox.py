@@ -0,0 +1,71 @@
+"""
+task_outbox の送信 (dispatch_pending) ― Postgres が必要。
+
+    pytest -m db_check tests/test_outbox.py
+"""
+from uuid import uuid4
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from minutes_maker.app.db import models as M
+from shared import outbox
+
+
+@pytest.fixture
+def sent(db_engine: Engine, monkeypatch):
+    """SessionLocal をテスト DB に向け、send_task の呼び出しを記録する"""
+    calls = []
+    monkeypatch.setattr(outbox, "SessionLocal", sessionmaker(bind=db_engine, future=True))
+    monkeypatch.setattr(
+        outbox.celery_app,
+        "send_task",
+        lambda name, args=None, kwargs=None, **options: calls.append((name, args, options)),
+    )
+    yield calls
+    with Session(db_engine) as sess:
+        sess.execute(sa.delete(M.TaskOutbox).where(M.TaskOutbox.task_name.like("test.%")))
+        sess.commit()
+
+
+def _enqueue(db_engine: Engine, commit: bool = True) -> tuple[str, int]:
+    marker = str(uuid4())
+    with Session(db_engine) as sess:
+        row = outbox.enqueue(sess, "test.outbox", args=(marker,), task_id=marker)
+        sess.flush()
+        row_id = row.id
+        sess.commit() if commit else sess.rollback()
+    return marker, row_id
+
+
+@pytest.mark.db_check
+def test_rolled_back_rows_are_never_sent(db_engine: Engine, sent):
+    _, row_id = _enqueue(db_engine, commit=False)
+    assert outbox.dispatch_pending(ids=[row_id]) == 0
+    assert sent == []
+
+
+@pytest.mark.db_check
+def test_committed_row_is_sent_once(db_engine: Engine, sent):
+    marker, row_id = _enqueue(db_engine)
+
+    assert outbox.dispatch_pending(ids=[row_id]) == 1
+    assert outbox.dispatch_pending(ids=[row_id]) == 0
+    assert sent == [("test.outbox", [marker], {"task_id": marker})]
+
+
+@pytest.mark.db_check
+def test_locked_rows_are_skipped_by_other_dispatchers(db_engine: Engine, sent):
+    _, row_id = _enqueue(db_engine)
+
+    with Session(db_engine) as holder:  # 別の dispatcher が処理中
+        holder.scalars(
+            sa.select(M.TaskOutbox).where(M.TaskOutbox.id == row_id).with_for_update()
+        ).one()
+        assert outbox.dispatch_pending(ids=[row_id]) == 0
+        holder.rollback()
+
+    assert outbox.dispatch_pending(ids=[row_id]) == 1
+    assert len(sent) == 1